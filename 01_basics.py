@@ -1,12 +1,12 @@
 # 📓 01_basics.ipynb — Prompt Engineering Basics
 
-import os
-from openai import OpenAI
 from dotenv import load_dotenv
+from client_factory import get_client
+from prompt_templates import compile_template
 
-# Load API key from .env
+# Load API key from .env (the shared client reads OPENAI_API_KEY)
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
 # ---------------------------------------------
 # ZERO-SHOT Prompt (text-davinci-003)
@@ -47,7 +47,8 @@ print(zero_shot_completion(few_shot_prompt))
 # ---------------------------------------------
 
 def format_template(template, **kwargs):
-    return template.format(**kwargs)
+    # Parsed and validated once per distinct template; later calls only fill it in
+    return compile_template(template).format(**kwargs)
 
 template = "Write a social media caption for a product called {product}, which is designed for {audience}."
 formatted_prompt = format_template(template, product="EcoLuxe Sofa", audience="modern, eco-conscious families")
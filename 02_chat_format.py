@@ -3,24 +3,32 @@
 # 🧠 Prompt Engineering with Chat Format (GPT-3.5/4)
 # Experimenting with role prompting, temperature, prompt chaining, and output parsing
 
-import os
-from openai import OpenAI
 from dotenv import load_dotenv
+from chain_graph import ChainGraph
+from client_factory import get_client
+from sampling import sample_chat
+from streaming import stream_chat
 import json
 
 # Load API key from .env file
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
 # ----------------------------------------------------
 # Step 1: Basic Chat Format with Roles
 # ----------------------------------------------------
 
-def basic_chat(prompt, model="gpt-4", temperature=0.7, max_tokens=300):
-    messages = [
+def chat_messages(prompt):
+    return [
         {"role": "system", "content": "You are a helpful assistant that gives concise, structured answers."},
         {"role": "user", "content": prompt}
     ]
+
+def basic_chat(prompt, model="gpt-4", temperature=0.7, max_tokens=300, stream=False):
+    messages = chat_messages(prompt)
+    if stream:
+        # Iterate for tokens as they arrive; timings are in .stats once it's consumed
+        return stream_chat(client, model=model, messages=messages, temperature=temperature, max_tokens=max_tokens)
     response = client.chat.completions.create(
         model=model,
         messages=messages,
@@ -32,6 +40,13 @@ def basic_chat(prompt, model="gpt-4", temperature=0.7, max_tokens=300):
 prompt = "Summarize the company Patagonia in 3 bullet points."
 print("📌 Basic Chat Response:\n", basic_chat(prompt))
 
+# Same call, streamed token by token
+print("\n🌊 Streamed Chat Response:")
+stream = basic_chat(prompt, stream=True)
+for token in stream:
+    print(token, end="", flush=True)
+print("\n⏱️", stream.stats.as_row())
+
 
 # ----------------------------------------------------
 # Step 2: Iterative Refinement (Chain of Prompts)
@@ -54,9 +69,20 @@ print("\n🔁 Iterative Refinement:\n", refined)
 
 print("\n🔥 Temperature Comparison:\n")
 
+# Many samples of the same prompt in one request (n); n > 1 always skips the caches.
+# Returns a SampleSet: aggregate with .majority(), .diversity(), .variance()
+def sample_basic_chat(prompt, n=10, model="gpt-4", temperature=0.7, max_tokens=300):
+    return sample_chat(client, n=n, model=model, messages=chat_messages(prompt),
+                       temperature=temperature, max_tokens=max_tokens)
+
+# 10 samples per temperature, each set fetched in a single request (n=10)
 for temp in [0.2, 0.7, 1.0]:
-    result = basic_chat("Give a creative product name for a new line of sustainable outdoor fabrics.", temperature=temp)
-    print(f"Temperature {temp} → {result}")
+    samples = sample_basic_chat("Give a creative product name for a new line of sustainable outdoor fabrics.",
+                                temperature=temp)
+    answer, share = samples.majority()
+    print(f"Temperature {temp} → {answer} ({share:.0%} of {len(samples)} samples)")
+    print("   diversity:", samples.diversity())
+    print("   word count spread:", samples.variance()["Word Count"])
 
 
 # ----------------------------------------------------
@@ -100,3 +126,31 @@ def generate_pitch(profile):
 if profile:
     pitch = generate_pitch(profile)
     print("\n🧩 Prompt Chaining → Sales Pitch:\n", pitch)
+
+
+# ----------------------------------------------------
+# Step 6: Run the Chains for Many Companies at Once
+# ----------------------------------------------------
+
+# Both chains above as one graph: summary → refinement and profile → pitch are
+# independent branches, so they run side by side, and companies are pipelined
+def refine(summary):
+    return basic_chat(f"Based on this summary: '{summary}', extract 3 unique competitive advantages.")
+
+def pitch_if_parsed(profile):
+    return generate_pitch(profile) if profile else None
+
+company_chains = ChainGraph()
+company_chains.step("summary", lambda company: basic_chat(f"Give a 1-sentence summary of the company {company}."),
+                    inputs=["company"])
+company_chains.step("refined", refine, inputs=["summary"])
+company_chains.step("profile", lambda company: get_company_profile(company), inputs=["company"])
+company_chains.step("pitch", pitch_if_parsed, inputs=["profile"])
+
+companies = ["Crypton Fabric", "Keyston Brothers", "Sunbrella"]
+print("\n🕸️ Chains for Many Companies:")
+for result in company_chains.run_many([{"company": c} for c in companies], concurrency=8):
+    if isinstance(result, Exception):
+        print("⚠️ Chain failed:", result)
+        continue
+    print(f"\n{result['company']}:\n  Advantages: {result['refined']}\n  Pitch: {result['pitch']}")
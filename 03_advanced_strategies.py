@@ -1,23 +1,28 @@
 # 📓 03_advanced_strategies.ipynb — Advanced Prompt Engineering
 
-import os
 import json
-from openai import OpenAI
 from dotenv import load_dotenv
+from chain_graph import ChainGraph
+from client_factory import get_client
+from prompt_templates import templates
+from streaming import stream_chat
+from tool_executor import ToolExecutor, ToolRegistry
 
-# Load API key from .env
+# Load API key from .env (the shared client reads OPENAI_API_KEY)
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
 # ----------------------------------------------------
 # 1. Custom Persona (System Role)
 # ----------------------------------------------------
 
-def run_persona_query(prompt, persona, model="gpt-4", temperature=0.3):
-    messages = [
-        {"role": "system", "content": persona},
-        {"role": "user", "content": prompt}
-    ]
+# Persona first, question last: calls sharing a persona share a cacheable prompt prefix
+persona_template = templates.register("persona", "{prompt}", system="{persona}")
+
+def run_persona_query(prompt, persona, model="gpt-4", temperature=0.3, stream=False):
+    messages = persona_template.render(persona=persona, prompt=prompt)
+    if stream:
+        return stream_chat(client, model=model, messages=messages, temperature=temperature, max_tokens=300)
     response = client.chat.completions.create(
         model=model,
         messages=messages,
@@ -50,6 +55,21 @@ print("Step 1 - Keywords:", keywords)
 caption = generate_caption(keywords)
 print("Step 2 - Caption:\n", caption)
 
+# Same keyword → caption flow for a whole catalog: products are pipelined, so one
+# product's caption is written while the next product's keywords are generated
+workflow = ChainGraph()
+workflow.step("keywords", lambda product: generate_keywords(product).split("\n"), inputs=["product"])
+workflow.step("caption", generate_caption, inputs=["keywords"])
+
+products = ["LuxeTweed Performance Chair", "EcoLuxe Linen Sofa", "Velvet Cloud Ottoman"]
+print("\n🕸️ Pipelined Workflow:")
+for result in workflow.run_many([{"product": p} for p in products], concurrency=8):
+    if isinstance(result, Exception):
+        print("⚠️ Workflow failed:", result)
+        continue
+    print(f"{result['product']} → {result['caption']}")
+print("Workflow stats:", workflow.stats())
+
 
 # ----------------------------------------------------
 # 3. Structured Output (Schema-based JSON)
@@ -84,43 +104,58 @@ print(get_structured_analysis("Keyston Brothers"))
 # 4. Function Calling (Tool Use)
 # ----------------------------------------------------
 # Available only with gpt-4-0613 or gpt-3.5-turbo-0613+
-
-def run_function_call():
-    def define_tool_schema():
-        return [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_fabric_care",
-                    "description": "Provides care instructions for a fabric type.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "fabric_type": {
-                                "type": "string",
-                                "description": "Type of fabric (e.g., velvet, tweed, linen)"
-                            }
-                        },
-                        "required": ["fabric_type"]
-                    }
-                }
-            }
-        ]
-
-    tools = define_tool_schema()
-
-    response = client.chat.completions.create(
-        model="gpt-4-0613",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": "How do I care for linen upholstery?"}
-        ],
-        tools=tools,
-        tool_choice="auto"
-    )
+# Schemas are generated from the function signatures; every tool call the model
+# makes in one turn runs concurrently and results are cached per arguments.
+
+fabric_tools = ToolRegistry()
+
+FABRIC_CARE = {
+    "linen": "Vacuum weekly; blot spills; professional clean or cold gentle wash for removable covers.",
+    "velvet": "Brush with the pile; steam to lift crushed areas; water-free solvent for spots.",
+    "tweed": "Vacuum with an upholstery brush; dry-clean only; avoid rubbing stains.",
+    "performance": "Soap and water for most stains; diluted bleach on solution-dyed fabrics.",
+}
+CLEANING_CODES = {"linen": "S", "velvet": "S", "tweed": "S", "performance": "W/S"}
+MARTINDALE_RUBS = {"linen": 15000, "velvet": 30000, "tweed": 40000, "performance": 100000}
+
+def _fabric(text):
+    # Matches a known fabric anywhere in the argument ("linen upholstery" → linen)
+    return next((name for name in FABRIC_CARE if name in text.lower()), None)
+
+@fabric_tools.tool("Provides care instructions for a fabric type.",
+                   fabric_type="Type of fabric (e.g., velvet, tweed, linen)")
+def get_fabric_care(fabric_type):
+    fabric = _fabric(fabric_type)
+    return {"fabric": fabric, "care": FABRIC_CARE.get(fabric, "No care guide on file.")}
+
+@fabric_tools.tool("Returns the upholstery cleaning code (W, S, W/S or X) for a fabric type.",
+                   fabric_type="Type of fabric (e.g., velvet, tweed, linen)")
+def get_cleaning_code(fabric_type):
+    fabric = _fabric(fabric_type)
+    return {"fabric": fabric, "cleaning_code": CLEANING_CODES.get(fabric)}
+
+@fabric_tools.tool("Returns the abrasion resistance (Martindale rubs) of a fabric type.",
+                   fabric_type="Type of fabric (e.g., velvet, tweed, linen)")
+def get_durability(fabric_type):
+    fabric = _fabric(fabric_type)
+    return {"fabric": fabric, "martindale_rubs": MARTINDALE_RUBS.get(fabric)}
+
+def run_function_call(question="How do I care for linen upholstery?"):
+    executor = ToolExecutor(client, fabric_tools, model="gpt-4-0613", max_turns=4)
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": question}
+    ]
+    answer = executor.run(messages, temperature=0)
 
     print("\n🔧 Function Calling Response:\n")
-    print(response.choices[0].message)
+    for message in messages:
+        if message["role"] == "tool":
+            print("  🛠️ tool result:", message["content"])
+    print(answer)
+    print("Tool stats:", executor.stats())
+    executor.close()
+    return answer
 
 # Uncomment if using a model that supports function calling
 # run_function_call()
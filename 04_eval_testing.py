@@ -1,26 +1,38 @@
 # 📓 04_eval_testing.ipynb — Prompt Evaluation and Testing
 
 import os
-from openai import OpenAI
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 from dotenv import load_dotenv
+from client_factory import get_client
+from ground_truth import GroundTruthEvaluator
+from prompt_templates import templates
+from streaming import stream_chat
+from token_planner import fit_request
+from tournament import Tournament
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
 
 # --------------------------------------------------------
 # 1. Compare Prompt Variants (A/B Testing)
 # --------------------------------------------------------
 
-def run_prompt(prompt, system_msg="You are a helpful assistant.", model="gpt-4", temperature=0.3):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
+def run_prompt(prompt, system_msg="You are a helpful assistant.", model="gpt-4", temperature=0.3, stream=False):
+    # Judge prompts embed whole responses, so trim them to the context window before sending
+    request = fit_request({
+        "model": model,
+        "messages": [
             {"role": "system", "content": system_msg},
             {"role": "user", "content": prompt}
         ],
-        temperature=temperature,
-        max_tokens=300
-    )
+        "temperature": temperature,
+        "max_tokens": 300
+    })
+    if stream:
+        return stream_chat(client, **request)
+    response = client.chat.completions.create(**request)
     return response.choices[0].message.content
 
 # Two prompt styles to compare
@@ -60,6 +72,62 @@ print("\n🧠 Self-Evaluation:\n")
 print(self_critique(prompt_a, response_a, response_b))
 
 
+# --------------------------------------------------------
+# 2b. Tournament Ranking of Many Prompt Variants
+# --------------------------------------------------------
+
+# Judging every pair of N variants costs N(N-1)/2 calls; a tournament needs
+# about N·log2(N). Each pair is judged in both orders to cancel position bias.
+pairwise_judge = templates.register("pairwise_judge", system="""You are a critical evaluator of AI responses.
+Two responses were given to the same prompt. Decide which one is more helpful, clear, and relevant.
+Ignore which one is shown first and don't prefer a response for being longer.
+Justify briefly, then end with exactly one line: "Winner: A", "Winner: B" or "Winner: tie".""",
+    user="""Prompt:
+{prompt}
+
+Response A:
+{response_a}
+
+Response B:
+{response_b}""")
+
+
+def pairwise_verdict(task, response_a, response_b):
+    system, user = pairwise_judge.render(prompt=task, response_a=response_a, response_b=response_b)
+    verdict = run_prompt(user["content"], system_msg=system["content"], temperature=0)
+    match = re.search(r"Winner:\s*\**\s*(A|B|tie)\b", verdict or "", re.I)
+    return match.group(1) if match else "tie"
+
+
+task = "Help a customer decide whether performance fabric suits their furniture."
+variants = [
+    prompt_a,
+    prompt_b,
+    "Explain performance fabric to a first-time sofa buyer in under 100 words.",
+    "As an upholstery expert, describe the pros and cons of performance fabric.",
+    "Compare performance fabric with cotton and linen for a family with pets.",
+    "Give a short FAQ (3 questions) about performance fabric for furniture.",
+    "Summarize why performance fabric is popular, with one concrete example.",
+    "What should I know before buying a performance fabric sofa?"
+]
+with ThreadPoolExecutor(max_workers=8) as pool:
+    variant_responses = list(pool.map(run_prompt, variants))
+
+tournament = Tournament(variant_responses, lambda a, b: pairwise_verdict(task, a, b),
+                        concurrency=8, labels=[f"V{i + 1}" for i in range(len(variants))])
+if os.getenv("TOURNAMENT_MODE", "merge") == "swiss":
+    ranking = tournament.swiss()
+else:
+    ranking = tournament.merge_sort()
+
+print("\n🏆 Tournament Ranking:\n")
+for place, i in enumerate(ranking, 1):
+    print(f"{place}. V{i + 1}: {variants[i]}")
+for row in tournament.ratings():
+    print(row)
+print(tournament.stats())
+
+
 # --------------------------------------------------------
 # 3. Scoring Heuristics (Custom Evaluation)
 # --------------------------------------------------------
@@ -86,11 +154,11 @@ print(run_scored_eval(prompt_b, criteria))
 # 4. Ground Truth Comparison
 # --------------------------------------------------------
 
-def compare_to_ground_truth(prompt, expected_answer):
-    model_response = run_prompt(prompt)
+def llm_compare(prompt, model_response, expected_answer):
     prompt_eval = f"""
 Compare the following model response to the ground truth answer.
 Point out what's accurate, what's missing, and what's incorrect.
+End with exactly one line: "Verdict: correct", "Verdict: partially correct" or "Verdict: incorrect".
 
 Prompt:
 {prompt}
@@ -101,8 +169,34 @@ Model Response:
 Ground Truth:
 {expected_answer}
 """
-    return run_prompt(prompt_eval, system_msg="You are a comparison evaluator.")
+    return run_prompt(prompt_eval, system_msg="You are a comparison evaluator.", temperature=0)
+
+
+def compare_to_ground_truth(prompt, expected_answer):
+    return llm_compare(prompt, run_prompt(prompt), expected_answer)
 
 ground_truth = "Performance fabric is ideal for furniture because it's stain-resistant, durable, and easy to clean."
 print("\n🧾 Ground Truth Comparison:\n")
 print(compare_to_ground_truth(prompt_a, ground_truth))
+
+# Golden set: cheap local metrics (token F1, ROUGE-L, embedding cosine) settle the
+# clear-cut items; only the ambiguous band goes to the LLM comparer
+golden_set = [
+    (prompt_a, ground_truth),
+    ("Is velvet a good choice for homes with pets?",
+     "Velvet is a reasonable choice with pets: it has no loose weave for claws to catch, but it shows hair."),
+    ("How should linen slipcovers be washed?",
+     "Wash linen slipcovers in cold water on a gentle cycle and air dry them to avoid shrinking."),
+    ("What does cleaning code W mean on upholstery?", "Cleaning code W means the fabric can be cleaned with water-based cleaners."),
+    ("What does cleaning code S mean on upholstery?", "Cleaning code S means solvent-based cleaners only; no water."),
+    ("Why choose boucle for a living room sofa?", "Boucle adds texture and warmth and hides minor wear well.")
+]
+golden_prompts = [p for p, _ in golden_set]
+with ThreadPoolExecutor(max_workers=8) as pool:
+    golden_responses = list(pool.map(run_prompt, golden_prompts))
+
+evaluator = GroundTruthEvaluator(judge=llm_compare)
+golden_df = evaluator.evaluate(golden_prompts, golden_responses, [expected for _, expected in golden_set])
+print("\n🧾 Golden Set (local metrics first):\n")
+print(golden_df[["Token F1", "ROUGE-L", "Embedding Cosine", "Local Score", "Source", "Verdict"]].to_string())
+print(evaluator.stats())
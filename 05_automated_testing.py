@@ -1,14 +1,16 @@
 # 📓 05_automated_testing.ipynb — Prompt Evaluation at Scale
 
 import os
-import pandas as pd
-import time
-from openai import OpenAI
+import asyncio
 from dotenv import load_dotenv
+from async_runner import run_grid
+from eval_pipeline import RATE_LIMITS, build_eval_client, evaluate_row, register_eval_judge
+from prompt_templates import templates
+from result_sink import ResultSink, read_results
+from score_parser import ScoreParser
 
 # Load API key
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # -----------------------------------------
 # Setup: Models, Prompts, Scoring Criteria
@@ -22,90 +24,69 @@ prompts = [
 
 models = ["gpt-3.5-turbo", "gpt-4"]
 criteria = ["Clarity", "Specificity", "Relevance"]
+score_parser = ScoreParser(criteria)
 
-# -----------------------------------------
-# Generate a response from the model
-# -----------------------------------------
+# The judge rubric is a static system message ahead of the per-row prompt/response,
+# so provider-side prefix caching can reuse it
+judge_template = register_eval_judge(criteria)
 
-def generate_response(prompt, model):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.3,
-        max_tokens=300
-    )
-    return response.choices[0].message.content
+# Concurrency ceiling + per-model quotas (requests/min, tokens/min) replace the old sleep(1).
+concurrency = int(os.getenv("EVAL_CONCURRENCY", "16"))
+rate_limits = RATE_LIMITS
 
-# -----------------------------------------
-# Let GPT score each response
-# -----------------------------------------
+# Stream replies to record time-to-first-token, tokens/sec and latency per row
+# (streamed calls skip the response cache)
+stream_responses = os.getenv("STREAM_RESPONSES") == "1"
 
-def score_response(prompt, response, criteria):
-    scoring_prompt = f"""
-Evaluate the following response to the prompt below. Score it from 1–10 on each of these criteria: {', '.join(criteria)}.
-
-Prompt:
-{prompt}
-
-Response:
-{response}
-
-Return the result as JSON like:
-{{
-  "Clarity": 8,
-  "Specificity": 7,
-  "Relevance": 9,
-  "Comments": "Brief justification."
-}}
-"""
-    eval_response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an evaluator that scores assistant responses."},
-            {"role": "user", "content": scoring_prompt}
-        ],
-        temperature=0,
-        max_tokens=300
-    )
-    try:
-        return eval_response.choices[0].message.content
-    except:
-        return None
+# Rate limiter → retries → response cache → instrumentation; generate_response,
+# score_response and the row logic live in eval_pipeline (shared with the benchmark)
+client, resilient = build_eval_client(concurrency, rate_limits)
+instrumentation = client.instrumentation
 
 # -----------------------------------------
 # Run the full test suite
 # -----------------------------------------
 
-results = []
-
-for prompt in prompts:
-    for model in models:
-        print(f"⏳ Running {model} on: {prompt}")
-        response = generate_response(prompt, model)
-        time.sleep(1)  # Avoid rate limits
-        evaluation = score_response(prompt, response, criteria)
-        
-        # Parse evaluation JSON (lazy approach for now)
-        try:
-            score_data = eval(evaluation)  # You could use json.loads() with cleanup
-            score_data["Prompt"] = prompt
-            score_data["Model"] = model
-            score_data["Raw_Response"] = response
-            results.append(score_data)
-        except Exception as e:
-            print("⚠️ Eval parse failed:", e)
-            continue
+async def evaluate(job):
+    prompt, model = job
+    print(f"⏳ Running {model} on: {prompt}")
+    return await evaluate_row(client, judge_template, score_parser, prompt, model, stream=stream_responses)
+
+# Rows stream to disk as they finish (.jsonl, or .parquet for a part-file directory)
+results_path = os.getenv("EVAL_RESULTS_PATH", "automated_eval_results.jsonl")
+sink = ResultSink(results_path)
+
+def record(index, job, outcome):
+    prompt, model = job
+    if isinstance(outcome, Exception):
+        print(f"⚠️ Eval failed for {model} on {prompt[:40]}:", outcome)
+        return
+    sink.write(outcome)
+
+jobs = [(prompt, model) for prompt in prompts for model in models]
+try:
+    asyncio.run(run_grid(jobs, evaluate, concurrency=concurrency, on_result=record))
+finally:
+    sink.close()
 
 # -----------------------------------------
 # Save and Display Results
 # -----------------------------------------
 
-df = pd.DataFrame(results)
-print("✅ DONE! Here's a preview:")
+df = read_results(results_path)
+print(f"✅ DONE! {sink.rows_written} rows in {results_path}. Here's a preview:")
 print(df.head())
-
-# Optional: export
+print("💾 Cache:", client.cache.stats())
+print("🛡️ Retries:", resilient.stats())
+print("⏱️ Latency:", {m: (h["p50"], h["p95"]) for m, h in resilient.histogram.export().items()})
+print("🔍 Score parsing:", score_parser.stats())
+print("🧩 Prompt prefixes:", templates.report())
+
+# Spend and latency per pipeline stage and model
+usage = instrumentation.summary(by=["stage", "model"])
+print("📊 Usage:")
+print(usage.to_string(index=False))
+
+# Optional: export CSV copies for spreadsheets
 df.to_csv("automated_eval_results.csv", index=False)
+usage.to_csv("automated_eval_usage.csv", index=False)
@@ -11,11 +11,15 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableSequence
+from chain_graph import ChainGraph
+from client_factory import http_client
 
 load_dotenv()
 os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
 
-llm = ChatOpenAI(model="gpt-4", temperature=0.3)
+# Reuse the process-wide pooled HTTP connections instead of a private pool per model
+llm = ChatOpenAI(model="gpt-4", temperature=0.3,
+                 http_client=http_client(), http_async_client=http_client(asynchronous=True))
 
 # --------------------------------------------------------
 #%%
@@ -48,6 +52,25 @@ caption = caption_chain.invoke({"keywords": keywords})
 
 print("\n🔁 Multi-Step Chain Result:\n", caption)
 
+# Many products through the same two chains: each product's caption step starts as
+# soon as its keywords are ready, while other products' keyword calls are in flight
+async def product_keywords(product):
+    return await keywords_chain.ainvoke({"product": product})
+
+async def product_caption(keywords):
+    return await caption_chain.ainvoke({"keywords": keywords})
+
+catalog_flow = ChainGraph()
+catalog_flow.step("keywords", product_keywords, inputs=["product"])
+catalog_flow.step("caption", product_caption, inputs=["keywords"])
+
+products = ["EcoLuxe Linen Sofa", "LuxeTweed Performance Chair", "Velvet Cloud Ottoman"]
+for result in catalog_flow.run_many([{"product": p} for p in products], concurrency=8):
+    if isinstance(result, Exception):
+        print("⚠️ Chain failed:", result)
+        continue
+    print(f"\n🕸️ {result['product']}:\n", result["caption"])
+
 # --------------------------------------------------------
 #%%
 # 4. Output Parsing (JSON style)
@@ -63,23 +86,66 @@ json_chain = json_prompt | llm | JsonOutputParser()
 
 print("\n📦 Structured Output:\n", json_chain.invoke({"product": "Sunbrella Performance Fabric"}))
 
-
 # --------------------------------------------------------
 #%%
-# 5. Document Loading (TextLoader)
+# 4b. Bulk Invocation (many inputs per chain)
 # --------------------------------------------------------
 
-from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import CharacterTextSplitter
+from bulk_chains import bulk_invoke, run_bulk
 
-# Load and split file
-loader = TextLoader("sample_data/fabric_article.txt")  # Add your own .txt file
-docs = loader.load()
+# Small lists: collect in input order; a failed input comes back as its exception
+products = ["performance fabric", "boucle", "recycled polyester velvet"]
+for index, row, output in bulk_invoke(json_chain, [{"product": p} for p in products], concurrency=8):
+    print(f"\n📦 {row['product']}:", output if not isinstance(output, Exception) else f"⚠️ {output!r}")
 
-splitter = CharacterTextSplitter(chunk_size=300, chunk_overlap=30)
-chunks = splitter.split_documents(docs)
+# Catalog jobs: point BULK_INPUTS at a CSV with a `product` column and results stream
+# to disk as they complete (any other columns, e.g. SKU, are carried into each row)
+bulk_inputs = os.getenv("BULK_INPUTS")
+if bulk_inputs:
+    counts = run_bulk(keywords_chain, bulk_inputs, os.getenv("BULK_RESULTS_PATH", "bulk_keywords.jsonl"),
+                      concurrency=int(os.getenv("BULK_CONCURRENCY", "16")), columns=["product"])
+    print("\n📦 Bulk keywords:", counts)
+
+
+# --------------------------------------------------------
+#%%
+# 5. Document Loading (streaming, memory-mapped)
+# --------------------------------------------------------
+
+from doc_stream import stream_chunks
+
+# Same chunk_size/chunk_overlap rules as CharacterTextSplitter, but files are
+# memory-mapped and chunks are yielded lazily, so multi-GB corpora fit.
+# DOCS_PATH can be a single .txt file or a directory of them; set DOCS_WORKERS
+# to split files across that many processes.
+docs_path = os.getenv("DOCS_PATH", "sample_data/fabric_article.txt")  # Add your own .txt file
+chunks = stream_chunks(docs_path, chunk_size=300, chunk_overlap=30, workers=int(os.getenv("DOCS_WORKERS", "1")))
 
 print("\n📚 Loaded and Split Docs:\n")
-print(chunks[0].page_content[:300])  # Preview
+first_chunk = next(chunks)
+print(first_chunk.page_content[:300])  # Preview
+
+# --------------------------------------------------------
+#%%
+# 6. Local Retrieval (offline vector index)
+# --------------------------------------------------------
+
+from vector_index import VectorIndex
+
+# Chunks are embedded locally (feature hashing by default; pass embed=... for a
+# local model) into a memory-mapped index on disk; re-runs reuse it (delete the
+# directory to rebuild)
+index = VectorIndex(os.getenv("VECTOR_INDEX_PATH", "fabric_index"))
+if len(index) == 0:
+    index.add_chunks([first_chunk])
+    index.add_chunks(chunks)
+    # Large corpora: cluster once so queries scan a few lists instead of every chunk
+    if len(index) > 50000:
+        index.build_ivf()
+
+question = "How do you clean performance fabric?"
+print(f"\n🔎 Top chunks for: {question}")
+for hit in index.search(question, k=3):
+    print(f"  {hit['score']:.3f}  {hit['metadata'].get('source')}  {hit['text'][:80]!r}")
+index.close()
 
-# Optional: Use this for retrieval in RAG later!
@@ -1,14 +1,20 @@
 # 📓 08_parameter_sweep.ipynb — Supercharged Parameter Sweep
 
 import os
-import pandas as pd
-import time
-import openai
 from dotenv import load_dotenv
+from client_factory import get_client
+from instrumentation import get_instrumentation
+from prompt_templates import register_judge, templates
+from result_sink import ResultSink, read_results
+from score_parser import ScoreParser
+from streaming import stream_chat
+from token_planner import fit_request, pack_requests, paced, predict_tokens
 
 # Load API key
 load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+client = get_client()
+resilient = client.resilient  # retry layer: stats and latency histograms
+instrumentation = get_instrumentation()  # tokens, cost and latency of every call
 
 # ---------------------------------------
 #%%
@@ -24,113 +30,224 @@ prompts = [
 temperature_values = [0.2, 0.7, 1.0]
 max_token_values = [50, 150, 300]
 model = "gpt-4"
+score_parser = ScoreParser(["Clarity", "Specificity", "Verbosity"])
 
-# ---------------------------------------
-#%%
-# Helpers: Token + Word Count
-# ---------------------------------------
-
-import re
-
-def count_words(text):
-    return len(re.findall(r"\w+", text))
+# Prompts compiled once, static content first: the judge rubric is a system message
+# ahead of the per-cell prompt/response, so provider-side prefix caching can reuse it
+answer_template = templates.register("answer", "{prompt}", system="You are a helpful assistant.")
+judge_template = register_judge("judge", ["Clarity", "Specificity", "Verbosity"])
 
-def count_sentences(text):
-    return len(re.findall(r'[.!?]', text))
+# Stream generations to record TTFT, tokens/sec and latency per row (streamed calls skip the cache)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES") == "1"
 
 # ---------------------------------------
 #%%
 # Run GPT and Evaluate Itself
 # ---------------------------------------
 
-def generate_response(prompt, temperature, max_tokens):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens
-    )
+def generation_request(prompt, temperature, max_tokens, top_p=None):
+    request = {
+        "model": model,
+        "messages": answer_template.render(prompt=prompt),
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if top_p is not None:
+        request["top_p"] = top_p
+    return request
+
+def generate_response(prompt, temperature, max_tokens, stream=False, top_p=None):
+    request = generation_request(prompt, temperature, max_tokens, top_p)
+    if stream:
+        return stream_chat(client, **request)
+    response = client.chat.completions.create(**request)
     return response.choices[0].message.content.strip()
 
+def generate_timed(prompt, temperature, max_tokens, top_p=None):
+    # (response, timings); timings are only measured when streaming
+    with instrumentation.span("generate", stage="generate"):
+        if not STREAM_RESPONSES:
+            return generate_response(prompt, temperature, max_tokens, top_p=top_p), {}
+        stream = generate_response(prompt, temperature, max_tokens, stream=True, top_p=top_p)
+        return stream.consume().strip(), stream.stats.as_row()
+
+def score_request(prompt, response):
+    return fit_request({
+        "model": "gpt-4",
+        "messages": judge_template.render(prompt=prompt, response=response),
+        "temperature": 0,
+        "max_tokens": 300
+    })
+
+def parse_score(raw):
+    return score_parser.parse_or_default(raw)
+
 def self_score(prompt, response):
-    eval_prompt = f"""
-Evaluate the response to this prompt:
-Prompt: "{prompt}"
-
-Response:
-{response}
-
-Score the response from 1–10 in the following categories:
-- Clarity
-- Specificity
-- Verbosity
-
-Return JSON like:
-{{
-  "Clarity": 8,
-  "Specificity": 7,
-  "Verbosity": 6,
-  "Comments": "Short and precise, but lacks vivid examples."
-}}
-"""
-    eval_response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a strict evaluator of model outputs."},
-            {"role": "user", "content": eval_prompt}
-        ],
-        temperature=0,
-        max_tokens=300
-    )
-    try:
-        return eval(eval_response.choices[0].message.content)
-    except:
-        return {"Clarity": None, "Specificity": None, "Verbosity": None, "Comments": "Failed to parse"}
+    with instrumentation.span("judge", stage="judge"):
+        eval_response = client.chat.completions.create(**score_request(prompt, response))
+    return parse_score(eval_response.choices[0].message.content)
+
+def build_row(prompt, temp, max_tokens, response, score, timings=None, top_p=None):
+    return {
+        "Prompt": prompt,
+        "Temperature": temp,
+        "Max Tokens": max_tokens,
+        **({"Top P": top_p} if top_p is not None else {}),
+        "Response": response,
+        "Clarity": score.get("Clarity"),
+        "Specificity": score.get("Specificity"),
+        "Verbosity": score.get("Verbosity"),
+        "Comments": score.get("Comments"),
+        **(timings or {})
+    }
 
 # ---------------------------------------
 #%%
 # Main Sweep Loop
 # ---------------------------------------
 
-results = []
+# "sync" sends one request per cell; "batch" submits the grid through the Batch API
+SWEEP_MODE = os.getenv("SWEEP_MODE", "sync")
 
-for prompt in prompts:
-    for temp in temperature_values:
-        for max_tokens in max_token_values:
-            print(f"⚙️ Running temp={temp}, tokens={max_tokens} on prompt: {prompt[:40]}...")
-            response = generate_response(prompt, temp, max_tokens)
-            time.sleep(1)  # Rate-limit kindness
+# Responses judged per evaluator call in sync mode (1 = one gpt-4 call per response)
+JUDGE_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", "1"))
 
-            word_count = count_words(response)
-            sentence_count = count_sentences(response)
-            score = self_score(prompt, response)
+# "grid" scores every cell below; "random", "halving", "hyperband" or "bayes" search
+# search_space adaptively and stop after SWEEP_BUDGET API calls (default: half the grid)
+SWEEP_STRATEGY = os.getenv("SWEEP_STRATEGY", "grid")
+search_space = {"temperature": (0.0, 1.2), "max_tokens": (50, 400), "top_p": (0.5, 1.0)}
+
+cells = [(prompt, temp, max_tokens)
+         for prompt in prompts
+         for temp in temperature_values
+         for max_tokens in max_token_values]
 
-            results.append({
-                "Prompt": prompt,
-                "Temperature": temp,
-                "Max Tokens": max_tokens,
-                "Response": response,
-                "Clarity": score.get("Clarity"),
-                "Specificity": score.get("Specificity"),
-                "Verbosity": score.get("Verbosity"),
-                "Comments": score.get("Comments"),
-                "Word Count": word_count,
-                "Sentence Count": sentence_count
-            })
+# Token plan for the sync grid: each cell costs its generation plus its judge call (sized
+# for a response of max_tokens words); cells are packed into one-minute windows under the
+# TPM quota and each window starts a minute after the previous one
+tokens_per_minute = int(os.getenv("SWEEP_TPM", "30000"))
+
+def cell_tokens(cell):
+    prompt, _, max_tokens = cell
+    return predict_tokens(generation_request(*cell)) + predict_tokens(score_request(prompt, "word " * max_tokens))
+
+# Each scored cell is appended to disk right away; a crash keeps everything flushed so far
+results_path = os.getenv("SWEEP_RESULTS_PATH", "sweep_eval_results.jsonl")
+sink = ResultSink(results_path)
+
+if SWEEP_STRATEGY != "grid":
+    from sweep_planner import SweepPlanner
+
+    def evaluate(config, prompt):
+        temp, max_tokens, top_p = config["temperature"], config["max_tokens"], config["top_p"]
+        print(f"🎯 Trying temp={temp}, tokens={max_tokens}, top_p={top_p} on prompt: {prompt[:40]}...")
+        with instrumentation.span("cell") as cell_span:
+            response, timings = generate_timed(prompt, temp, max_tokens, top_p)
+            score = self_score(prompt, response)
+        sink.write(build_row(prompt, temp, max_tokens, response, score, {**timings, **cell_span.row()}, top_p))
+        values = [score[c] for c in ("Clarity", "Specificity", "Verbosity") if score.get(c) is not None]
+        return sum(values) / len(values) if values else None
+
+    budget = int(os.getenv("SWEEP_BUDGET", str(len(cells))))
+    planner = SweepPlanner(search_space, evaluate, prompts, budget=budget, calls_per_eval=2)
+    strategies = {
+        "random": planner.random,
+        "halving": lambda: planner.successive_halving(n=9),
+        "hyperband": planner.hyperband,
+        "bayes": lambda: planner.bayesian(n=budget)
+    }
+    best_config, best_score = strategies[SWEEP_STRATEGY]()
+    if best_config is None or best_score == float("-inf"):
+        # Budget too small to score any config (or every judge reply failed to parse)
+        print("🏆 Best config: no complete configuration")
+    else:
+        print(f"🏆 Best config: {best_config} (mean judge score {best_score:.2f})")
+    print("🎯 Planner:", planner.stats())
+elif SWEEP_MODE == "batch":
+    from batch_runner import BatchRunner, BatchItemError, completion_text
+
+    # The manifest makes the sweep resumable: rerunning after a crash skips finished cells
+    runner = BatchRunner(client, os.getenv("SWEEP_MANIFEST", "sweep_batch_manifest.json"),
+                         poll_interval=float(os.getenv("SWEEP_POLL_SECONDS", "30")))
+
+    print(f"📦 Batch-generating {len(cells)} sweep cells...")
+    responses = {}
+    for cell, result in runner.run({cell: generation_request(*cell) for cell in cells}):
+        if isinstance(result, BatchItemError):
+            print(f"⚠️ Generation failed for {cell}:", result)
+            continue
+        responses[cell] = completion_text(result).strip()
+
+    print(f"📦 Batch-scoring {len(responses)} responses...")
+    score_requests = {cell: score_request(cell[0], response) for cell, response in responses.items()}
+    for cell, result in runner.run(score_requests):
+        raw = None if isinstance(result, BatchItemError) else completion_text(result)
+        score = parse_score(raw)
+        sink.write(build_row(*cell, responses[cell], score))
+else:
+    windows = pack_requests(cells, tokens_per_minute, cost=cell_tokens)
+    print(f"🧮 Grid: ~{sum(map(cell_tokens, cells))} tokens, "
+          f"{len(windows)} minute(s) at {tokens_per_minute} TPM")
+
+    if JUDGE_BATCH_SIZE > 1:
+        from batch_judge import BatchJudge
+
+        judge = BatchJudge(client, ["Clarity", "Specificity", "Verbosity"],
+                           batch_size=JUDGE_BATCH_SIZE, score_one=self_score, parser=score_parser)
+        responses, timings = {}, {}
+        for cell in paced(windows):
+            prompt = cell[0]
+            print(f"⚙️ Running temp={cell[1]}, tokens={cell[2]} on prompt: {prompt[:40]}...")
+            responses[cell], timings[cell] = generate_timed(*cell)
+
+            # Judge a prompt's responses together once all of its cells are generated
+            prompt_cells = [c for c in cells if c[0] == prompt]
+            if all(c in responses for c in prompt_cells):
+                print(f"⚖️ Judging {len(prompt_cells)} responses in batches of {JUDGE_BATCH_SIZE}...")
+                scores = judge.score(prompt, {c: responses[c] for c in prompt_cells})
+                for c in prompt_cells:
+                    sink.write(build_row(*c, responses[c], scores[c], timings[c]))
+        print("⚖️ Judge:", judge.stats())
+    else:
+        for prompt, temp, max_tokens in paced(windows):
+            print(f"⚙️ Running temp={temp}, tokens={max_tokens} on prompt: {prompt[:40]}...")
+            with instrumentation.span("cell") as cell_span:
+                response, timings = generate_timed(prompt, temp, max_tokens)
+                score = self_score(prompt, response)
+            sink.write(build_row(prompt, temp, max_tokens, response, score, {**timings, **cell_span.row()}))
 
 # ---------------------------------------
 #%%
 # Display and Export
 # ---------------------------------------
 
-df = pd.DataFrame(results)
+sink.close()
+
+import pandas as pd  # only needed for display, so imported here
+from text_metrics import add_text_metrics
+
+# Word/sentence/token counts, readability and lexical diversity for the whole column at once,
+# written back so the saved rows carry them too
+df = read_results(results_path)
+if len(df):  # a search budget too small for one call leaves no rows
+    df = add_text_metrics(df, "Response")
+with ResultSink(results_path) as enriched:
+    for row in df.astype(object).where(df.notna(), None).to_dict("records"):
+        enriched.write(row)
 pd.set_option('display.max_colwidth', None)
 
-print("✅ Done! Sample output:")
+print(f"✅ Done! {sink.rows_written} rows in {results_path}. Sample output:")
+print("💾 Cache:", client.cache.stats())
+print("🛡️ Retries:", resilient.stats())
+print("⏱️ Latency:", {m: (h["p50"], h["p95"]) for m, h in resilient.histogram.export().items()})
+print("🔍 Score parsing:", score_parser.stats())
+print("🧩 Prompt prefixes:", templates.report())
+# Batch-mode calls go through the Batch API and are not in this table
+print("📊 Usage:")
+print(instrumentation.summary(by=["stage", "model"]).to_string(index=False))
 # display(df.head())
 
-# Save for deeper analysis
+# Rows (with the text metrics) are saved to results_path; reload later with read_results() or iter_results()
+
+# Save for deeper analysis: a CSV copy for spreadsheets, as in the other notebooks
 df.to_csv("sweep_eval_results.csv", index=False)
@@ -1,16 +1,20 @@
 #%%
 # 📓 09_visual_analysis.ipynb — Prompt Evaluation with Charts, Scoring, and Export
 import os
-import pandas as pd
-import openai
-import time
-import matplotlib.pyplot as plt
-import seaborn as sns
 from dotenv import load_dotenv
+from client_factory import get_client
+from instrumentation import get_instrumentation
+from prompt_templates import register_judge, templates
+from result_sink import ResultSink, read_results
+from score_parser import ScoreParser
+from streaming import stream_chat
+from token_planner import fit_request
 
 # Load API key
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+client = get_client()
+resilient = client.resilient  # retry layer: stats and latency histograms
+instrumentation = get_instrumentation()  # tokens, cost and latency of every call
 
 # ---------------------------------------
 #%%
@@ -26,6 +30,16 @@ prompts = [
 models = ["gpt-3.5-turbo", "gpt-4"]
 temperature = 0.7
 max_tokens = 200
+score_parser = ScoreParser(["Clarity", "Specificity", "Verbosity"])
+
+# Prompts compiled once, static content first: the judge rubric is a system message
+# ahead of the per-row prompt/response, so provider-side prefix caching can reuse it
+answer_template = templates.register("answer", "{prompt}", system="You are a helpful assistant.")
+judge_template = register_judge("judge", ["Clarity", "Specificity", "Verbosity"],
+                                evaluator="You are an evaluator of assistant responses.")
+
+# Stream responses to chart time-to-first-token and throughput by model
+stream_responses = os.getenv("STREAM_RESPONSES") == "1"
 
 # Optional: Add manual human ratings here (per prompt, per model)
 human_scores = {
@@ -40,73 +54,54 @@ human_scores = {
 # Helpers
 # ---------------------------------------
 
-def count_words(text):
-    return len(text.split())
-
-def count_sentences(text):
-    return len([s for s in text.split('.') if len(s.strip()) > 0])
-
-def get_response(prompt, model):
-    chat = openai.ChatCompletion.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens
-    )
+def get_response(prompt, model, stream=False):
+    request = {
+        "model": model,
+        "messages": answer_template.render(prompt=prompt),
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        return stream_chat(client, **request)
+    chat = client.chat.completions.create(**request)
     return chat.choices[0].message.content.strip()
 
+def get_timed_response(prompt, model):
+    # (response, timing columns); timings are only measured when streaming
+    if not stream_responses:
+        return get_response(prompt, model), {}
+    stream = get_response(prompt, model, stream=True)
+    response = stream.consume().strip()
+    return response, stream.stats.as_row()
+
 def score_with_gpt(prompt, response):
-    scoring_prompt = f"""
-Evaluate the response to this prompt:
-Prompt: "{prompt}"
-
-Response:
-{response}
-
-Score the response from 1–10 in the following categories:
-- Clarity
-- Specificity
-- Verbosity
-
-Return JSON like:
-{{
-  "Clarity": 8,
-  "Specificity": 7,
-  "Verbosity": 6,
-  "Comments": "Short and precise, but lacks vivid examples."
-}}
-"""
-    chat = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an evaluator of assistant responses."},
-            {"role": "user", "content": scoring_prompt}
-        ],
-        temperature=0
-    )
-    try:
-        return eval(chat.choices[0].message.content.strip())
-    except:
-        return {"Clarity": None, "Specificity": None, "Verbosity": None, "Comments": "Parse failed"}
+    chat = client.chat.completions.create(**fit_request({
+        "model": "gpt-4",
+        "messages": judge_template.render(prompt=prompt, response=response),
+        "temperature": 0
+    }))
+    return score_parser.parse_or_default(chat.choices[0].message.content, comment="Parse failed")
 
 # ---------------------------------------
 #%%
 # Run All Evaluations
 # ---------------------------------------
 
-results = []
+# Rows stream to disk as they complete; the charts below read them back
+results_path = os.getenv("DASHBOARD_RESULTS_PATH", "09_model_eval_results.jsonl")
+sink = ResultSink(results_path)
 
 for prompt in prompts:
     for model in models:
         print(f"⏳ Running {model} on: {prompt[:40]}...")
-        response = get_response(prompt, model)
-        gpt_score = score_with_gpt(prompt, response)
+        with instrumentation.span("evaluate") as row_span:
+            with instrumentation.span("generate", stage="generate"):
+                response, timings = get_timed_response(prompt, model)
+            with instrumentation.span("judge", stage="judge"):
+                gpt_score = score_with_gpt(prompt, response)
         human_score = human_scores.get((prompt, model), {})
 
-        results.append({
+        sink.write({
             "Prompt": prompt,
             "Model": model,
             "Response": response,
@@ -117,17 +112,28 @@ for prompt in prompts:
             "Human_Clarity": human_score.get("Clarity"),
             "Human_Specificity": human_score.get("Specificity"),
             "Human_Verbosity": human_score.get("Verbosity"),
-            "Word_Count": count_words(response),
-            "Sentence_Count": count_sentences(response)
+            **timings,
+            **row_span.row()
         })
 
-df = pd.DataFrame(results)
+sink.close()
+
+# Text metrics for the whole Response column at once (Word_Count, Sentence_Count, Token_Count, ...);
+# only these get underscored names, the timing and usage columns keep their shared names
+from text_metrics import METRICS, add_text_metrics
+
+df = add_text_metrics(read_results(results_path), "Response")
+df = df.rename(columns={m: m.replace(" ", "_") for m in METRICS})
 
 # ---------------------------------------
 #%%
 # Charting
 # ---------------------------------------
 
+# Plotting libraries are heavy; import them only when we actually chart
+import matplotlib.pyplot as plt
+import seaborn as sns
+
 sns.set(style="whitegrid")
 
 def plot_metric(metric, source):
@@ -149,10 +155,28 @@ sns.boxplot(data=df, x="Model", y="Word_Count", hue="Prompt")
 plt.title("📝 Word Count by Model and Prompt")
 plt.show()
 
+# Latency Comparison (streamed runs only)
+if "TTFT (s)" in df:
+    plt.figure(figsize=(10, 6))
+    sns.barplot(data=df, x="Model", y="TTFT (s)", hue="Prompt")
+    plt.title("⏱️ Time to First Token by Model and Prompt")
+    plt.ylabel("Seconds")
+    plt.show()
+
 # ---------------------------------------
 #%%
 # Export
 # ---------------------------------------
 
+# Spend and latency per stage and model next to the dashboard data
+usage = instrumentation.summary(by=["stage", "model"])
+print("📊 Usage:")
+print(usage.to_string(index=False))
+
 df.to_csv("09_model_eval_dashboard_data.csv", index=False)
-print("📁 Exported to 09_model_eval_dashboard_data.csv")
+usage.to_csv("09_model_eval_usage.csv", index=False)
+print("📁 Exported to 09_model_eval_dashboard_data.csv and 09_model_eval_usage.csv")
+print("💾 Cache:", client.cache.stats())
+print("🛡️ Retries:", resilient.stats())
+print("🔍 Score parsing:", score_parser.stats())
+print("🧩 Prompt prefixes:", templates.report())
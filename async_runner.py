@@ -0,0 +1,111 @@
+# ⚡ async_runner.py — Concurrent Execution for Prompt × Model Grids
+#
+# Fans out generate → score jobs with asyncio instead of looping one pair at a
+# time with a fixed sleep. Concurrency is capped by a semaphore and each model
+# gets its own token buckets for requests/min and tokens/min.
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from token_planner import predict_tokens
+
+# ---------------------------------------
+# Token bucket rate limiting
+# ---------------------------------------
+
+class TokenBucket:
+    # `rate_per_min` units refill continuously; bursts are capped at `capacity`
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity or rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the whole bucket would wait forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class ModelRateLimiter:
+    # limits: {"gpt-4": {"rpm": 500, "tpm": 30000}, ...}; unknown models use `default`
+    def __init__(self, limits=None, default=None):
+        self.limits = limits or {}
+        self.default = default or {"rpm": 500, "tpm": 90000}
+        self._buckets = {}
+
+    def _buckets_for(self, model):
+        if model not in self._buckets:
+            limit = {**self.default, **self.limits.get(model, {})}
+            self._buckets[model] = (TokenBucket(limit["rpm"]), TokenBucket(limit["tpm"]))
+        return self._buckets[model]
+
+    async def acquire(self, model, tokens):
+        requests, token_bucket = self._buckets_for(model)
+        await requests.acquire(1)
+        await token_bucket.acquire(tokens)
+
+
+# ---------------------------------------
+# Grid runner
+# ---------------------------------------
+
+_loop = None
+
+
+def run_sync(coro):
+    # Like asyncio.run, but every call reuses one loop per process: the pooled async
+    # connections from client_factory are bound to the loop that opened them
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+    return _loop.run_until_complete(coro)
+
+
+async def run_grid(items, worker, concurrency=8, on_result=None):
+    # Runs `await worker(item)` for every item with at most `concurrency` in flight.
+    # Results come back in input order; a failed item yields its exception instead
+    # of cancelling the rest of the grid. With `on_result`, each outcome is handed
+    # to the callback as it completes and not kept in the returned list.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index, item):
+        async with semaphore:
+            try:
+                result = await worker(item)
+            except Exception as e:
+                result = e
+        if on_result:
+            on_result(index, item, result)
+            return None
+        return result
+
+    return await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items)))
+
+
+class RateLimitedChat:
+    # Wraps an AsyncOpenAI client so every chat call waits for its model's budget
+    def __init__(self, client, limiter=None):
+        self.client = client
+        self.limiter = limiter or ModelRateLimiter()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        await self.limiter.acquire(request["model"], predict_tokens(request))
+        return await self.client.chat.completions.create(**request)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
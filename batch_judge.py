@@ -0,0 +1,119 @@
+# ⚖️ batch_judge.py — Score Several Responses in One Evaluator Call
+#
+# The per-item judges (score_response in 05, self_score in 08, score_with_gpt
+# in 09) spend one gpt-4 call per response. BatchJudge packs up to
+# `batch_size` responses to the same prompt into a single request, tags each
+# with a stable id, and asks for a JSON array of scores back. Any item the
+# judge skips or mangles is re-scored with the one-at-a-time fallback.
+#
+#   judge = BatchJudge(client, ["Clarity", "Specificity", "Verbosity"], batch_size=5,
+#                      score_one=self_score, parser=score_parser)
+#   scores = judge.score(prompt, {"cell-1": response_1, "cell-2": response_2})
+
+from prompt_templates import JUDGE_RUBRIC, register_judge
+from score_parser import ScoreParser
+
+# The shared judge rubric (prompt_templates), plus how to lay out several answers.
+# Rubric and output format are static per criteria list, so they lead the prompt
+# (system message) and the responses being judged come last.
+BATCH_RUBRIC = JUDGE_RUBRIC + """
+
+Several responses are listed below, each under its own id. Grade each response
+independently and return only a JSON array with one such object per response,
+tagged with its "id" (e.g. "id": "R1"), in any order."""
+
+
+def judge_template(criteria, evaluator="You are a strict evaluator of model outputs."):
+    return register_judge("batch-judge", criteria, evaluator=evaluator, rubric=BATCH_RUBRIC, user="{batch}")
+
+
+def build_batch_prompt(prompt, items):
+    # items: [(id, response), ...]
+    blocks = "\n\n".join(f"### Response {item_id}\n{response}" for item_id, response in items)
+    return f"""Evaluate each response to this prompt independently:
+Prompt: "{prompt}"
+
+{blocks}"""
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BatchJudge:
+    def __init__(self, client, criteria, model="gpt-4", batch_size=5, score_one=None,
+                 tokens_per_item=120, parser=None):
+        self.client = client
+        self.criteria = list(criteria)
+        self.model = model
+        self.batch_size = batch_size
+        self.score_one = score_one
+        self.tokens_per_item = tokens_per_item
+        # Share the caller's parser so its stats cover batched and single parses alike
+        self.parser = parser or ScoreParser(criteria)
+        self.template = judge_template(self.criteria)
+        self.items = 0
+        self.judge_calls = 0
+        self.single_calls = 0
+        self.fallback_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def _track_usage(self, response):
+        usage = getattr(response, "usage", None)
+        if usage:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def _judge(self, prompt, chunk):
+        # Ids are local to the request ("R1", "R2", ...) so the judge never sees caller keys
+        ids = {f"R{i + 1}": key for i, (key, _) in enumerate(chunk)}
+        tagged = [(local_id, response) for local_id, (_, response) in zip(ids, chunk)]
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=self.template.render(batch=build_batch_prompt(prompt, tagged)),
+            temperature=0,
+            max_tokens=self.tokens_per_item * len(chunk)
+        )
+        self.judge_calls += 1
+        self._track_usage(response)
+        parsed = self.parser.parse_many(response.choices[0].message.content)
+        return {ids[local_id]: scores for local_id, scores in parsed.items() if local_id in ids}
+
+    def score(self, prompt, responses):
+        # responses: {key: response text} → {key: scores}
+        items = list(responses.items())
+        self.items += len(items)
+        scores = {}
+        for chunk in _chunks(items, self.batch_size):
+            # A lone leftover item gains nothing from the batched prompt
+            if len(chunk) == 1 and self.score_one:
+                key, response = chunk[0]
+                scores[key] = self.score_one(prompt, response)
+                self.single_calls += 1
+                continue
+            scores.update(self._judge(prompt, chunk))
+
+        # Fall back to one-at-a-time scoring for anything the batched reply missed
+        for key, response in items:
+            if key in scores:
+                continue
+            if self.score_one:
+                scores[key] = self.score_one(prompt, response)
+                self.fallback_calls += 1
+            else:
+                scores[key] = self.parser.schema.empty("Missing from batched reply")
+        return scores
+
+    def stats(self):
+        calls = self.judge_calls + self.single_calls + self.fallback_calls
+        return {
+            "items": self.items,
+            "judge_calls": self.judge_calls,
+            "single_calls": self.single_calls,
+            "fallback_calls": self.fallback_calls,
+            "calls_per_item": calls / self.items if self.items else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens
+        }
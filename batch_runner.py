@@ -0,0 +1,175 @@
+# 📦 batch_runner.py — Batch API Execution with a Resumable Manifest
+#
+# Writes a whole grid of chat requests into one JSONL batch file, submits it
+# through the Batch API, polls until it finishes and streams the results back.
+# Progress lives in a local JSON manifest, so a crashed run picks up where it
+# stopped: finished items are replayed from the manifest, in-flight batches are
+# polled again, and only items that were never submitted get a new batch.
+#
+#   runner = BatchRunner(OpenAI(), "sweep_manifest.json")
+#   for key, result in runner.run({"cell-1": {"model": "gpt-4", "messages": [...]}}):
+#       print(key, completion_text(result))
+
+import json
+import os
+import tempfile
+import time
+
+from response_cache import request_key
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+class BatchItemError(Exception):
+    pass
+
+
+def completion_text(body):
+    return body["choices"][0]["message"]["content"]
+
+# ---------------------------------------
+# Manifest
+# ---------------------------------------
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.data = {"batches": {}, "results": {}, "errors": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+
+    @property
+    def batches(self):
+        return self.data["batches"]
+
+    @property
+    def results(self):
+        return self.data["results"]
+
+    @property
+    def errors(self):
+        return self.data["errors"]
+
+    def pending_ids(self):
+        return {cid for batch in self.batches.values()
+                if batch["status"] not in TERMINAL_STATUSES
+                for cid in batch["custom_ids"]}
+
+    def save(self):
+        # Write-then-rename so a crash mid-save never leaves a truncated manifest
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+            json.dump(self.data, f)
+        os.replace(f.name, self.path)
+
+# ---------------------------------------
+# Runner
+# ---------------------------------------
+
+class BatchRunner:
+    def __init__(self, client, manifest_path, endpoint="/v1/chat/completions",
+                 poll_interval=30, max_batch_size=50000, completion_window="24h"):
+        self.client = client
+        self.manifest = Manifest(manifest_path)
+        self.endpoint = endpoint
+        self.poll_interval = poll_interval
+        self.max_batch_size = max_batch_size
+        self.completion_window = completion_window
+
+    def _submit(self, custom_ids, bodies):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            for cid in custom_ids:
+                f.write(json.dumps({"custom_id": cid, "method": "POST",
+                                    "url": self.endpoint, "body": bodies[cid]}) + "\n")
+        try:
+            with open(f.name, "rb") as batch_file:
+                uploaded = self.client.files.create(file=batch_file, purpose="batch")
+        finally:
+            os.remove(f.name)
+
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window
+        )
+        self.manifest.batches[batch.id] = {
+            "status": batch.status,
+            "input_file_id": uploaded.id,
+            "custom_ids": list(custom_ids)
+        }
+        self.manifest.save()
+        print(f"📤 Submitted batch {batch.id} with {len(custom_ids)} requests")
+
+    def _collect(self, batch_id, batch):
+        # Returns the custom_ids that finished (successfully or not) in this batch
+        finished = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                cid = record["custom_id"]
+                response = record.get("response") or {}
+                if response.get("status_code") == 200:
+                    self.manifest.results[cid] = response["body"]
+                else:
+                    self.manifest.errors[cid] = record.get("error") or response.get("body")
+                finished.append(cid)
+
+        # Anything the batch never reported on is treated as failed for this run
+        for cid in self.manifest.batches[batch_id]["custom_ids"]:
+            if cid not in self.manifest.results and cid not in self.manifest.errors:
+                self.manifest.errors[cid] = {"message": f"batch {batch.status}"}
+                finished.append(cid)
+
+        self.manifest.batches[batch_id]["status"] = batch.status
+        self.manifest.save()
+        return finished
+
+    def run(self, requests):
+        # requests: {key: chat request body}; yields (key, response body or BatchItemError)
+        by_id = {}
+        for key, body in requests.items():
+            by_id.setdefault(request_key("chat.completions", body), []).append(key)
+        bodies = {request_key("chat.completions", body): body for body in requests.values()}
+
+        def emit(cid):
+            result = self.manifest.results.get(cid)
+            if result is None:
+                result = BatchItemError(self.manifest.errors.get(cid))
+            for key in by_id.get(cid, []):
+                yield key, result
+
+        # 1. Replay anything already finished in an earlier run
+        for cid in list(by_id):
+            if cid in self.manifest.results:
+                yield from emit(cid)
+
+        # 2. Submit items that are neither finished nor in flight (earlier errors get retried)
+        in_flight = self.manifest.pending_ids()
+        todo = [cid for cid in by_id if cid not in self.manifest.results and cid not in in_flight]
+        for cid in todo:
+            self.manifest.errors.pop(cid, None)
+        for start in range(0, len(todo), self.max_batch_size):
+            self._submit(todo[start:start + self.max_batch_size], bodies)
+
+        # 3. Poll every open batch and stream results as each one completes
+        while True:
+            open_batches = [bid for bid, b in self.manifest.batches.items()
+                            if b["status"] not in TERMINAL_STATUSES and set(b["custom_ids"]) & by_id.keys()]
+            if not open_batches:
+                break
+            for batch_id in open_batches:
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in TERMINAL_STATUSES:
+                    print(f"📥 Batch {batch_id} {batch.status}")
+                    for cid in self._collect(batch_id, batch):
+                        yield from emit(cid)
+                elif batch.status != self.manifest.batches[batch_id]["status"]:
+                    self.manifest.batches[batch_id]["status"] = batch.status
+                    self.manifest.save()
+            if any(self.manifest.batches[bid]["status"] not in TERMINAL_STATUSES for bid in open_batches):
+                time.sleep(self.poll_interval)
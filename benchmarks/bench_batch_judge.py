@@ -0,0 +1,176 @@
+# ⚖️ bench_batch_judge.py — Batched vs One-at-a-Time Judging
+#
+# Scores the same set of responses twice, once per item and once with
+# BatchJudge, then compares agreement between the two and the cost per item.
+#
+#   python -m benchmarks.bench_batch_judge                 # local stub judge
+#   python -m benchmarks.bench_batch_judge --live          # real API (OPENAI_API_KEY)
+#   python -m benchmarks.bench_batch_judge --batch-sizes 2 5 10 --drop-rate 0.1
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+from openai import OpenAI
+
+from batch_judge import BatchJudge
+from prompt_templates import register_judge
+from score_parser import ScoreParser
+from stub_server import StubServer
+
+CRITERIA = ["Clarity", "Specificity", "Verbosity"]
+
+PROMPT = "Describe the benefits of performance fabric in furniture design."
+RESPONSES = [
+    "Performance fabric resists stains and spills, so sofas stay clean longer.",
+    "It is durable, fade-resistant and easy to clean, which suits busy homes with pets and kids.",
+    "Good stuff.",
+    "Performance fabrics are engineered textiles: tightly woven, often solution-dyed, and treated "
+    "to repel liquids, which makes them ideal for dining chairs, sectionals and outdoor seating.",
+    "They cost more up front but last longer, and many are now PFAS-free.",
+    "Stain resistance, moisture repellency, abrasion resistance, UV stability.",
+    "Furniture designers like it because it looks like linen or velvet but behaves like canvas.",
+    "Less cleaning, longer life, more design freedom.",
+]
+
+# ---------------------------------------
+# Stub judge: deterministic scores per response text
+# ---------------------------------------
+
+def _stub_scores(text):
+    digest = hashlib.sha256(text.strip().encode()).digest()
+    return {c: 3 + digest[i] % 7 for i, c in enumerate(CRITERIA)}
+
+
+def make_stub_reply(drop_rate):
+    def reply(body):
+        content = body["messages"][-1]["content"]
+        blocks = re.findall(r"### Response (R\d+)\n(.*?)(?=\n\n### Response |\Z)", content, re.S)
+        if blocks:
+            entries = []
+            for item_id, text in blocks:
+                # Simulate a judge that occasionally skips an item
+                if int(hashlib.sha256(item_id.encode() + text.encode()).hexdigest(), 16) % 1000 < drop_rate * 1000:
+                    continue
+                entries.append({"id": item_id, **_stub_scores(text), "Comments": "stub"})
+            return json.dumps(entries)
+        text = content.split("Response:\n", 1)[1]
+        return json.dumps({**_stub_scores(text), "Comments": "stub"})
+    return reply
+
+# ---------------------------------------
+# Usage-counting client
+# ---------------------------------------
+
+class CountingClient:
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **request):
+        response = self.client.chat.completions.create(**request)
+        self.calls += 1
+        if response.usage:
+            self.prompt_tokens += response.usage.prompt_tokens
+            self.completion_tokens += response.usage.completion_tokens
+        return response
+
+
+def single_score_fn(client, parser):
+    judge = register_judge("judge", CRITERIA)
+
+    def score_one(prompt, response):
+        reply = client.chat.completions.create(
+            model="gpt-4",
+            messages=judge.render(prompt=prompt, response=response),
+            temperature=0,
+            max_tokens=300
+        )
+        return parser.parse_or_default(reply.choices[0].message.content)
+    return score_one
+
+
+def cost(counter, items, input_price, output_price):
+    dollars = (counter.prompt_tokens * input_price + counter.completion_tokens * output_price) / 1e6
+    return {
+        "calls_per_item": counter.calls / items,
+        "tokens_per_item": (counter.prompt_tokens + counter.completion_tokens) / items,
+        "usd_per_item": dollars / items
+    }
+
+
+def agreement(reference, candidate):
+    diffs, exact = [], 0
+    for key, ref in reference.items():
+        got = candidate[key]
+        for c in CRITERIA:
+            if ref[c] is None or got[c] is None:
+                continue
+            diffs.append(abs(ref[c] - got[c]))
+            exact += ref[c] == got[c]
+    return {
+        "mean_abs_diff": sum(diffs) / len(diffs) if diffs else None,
+        "exact_match_rate": exact / len(diffs) if diffs else None
+    }
+
+# ---------------------------------------
+# Main
+# ---------------------------------------
+
+def run(client, batch_sizes, input_price, output_price):
+    responses = {f"item-{i}": text for i, text in enumerate(RESPONSES)}
+    parser = ScoreParser(CRITERIA)
+
+    single = CountingClient(client)
+    score_one = single_score_fn(single, parser)
+    start = time.perf_counter()
+    reference = {key: score_one(PROMPT, text) for key, text in responses.items()}
+    report = {"one_at_a_time": {**cost(single, len(responses), input_price, output_price),
+                                "seconds": time.perf_counter() - start}}
+
+    for size in batch_sizes:
+        batched = CountingClient(client)
+        judge = BatchJudge(batched, CRITERIA, batch_size=size, score_one=single_score_fn(batched, parser),
+                           parser=parser)
+        start = time.perf_counter()
+        scores = judge.score(PROMPT, responses)
+        report[f"batch_{size}"] = {
+            **cost(batched, len(responses), input_price, output_price),
+            **agreement(reference, scores),
+            "fallback_calls": judge.fallback_calls,
+            "seconds": time.perf_counter() - start
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batched and one-at-a-time judging.")
+    parser.add_argument("--live", action="store_true", help="Use the real API instead of the stub")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Stub only: share of items the judge skips")
+    parser.add_argument("--input-price", type=float, default=30.0, help="USD per 1M prompt tokens")
+    parser.add_argument("--output-price", type=float, default=60.0, help="USD per 1M completion tokens")
+    parser.add_argument("--json", help="Also write the report to this path")
+    args = parser.parse_args()
+
+    if args.live:
+        report = run(OpenAI(api_key=os.getenv("OPENAI_API_KEY")), args.batch_sizes,
+                     args.input_price, args.output_price)
+    else:
+        with StubServer(reply=make_stub_reply(args.drop_rate)) as server:
+            report = run(OpenAI(base_url=server.base_url, api_key="stub"), args.batch_sizes,
+                         args.input_price, args.output_price)
+
+    for mode, row in report.items():
+        print(f"{mode:>14}: " + ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                                          for k, v in row.items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,118 @@
+# 🏭 bench_client_startup.py — Startup Time and Per-Request Overhead
+#
+# 1. Startup: wall time of a fresh interpreter that imports what the notebooks
+#    used to import eagerly (pandas, matplotlib, seaborn, openai) and builds a
+#    client, versus one that only builds the pooled client from client_factory.
+# 2. Request overhead: per-request latency against a zero-latency local stub,
+#    sequentially and from a thread pool, for a new client per call, a shared
+#    default OpenAI() client, and the pooled factory client.
+#
+#   python -m benchmarks.bench_client_startup --requests 300 --threads 16
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+import client_factory
+from stub_server import StubServer
+
+STARTUP_SNIPPETS = {
+    "legacy_eager_imports": (
+        "import pandas, matplotlib.pyplot, seaborn, openai; openai.OpenAI(api_key='bench')"
+    ),
+    "pooled_factory": (
+        "import client_factory; client_factory.get_client()"
+    ),
+}
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+# ---------------------------------------
+# Startup
+# ---------------------------------------
+
+def time_startup(snippet, runs):
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench")}
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", snippet], check=True, env=env)
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples)}
+
+# ---------------------------------------
+# Request overhead
+# ---------------------------------------
+
+def time_requests(call, requests, threads):
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    wall = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            samples = list(pool.map(timed, range(requests)))
+    else:
+        samples = [timed(i) for i in range(requests)]
+    wall = time.perf_counter() - wall
+    return {
+        "mean_ms": 1000 * statistics.mean(samples),
+        "p95_ms": 1000 * sorted(samples)[int(0.95 * (len(samples) - 1))],
+        "requests_per_s": requests / wall
+    }
+
+
+def request_paths(base_url):
+    shared_default = OpenAI(base_url=base_url, api_key="bench", max_retries=0)
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["PROMPT_CACHE_DISABLE"] = "1"  # measure transport, not cache hits
+    client_factory.reset()
+    pooled = client_factory.get_client(raw=True)
+    wrapped = client_factory.get_client()
+
+    def new_client_per_call():
+        OpenAI(base_url=base_url, api_key="bench", max_retries=0).chat.completions.create(model="gpt-4", messages=MESSAGES)
+
+    return {
+        "new_client_per_call": new_client_per_call,
+        "shared_default_client": lambda: shared_default.chat.completions.create(model="gpt-4", messages=MESSAGES),
+        "pooled_factory_raw": lambda: pooled.chat.completions.create(model="gpt-4", messages=MESSAGES),
+        "pooled_factory_wrapped": lambda: wrapped.chat.completions.create(model="gpt-4", messages=MESSAGES),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark client startup and request overhead.")
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--json", help="Also write the report to this path")
+    args = parser.parse_args()
+
+    report = {"startup": {}, "sequential": {}, "threaded": {}}
+    for name, snippet in STARTUP_SNIPPETS.items():
+        report["startup"][name] = time_startup(snippet, args.startup_runs)
+
+    with StubServer() as server:
+        for name, call in request_paths(server.base_url).items():
+            call()  # warm up connections and lazy imports
+            report["sequential"][name] = time_requests(call, args.requests, 1)
+            report["threaded"][name] = time_requests(call, args.requests, args.threads)
+
+    for section, rows in report.items():
+        print(f"\n{section}")
+        for name, row in rows.items():
+            print(f"  {name:>24}: " + ", ".join(f"{k}={v:.3f}" for k, v in row.items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,217 @@
+# 🏋️ bench_eval_pipeline.py — Load Test of the Generate → Score → Record Pipeline
+#
+# Drives 05's own pipeline (eval_pipeline: the same client stack, answer and
+# judge templates and row logic; rows stream to a ResultSink, then the
+# DataFrame is built and text metrics added) against a local stub server, at
+# every combination of grid size and concurrency. Each scenario runs in a fresh interpreter so peak RSS and
+# CPU time belong to that scenario alone. Reports requests/sec, p50/p95/p99
+# request latency, peak RSS and CPU seconds per pipeline stage.
+#
+#   python -m benchmarks.bench_eval_pipeline --grid-sizes 100 1000 --concurrency 8 32 128
+#   python -m benchmarks.bench_eval_pipeline --cassette evals.cassette.gz --json nightly.json
+#   python -m benchmarks.bench_eval_pipeline --json today.json --compare nightly.json
+#
+# The stub serves canned replies (or a recorded cassette, see replay.py) with
+# --latency seconds per request, optionally lognormal with --latency-sigma.
+# 05's per-model quotas are lifted unless --quotas is given.
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOPICS = ["performance fabric", "velvet", "eco-friendly upholstery", "boucle", "leather care",
+          "outdoor cushions", "linen slipcovers", "mid-century sofas"]
+MODELS = ["gpt-3.5-turbo", "gpt-4"]
+CRITERIA = ["Clarity", "Specificity", "Relevance"]  # 05's
+
+# ---------------------------------------
+# One scenario (runs in its own process)
+# ---------------------------------------
+
+def grid(size):
+    # Distinct prompts so no layer can answer from a cache
+    return [(f"What should customers know about {TOPICS[i % len(TOPICS)]}? (variant {i})", MODELS[i % len(MODELS)])
+            for i in range(size)]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def run_scenario(grid_size, concurrency, results_path, quotas=False):
+    # 05's own stack and row logic (eval_pipeline); only the grid and the sink path differ
+    from async_runner import run_grid, run_sync
+    from eval_pipeline import RATE_LIMITS, build_eval_client, evaluate_row, register_eval_judge
+    from instrumentation import Instrumentation
+    from result_sink import ResultSink, read_results
+    from score_parser import ScoreParser
+    from text_metrics import add_text_metrics
+
+    cpu = {"parse": 0.0, "record": 0.0, "dataframe": 0.0, "metrics": 0.0}
+
+    class TimedParser(ScoreParser):
+        def parse_or_default(self, text, comment="Failed to parse"):
+            start = time.thread_time()
+            try:
+                return super().parse_or_default(text, comment)
+            finally:
+                cpu["parse"] += time.thread_time() - start
+
+    # Without --quotas the rate limiter stays in the stack but never throttles,
+    # so the numbers show the pipeline rather than 05's per-model quotas
+    unlimited = {"rpm": 10 ** 9, "tpm": 10 ** 12}
+    instrumentation = Instrumentation()
+    client, resilient = build_eval_client(concurrency, RATE_LIMITS if quotas else {},
+                                          None if quotas else unlimited, instrumentation)
+    judge = register_eval_judge(CRITERIA)
+    parser = TimedParser(CRITERIA)
+
+    async def evaluate(job):
+        prompt, model = job
+        return await evaluate_row(client, judge, parser, prompt, model)
+
+    failures = 0
+    with ResultSink(results_path) as sink:
+        def record(index, job, outcome):
+            nonlocal failures
+            if isinstance(outcome, Exception):
+                failures += 1
+                return
+            start = time.thread_time()
+            sink.write(outcome)
+            cpu["record"] += time.thread_time() - start
+
+        cpu_start = time.process_time()
+        wall = time.perf_counter()
+        run_sync(run_grid(grid(grid_size), evaluate, concurrency=concurrency, on_result=record))
+        wall = time.perf_counter() - wall
+
+    start = time.process_time()
+    df = read_results(results_path)
+    cpu["dataframe"] = time.process_time() - start
+    start = time.process_time()
+    add_text_metrics(df, "Raw_Response")
+    cpu["metrics"] = time.process_time() - start
+
+    # Per-call latency as the instrumentation layer saw it (what the caller waited)
+    latencies = [event["latency_s"] for event in instrumentation.events]
+    return {
+        "grid_size": grid_size,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "failed_rows": failures,
+        "wall_s": round(wall, 3),
+        "requests_per_s": round(len(latencies) / wall, 2),
+        "latency_ms": {f"p{int(q * 100)}": round(1000 * percentile(latencies, q), 2) for q in (0.5, 0.95, 0.99)},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "cpu_s": {"total": round(time.process_time() - cpu_start, 3),
+                  **{name: round(seconds, 4) for name, seconds in cpu.items()}}
+    }
+
+# ---------------------------------------
+# Stub server + scenario processes
+# ---------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(args):
+    port = free_port()
+    command = [sys.executable, os.path.join(REPO, "stub_server.py"), "--port", str(port),
+               "--latency", str(args.latency), "--latency-sigma", str(args.latency_sigma)]
+    if args.cassette:
+        command += ["--cassette", args.cassette, "--latency-mode", args.latency_mode]
+    stub = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return stub, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            time.sleep(0.1)
+    stub.kill()
+    raise RuntimeError("stub server did not start")
+
+
+def spawn_scenario(base_url, grid_size, concurrency, workdir, quotas=False):
+    env = {**os.environ, "OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "bench",
+           "OPENAI_POOL_SIZE": str(max(32, concurrency)), "PROMPT_CACHE_DISABLE": "1"}
+    env.pop("OPENAI_RECORD", None)
+    env.pop("SEMANTIC_CACHE", None)
+    scenario = json.dumps({"grid_size": grid_size, "concurrency": concurrency, "quotas": quotas,
+                           "results_path": os.path.join(workdir, f"rows_{grid_size}_{concurrency}.jsonl")})
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_eval_pipeline", "--scenario", scenario],
+                         cwd=REPO, env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(report, baseline_path):
+    # Ratios against a previous run: >1 throughput / <1 latency is better
+    with open(baseline_path) as f:
+        baseline = {(r["grid_size"], r["concurrency"]): r for r in json.load(f)["scenarios"]}
+    print(f"\nvs {baseline_path}")
+    for row in report["scenarios"]:
+        old = baseline.get((row["grid_size"], row["concurrency"]))
+        if old:
+            print(f"  grid={row['grid_size']:>6} c={row['concurrency']:>4}: "
+                  f"req/s ×{row['requests_per_s'] / old['requests_per_s']:.2f}  "
+                  f"p95 ×{row['latency_ms']['p95'] / old['latency_ms']['p95']:.2f}  "
+                  f"rss ×{row['peak_rss_mb'] / old['peak_rss_mb']:.2f}  "
+                  f"cpu ×{row['cpu_s']['total'] / old['cpu_s']['total']:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the generate → score → record pipeline.")
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub seconds per request (median)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal spread (0 = fixed)")
+    parser.add_argument("--cassette", help="Replay a recorded cassette instead of canned replies")
+    parser.add_argument("--latency-mode", default="recorded", choices=["recorded", "sampled", "fixed"])
+    parser.add_argument("--quotas", action="store_true", help="Keep 05's per-model rate limits")
+    parser.add_argument("--json", help="Also write the report to this path")
+    parser.add_argument("--compare", help="Previous --json report to compare against")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        spec = json.loads(args.scenario)
+        print(json.dumps(run_scenario(spec["grid_size"], spec["concurrency"], spec["results_path"],
+                                      spec.get("quotas", False))))
+        sys.exit(0)
+
+    stub, base_url = start_stub(args)
+    workdir = tempfile.mkdtemp(prefix="bench_eval_pipeline_")
+    report = {"stub": {"latency": args.latency, "latency_sigma": args.latency_sigma, "cassette": args.cassette},
+              "cpu_count": os.cpu_count(), "scenarios": []}
+    try:
+        for grid_size in args.grid_sizes:
+            for concurrency in args.concurrency:
+                row = spawn_scenario(base_url, grid_size, concurrency, workdir, args.quotas)
+                report["scenarios"].append(row)
+                print(f"grid={grid_size:>6} c={concurrency:>4}: {row['requests_per_s']:>8.1f} req/s  "
+                      f"p50/p95/p99={row['latency_ms']['p50']:.0f}/{row['latency_ms']['p95']:.0f}/"
+                      f"{row['latency_ms']['p99']:.0f} ms  rss={row['peak_rss_mb']:.0f} MB  "
+                      f"cpu={row['cpu_s']['total']:.2f}s (parse {row['cpu_s']['parse']:.3f}, "
+                      f"df {row['cpu_s']['dataframe']:.3f}, metrics {row['cpu_s']['metrics']:.3f})")
+    finally:
+        stub.terminate()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
@@ -0,0 +1,89 @@
+# 🔎 bench_vector_index.py — IVF vs Brute-Force Retrieval
+#
+# Builds a VectorIndex over synthetic clustered unit vectors, then measures
+# per-query latency of exact (brute-force) search and recall@k / latency of
+# the IVF index across nprobe values. Also reports insert throughput and IVF
+# build time. Everything runs locally on CPU.
+#
+#   python -m benchmarks.bench_vector_index --rows 200000 --dim 384 --nprobe 1 4 16 64
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex, normalize
+
+
+def synthetic_vectors(rows, dim, clusters, seed):
+    # Points scattered around random cluster centres, like embeddings of a topical corpus
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.normal(size=(clusters, dim)))
+    labels = rng.integers(0, clusters, rows)
+    return normalize(centres[labels] + 0.35 * rng.normal(size=(rows, dim)) / np.sqrt(dim) * 4)
+
+
+def timed_search(index, queries, k, **kwargs):
+    start = time.perf_counter()
+    results = index.search_vectors(queries, k, **kwargs)
+    elapsed = time.perf_counter() - start
+    return [set(ids.tolist()) for _, ids in results], 1000 * elapsed / len(queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark IVF recall/latency against brute-force search.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this path")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.rows, args.dim, args.clusters, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = normalize(vectors[rng.choice(args.rows, args.queries, replace=False)]
+                        + 0.1 * rng.normal(size=(args.queries, args.dim)) / np.sqrt(args.dim))
+
+    path = tempfile.mkdtemp(prefix="bench_vector_index_")
+    try:
+        index = VectorIndex(path, dim=args.dim)
+        start = time.perf_counter()
+        for offset in range(0, args.rows, 10000):
+            block = vectors[offset:offset + 10000]
+            index.add([""] * len(block), vectors=block)
+        report = {"rows": args.rows, "dim": args.dim,
+                  "insert_rows_per_s": args.rows / (time.perf_counter() - start)}
+
+        truth, brute_ms = timed_search(index, queries, args.k, exact=True)
+        report["brute_force_ms_per_query"] = brute_ms
+
+        start = time.perf_counter()
+        report["nlist"] = index.build_ivf(nlist=args.nlist)
+        report["ivf_build_s"] = time.perf_counter() - start
+
+        report["ivf"] = {}
+        for nprobe in args.nprobe:
+            found, ms = timed_search(index, queries, args.k, nprobe=nprobe)
+            recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+            report["ivf"][nprobe] = {"recall_at_k": float(recall), "ms_per_query": ms,
+                                     "speedup": brute_ms / ms}
+        index.close()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    print(f"rows={report['rows']} dim={report['dim']} nlist={report['nlist']}")
+    print(f"insert: {report['insert_rows_per_s']:.0f} rows/s, IVF build: {report['ivf_build_s']:.2f}s")
+    print(f"brute force: {report['brute_force_ms_per_query']:.2f} ms/query (recall 1.0)")
+    for nprobe, row in report["ivf"].items():
+        print(f"  nprobe={nprobe:>3}: recall@{args.k}={row['recall_at_k']:.3f}  "
+              f"{row['ms_per_query']:.2f} ms/query  ({row['speedup']:.1f}× faster)")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,139 @@
+# 🕸️ chain_graph.py — Concurrent Prompt Chains as a Step Graph
+#
+# Declares a prompt chain as named steps with dependencies and runs it with
+# asyncio: independent branches of one input run side by side, and many inputs
+# are pipelined through the graph, so item 2's first step overlaps item 1's
+# second step. Step outputs are memoized on (step, inputs), so repeated inputs
+# (or a rerun in the same session) don't pay for the same call twice.
+#
+#   graph = ChainGraph()
+#   graph.step("keywords", generate_keywords, inputs=["product"])
+#   graph.step("caption", generate_caption, inputs=["keywords"])
+#   results = graph.run_many([{"product": p} for p in products], concurrency=16)
+#   results[0]["caption"]
+#
+# Step functions take their inputs as keyword arguments and may be plain
+# functions (run in a thread pool, e.g. the sync OpenAI client) or coroutines.
+
+import asyncio
+import inspect
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from async_runner import run_grid, run_sync
+
+
+class ChainGraph:
+    def __init__(self):
+        self.steps = {}
+        self.calls = 0       # step functions actually executed
+        self.memo_hits = 0   # step results served from the memo
+        self._memo = {}
+        self._pending = {}
+
+    def step(self, name, fn, inputs=(), memoize=True):
+        # `inputs` name fields of the item or earlier steps; fn gets them as kwargs
+        if name in self.steps:
+            raise ValueError(f"Step '{name}' is already defined")
+        self.steps[name] = {"fn": fn, "inputs": tuple(inputs), "memoize": memoize}
+        self._order()  # fail fast on cycles
+        return self
+
+    def _order(self):
+        # Topological order of the steps; inputs that aren't steps come from the item
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError("Cycle in chain graph: " + " → ".join(path + [name]))
+            state[name] = "visiting"
+            for dep in self.steps[name]["inputs"]:
+                if dep in self.steps:
+                    visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.steps:
+            visit(name, [])
+        return order
+
+    def _memo_key(self, name, kwargs):
+        try:
+            return name, json.dumps(kwargs, sort_keys=True, default=str)
+        except TypeError:
+            return None
+
+    async def _call(self, name, kwargs, executor):
+        spec = self.steps[name]
+        key = self._memo_key(name, kwargs) if spec["memoize"] else None
+        if key in self._memo:
+            self.memo_hits += 1
+            return self._memo[key]
+        if key in self._pending:
+            # Concurrent duplicates share the call already in flight
+            self.memo_hits += 1
+            return await asyncio.shield(self._pending[key])
+
+        async def execute():
+            self.calls += 1
+            if inspect.iscoroutinefunction(spec["fn"]):
+                return await spec["fn"](**kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, partial(spec["fn"], **kwargs))
+
+        task = asyncio.ensure_future(execute())
+        if key is None:
+            return await task
+        self._pending[key] = task
+        try:
+            # Shielded so one item's cancellation doesn't cancel a call others share
+            result = await asyncio.shield(task)
+        finally:
+            self._pending.pop(key, None)
+        self._memo[key] = result  # failures are never memoized
+        return result
+
+    async def arun(self, item, executor=None):
+        # Returns the item's fields plus every step's output, keyed by step name
+        order = self._order()
+        missing = {dep for name in order for dep in self.steps[name]["inputs"]} - set(self.steps) - set(item)
+        if missing:
+            raise KeyError(f"Chain inputs missing from item: {sorted(missing)}")
+
+        tasks = {}
+
+        async def run_step(name):
+            deps = self.steps[name]["inputs"]
+            values = await asyncio.gather(*(tasks[d] for d in deps if d in tasks))
+            resolved = dict(zip([d for d in deps if d in tasks], values))
+            kwargs = {d: resolved[d] if d in resolved else item[d] for d in deps}
+            return await self._call(name, kwargs, executor)
+
+        # Every step starts at once and waits only on its own dependencies
+        for name in order:
+            tasks[name] = asyncio.ensure_future(run_step(name))
+        try:
+            outputs = await asyncio.gather(*tasks.values())
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {**item, **dict(zip(tasks, outputs))}
+
+    async def arun_many(self, items, concurrency=8, on_result=None):
+        # Items in flight are capped by run_grid; a failed item yields its exception
+        with ThreadPoolExecutor(max_workers=concurrency * max(1, len(self.steps))) as executor:
+            return await run_grid(items, partial(self.arun, executor=executor),
+                                  concurrency=concurrency, on_result=on_result)
+
+    def run(self, item):
+        return run_sync(self.arun(item))
+
+    def run_many(self, items, concurrency=8, on_result=None):
+        return run_sync(self.arun_many(list(items), concurrency, on_result))
+
+    def stats(self):
+        return {"steps": len(self.steps), "calls": self.calls, "memo_hits": self.memo_hits}
@@ -0,0 +1,159 @@
+# 🏭 client_factory.py — One Pooled OpenAI Client per Process
+#
+# Every notebook used to build its own OpenAI(...) at import time. This module
+# hands out process-wide clients that share one tuned HTTP connection pool
+# (keep-alive, and HTTP/2 when the `h2` package is installed), already wrapped
+# with retries (resilient_client), the response cache (response_cache) and
+# per-call token/cost/latency tracking (instrumentation).
+#
+# Nothing heavy is imported until the first client is requested, so scripts
+# that only generate start fast; analysis libraries (pandas, matplotlib,
+# seaborn) are imported by the notebooks in the cells that need them.
+#
+#   from client_factory import get_client
+#   client = get_client()
+#   client.chat.completions.create(model="gpt-4", messages=[...])
+#   client.resilient.stats()        # the retry layer: retries, throttles, latency histograms
+#
+# Tuning via environment:
+#   OPENAI_POOL_SIZE      max connections in the pool (default: 32)
+#   OPENAI_HTTP2          0 = turn HTTP/2 off (default: on when the h2 package is installed)
+#   OPENAI_TIMEOUT        request timeout in seconds (default: 60)
+#   OPENAI_KEEPALIVE      idle seconds before a pooled connection closes (default: 30)
+#   SEMANTIC_CACHE        1 = also serve near-duplicate prompts from semantic_cache (needs SEMANTIC_CACHE_MODEL)
+#   INSTRUMENT            0 = skip the instrumentation layer (see instrumentation.py for its settings)
+#   OPENAI_RECORD         cassette path: record every API response for offline replay (replay.py)
+
+import importlib.util
+import os
+import threading
+
+_lock = threading.RLock()  # builders nest (wrapped client → raw client → pool)
+_instances = {}
+
+
+def _settings():
+    # HTTP/2 needs the optional `h2` package; OPENAI_HTTP2=1 can't turn it on without it
+    http2 = os.getenv("OPENAI_HTTP2")
+    h2_installed = importlib.util.find_spec("h2") is not None
+    return {
+        "pool_size": int(os.getenv("OPENAI_POOL_SIZE", "32")),
+        "http2": h2_installed and http2 != "0",
+        "timeout": float(os.getenv("OPENAI_TIMEOUT", "60")),
+        "keepalive": float(os.getenv("OPENAI_KEEPALIVE", "30")),
+    }
+
+
+def _once(key, build):
+    with _lock:
+        if key not in _instances:
+            _instances[key] = build()
+        return _instances[key]
+
+# ---------------------------------------
+# HTTP pools
+# ---------------------------------------
+
+def http_client(asynchronous=False):
+    # Shared pool built on the SDK's own HTTP client classes (whatever httpx
+    # distribution the installed openai uses); also usable by other SDKs
+    # (e.g. ChatOpenAI(http_client=...))
+    def build():
+        import openai
+
+        settings = _settings()
+        limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=settings["pool_size"],
+            max_keepalive_connections=settings["pool_size"],
+            keepalive_expiry=settings["keepalive"]
+        )
+        timeout = openai.Timeout(settings["timeout"], connect=10.0)
+        cls = openai.DefaultAsyncHttpxClient if asynchronous else openai.DefaultHttpxClient
+        options = {"http2": True} if settings["http2"] else {}
+        return cls(limits=limits, timeout=timeout, follow_redirects=True, **options)
+
+    return _once(("http", asynchronous), build)
+
+# ---------------------------------------
+# OpenAI clients
+# ---------------------------------------
+
+def _recording_layer(client):
+    # Innermost, so cache hits and failed attempts are never recorded
+    path = os.getenv("OPENAI_RECORD")
+    if not path:
+        return client
+    import atexit
+    from replay import Cassette, RecordingClient
+
+    def build():
+        cassette = Cassette(path)
+        atexit.register(cassette.close)
+        return cassette
+
+    return RecordingClient(client, _once(("cassette", path), build))
+
+
+def _semantic_layer(client):
+    # Exact-match cache stays outermost; the semantic lookup only runs on its misses
+    if os.getenv("SEMANTIC_CACHE") != "1":
+        return client
+    if not os.getenv("SEMANTIC_CACHE_MODEL"):
+        # The hashing fallback is lexical: it misses paraphrases and hits on "good" vs "poor"
+        import warnings
+        warnings.warn("SEMANTIC_CACHE=1 ignored: set SEMANTIC_CACHE_MODEL to a local "
+                      "sentence-transformers model", stacklevel=2)
+        return client
+    from semantic_cache import SemanticCache, SemanticCachedClient
+    return SemanticCachedClient(client, _once("semantic-cache", SemanticCache.from_env))
+
+
+def _instrumented_layer(client):
+    # Outermost, so cache hits are counted and latency is what the caller waited
+    if os.getenv("INSTRUMENT") == "0":
+        return client
+    from instrumentation import InstrumentedClient, get_instrumentation
+    return InstrumentedClient(client, get_instrumentation())
+
+
+def _build(asynchronous, raw):
+    # One builder for both flavours: raw SDK client, or the full wrapper stack around it
+    name = "async-openai" if asynchronous else "openai"
+
+    def build_raw():
+        import openai
+        cls = openai.AsyncOpenAI if asynchronous else openai.OpenAI
+        return _recording_layer(cls(api_key=os.getenv("OPENAI_API_KEY"),
+                                    http_client=http_client(asynchronous), max_retries=0))
+
+    if raw:
+        return _once(name, build_raw)
+
+    def build():
+        from resilient_client import AIMDController, ResilientClient
+        from response_cache import CachedClient
+        # In-flight requests adapt between 1 and the pool size
+        pool_size = _settings()["pool_size"]
+        controller = AIMDController(initial=min(8, pool_size), maximum=pool_size)
+        resilient = ResilientClient(_build(asynchronous, raw=True), controller=controller)
+        client = _instrumented_layer(CachedClient(_semantic_layer(resilient)))
+        # Retry stats and latency histograms, whatever layers are stacked on top
+        client.resilient = resilient
+        return client
+
+    return _once(name + "+wrappers", build)
+
+
+def get_client(raw=False):
+    # raw=True skips the retry/cache wrappers (e.g. for files/batches or custom stacks)
+    return _build(False, raw)
+
+
+def get_async_client(raw=False):
+    return _build(True, raw)
+
+
+def reset():
+    # Drop cached instances (tests, or after fork in a worker process)
+    with _lock:
+        _instances.clear()
@@ -0,0 +1,179 @@
+# 📚 doc_stream.py — Streaming Loader + Splitter for Large Text Corpora
+#
+# TextLoader(...).load() followed by CharacterTextSplitter.split_documents reads
+# each file into one string and builds every chunk up front. This stage
+# memory-maps each file, walks it separator by separator and yields chunks
+# lazily, using the same rules as CharacterTextSplitter (split on `separator`,
+# merge pieces up to `chunk_size` characters, carry up to `chunk_overlap`
+# characters of trailing pieces into the next chunk, strip whitespace).
+#
+# Files, and slices of very large files, are split in parallel across a
+# process pool. Each slice ends at a separator, so the output matches
+# CharacterTextSplitter except at slice boundaries (every `segment_bytes`),
+# where a chunk ends early and carries no overlap. Use workers=1 for an exact,
+# single-process stream.
+#
+#   for chunk in stream_chunks("manuals/", chunk_size=300, chunk_overlap=30, workers=8):
+#       chunk.page_content, chunk.metadata["source"]
+
+import mmap
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Same two fields as a LangChain Document, without importing LangChain in the workers
+Chunk = namedtuple("Chunk", ["page_content", "metadata"])
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# ---------------------------------------
+# Splitting (CharacterTextSplitter rules)
+# ---------------------------------------
+
+def _join(pieces, separator):
+    text = separator.join(pieces).strip()
+    return text or None
+
+
+def merge_splits(splits, chunk_size=4000, chunk_overlap=200, separator="\n\n"):
+    # Streaming version of LangChain's TextSplitter._merge_splits: consumes an
+    # iterable of pieces and yields chunks as soon as they are complete
+    if chunk_overlap > chunk_size:
+        raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+    sep_len = len(separator)
+    current, total = deque(), 0
+    for piece in splits:
+        size = len(piece)
+        if current and total + size + sep_len > chunk_size:
+            text = _join(current, separator)
+            if text is not None:
+                yield text
+            # Drop pieces from the front until what's left fits the overlap budget
+            while total > chunk_overlap or (current and total + size + sep_len > chunk_size):
+                total -= len(current[0]) + (sep_len if len(current) > 1 else 0)
+                current.popleft()
+        current.append(piece)
+        total += size + (sep_len if len(current) > 1 else 0)
+    text = _join(current, separator)
+    if text is not None:
+        yield text
+
+
+def _iter_pieces(buffer, start, end, separator, encoding):
+    # Pieces between separators in buffer[start:end], decoded one at a time
+    sep = separator.encode(encoding)
+    pos = start
+    while pos < end:
+        hit = buffer.find(sep, pos, end) if sep else pos + 1
+        stop = end if hit == -1 else hit
+        if stop > pos:  # split() drops empty pieces
+            yield buffer[pos:stop].decode(encoding)
+        pos = stop + len(sep)
+
+
+def _segments(buffer, size, segment_bytes, separator, encoding):
+    # (start, end) byte ranges of about segment_bytes, each ending on a separator
+    sep = separator.encode(encoding)
+    start = 0
+    while start < size:
+        end = size
+        if segment_bytes and start + segment_bytes < size and sep:
+            hit = buffer.find(sep, start + segment_bytes)
+            end = size if hit == -1 else hit + len(sep)
+        yield start, end
+        start = end
+
+
+def _open_map(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_file_chunks(path, chunk_size=4000, chunk_overlap=200, separator="\n\n", encoding="utf-8",
+                     start=0, end=None):
+    # Lazily yields chunk strings for one file (or one byte range of it)
+    buffer = _open_map(path)
+    if buffer is None:
+        return
+    try:
+        pieces = _iter_pieces(buffer, start, len(buffer) if end is None else end, separator, encoding)
+        yield from merge_splits(pieces, chunk_size, chunk_overlap, separator)
+    finally:
+        buffer.close()
+
+
+def _split_segment(task):
+    # Process-pool worker: all chunks of one byte range
+    path, start, end, chunk_size, chunk_overlap, separator, encoding = task
+    return list(iter_file_chunks(path, chunk_size, chunk_overlap, separator, encoding, start, end))
+
+# ---------------------------------------
+# Corpus streaming
+# ---------------------------------------
+
+def iter_paths(source, pattern="**/*.txt"):
+    # A file, a directory (searched with `pattern`), or a list of either
+    if isinstance(source, (list, tuple)):
+        for item in source:
+            yield from iter_paths(item, pattern)
+        return
+    path = Path(source)
+    if path.is_dir():
+        yield from sorted(p for p in path.glob(pattern) if p.is_file())
+    else:
+        yield path
+
+
+def _tasks(source, pattern, segment_bytes, chunk_size, chunk_overlap, separator, encoding):
+    for path in iter_paths(source, pattern):
+        buffer = _open_map(path)
+        if buffer is None:
+            continue
+        try:
+            ranges = list(_segments(buffer, len(buffer), segment_bytes, separator, encoding))
+        finally:
+            buffer.close()
+        for start, end in ranges:
+            yield (str(path), start, end, chunk_size, chunk_overlap, separator, encoding)
+
+
+def stream_chunks(source, chunk_size=4000, chunk_overlap=200, separator="\n\n", encoding="utf-8",
+                  pattern="**/*.txt", workers=None, segment_bytes=SEGMENT_BYTES):
+    # Yields Chunk(page_content, metadata) in file order. With workers > 1, at most
+    # 2 × workers segments are split ahead of the consumer, so memory stays bounded.
+    workers = workers or os.cpu_count() or 1
+    counters = {}
+
+    def emit(path, texts):
+        for text in texts:
+            index = counters.get(path, 0)
+            counters[path] = index + 1
+            yield Chunk(text, {"source": path, "chunk": index})
+
+    if workers == 1:
+        for path in iter_paths(source, pattern):
+            yield from emit(str(path), iter_file_chunks(path, chunk_size, chunk_overlap, separator, encoding))
+        return
+
+    tasks = _tasks(source, pattern, segment_bytes, chunk_size, chunk_overlap, separator, encoding)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        window = deque()
+        for task in tasks:
+            window.append((task[0], pool.submit(_split_segment, task)))
+            if len(window) >= 2 * workers:
+                path, future = window.popleft()
+                yield from emit(path, future.result())
+        while window:
+            path, future = window.popleft()
+            yield from emit(path, future.result())
+
+
+def load_documents(source, chunk_size=4000, chunk_overlap=200, **kwargs):
+    # Same chunks as LangChain Documents, for code that needs the real class
+    from langchain_core.documents import Document
+
+    for chunk in stream_chunks(source, chunk_size, chunk_overlap, **kwargs):
+        yield Document(page_content=chunk.page_content, metadata=chunk.metadata)
@@ -0,0 +1,123 @@
+# 🧪 eval_pipeline.py — 05's Generate → Score Pipeline, Importable
+#
+# The client stack, the generate and judge calls and the per-row evaluation of
+# 05_automated_testing, in a module so the load-test benchmark
+# (benchmarks/bench_eval_pipeline.py) drives exactly the code the notebook runs.
+#
+#   client, resilient = build_eval_client(concurrency=16)
+#   judge = register_eval_judge(["Clarity", "Specificity", "Relevance"])
+#   row = await evaluate_row(client, judge, ScoreParser(criteria), prompt, "gpt-4")
+#
+# Rows carry the parsed scores, the prompt/model/response, stream timings when
+# streaming, and the tokens/cost/latency of every call made for the row.
+
+from async_runner import ModelRateLimiter, RateLimitedChat
+from client_factory import get_async_client
+from instrumentation import InstrumentedClient, get_instrumentation
+from prompt_templates import judge_example, register_judge, templates
+from response_cache import CachedClient
+from resilient_client import AIMDController, ResilientClient
+from streaming import astream_chat
+from token_planner import fit_request
+
+# Per-model quotas (requests/min, tokens/min)
+RATE_LIMITS = {
+    "gpt-3.5-turbo": {"rpm": 3500, "tpm": 90000},
+    "gpt-4": {"rpm": 500, "tpm": 30000}
+}
+
+# Compiled once, static content first (see prompt_templates)
+answer_template = templates.register("answer", "{prompt}", system="You are a helpful assistant.")
+
+# 05's own judge persona and rubric wording
+EVAL_JUDGE_RUBRIC = """Evaluate the following response to the prompt below. Score it from 1–10 on each of these criteria: {criteria}.
+
+Return the result as JSON like:
+{example}"""
+
+EVAL_JUDGE_USER = """Prompt:
+{prompt}
+
+Response:
+{response}"""
+
+
+def register_eval_judge(criteria, name="judge"):
+    return register_judge(name, criteria, evaluator="You are an evaluator that scores assistant responses.",
+                          rubric=EVAL_JUDGE_RUBRIC, user=EVAL_JUDGE_USER,
+                          example=judge_example(criteria, scores=[8, 7, 9], comment="Brief justification."))
+
+# -----------------------------------------
+# Client stack
+# -----------------------------------------
+
+def build_eval_client(concurrency=16, rate_limits=RATE_LIMITS, default_limit=None, instrumentation=None):
+    # Cache sits outside the retries so repeated requests cost neither quota nor money;
+    # every retry attempt goes back through the rate limiter. Instrumentation wraps it
+    # all and records tokens, cost, latency, retries and cache hits per call.
+    # Within the concurrency ceiling, the AIMD controller backs off on 429s and ramps up.
+    resilient = ResilientClient(
+        RateLimitedChat(get_async_client(raw=True), ModelRateLimiter(rate_limits, default_limit)),
+        controller=AIMDController(initial=min(4, concurrency), maximum=concurrency)
+    )
+    client = InstrumentedClient(CachedClient(resilient), instrumentation or get_instrumentation())
+    return client, resilient
+
+# -----------------------------------------
+# Generate a response from the model
+# -----------------------------------------
+
+async def generate_response(client, prompt, model, stream=False):
+    request = {
+        "model": model,
+        "messages": answer_template.render(prompt=prompt),
+        "temperature": 0.3,
+        "max_tokens": 300
+    }
+    if stream:
+        # Async iterator of tokens; timings are in .stats once it's consumed
+        return await astream_chat(client, **request)
+    response = await client.chat.completions.create(**request)
+    return response.choices[0].message.content
+
+# -----------------------------------------
+# Let GPT score each response
+# -----------------------------------------
+
+async def score_response(client, judge_template, prompt, response):
+    eval_response = await client.chat.completions.create(**fit_request({
+        "model": "gpt-4",
+        "messages": judge_template.render(prompt=prompt, response=response),
+        "temperature": 0,
+        "max_tokens": 300
+    }))
+    # A missing or malformed verdict is handled by score_parser.parse_or_default
+    return eval_response.choices[0].message.content
+
+# -----------------------------------------
+# One row of the grid
+# -----------------------------------------
+
+async def evaluate_row(client, judge_template, score_parser, prompt, model, stream=False):
+    instrumentation = client.instrumentation
+    timings = {}
+    # Every call below adds its tokens/cost/latency to the row span
+    with instrumentation.span("evaluate") as row_span:
+        with instrumentation.span("generate", stage="generate"):
+            if stream:
+                response_stream = await generate_response(client, prompt, model, stream=True)
+                response = await response_stream.consume()
+                timings = response_stream.stats.as_row()
+            else:
+                response = await generate_response(client, prompt, model)
+        with instrumentation.span("judge", stage="judge"):
+            evaluation = await score_response(client, judge_template, prompt, response)
+
+    # Parse evaluation JSON; a malformed reply keeps the row with empty scores
+    score_data = score_parser.parse_or_default(evaluation)
+    score_data["Prompt"] = prompt
+    score_data["Model"] = model
+    score_data["Raw_Response"] = response
+    score_data.update(timings)
+    score_data.update(row_span.row())
+    return score_data
@@ -0,0 +1,213 @@
+# 🎯 ground_truth.py — Tiered Ground-Truth Evaluation (Local Metrics First)
+#
+# Comparing every response to its expected answer with an LLM costs one gpt-4
+# call per item. Most items in a golden set are clear-cut, though: a response
+# that repeats the reference almost word for word is right, one that shares
+# nothing with it is wrong. GroundTruthEvaluator scores the whole dataset
+# locally first, in bulk:
+#
+#   Token F1          bag-of-words overlap (lowercased, articles dropped, SQuAD style)
+#   ROUGE-L           F1 of the longest common token subsequence
+#   Embedding Cosine  cosine of the two embeddings (HashingEmbedder by default)
+#
+# and combines them into a Local Score in [0, 1]. Items at or above
+# `pass_above` are marked correct and items at or below `fail_below` incorrect
+# without a judge call; only the ambiguous band in between goes to the LLM
+# comparer, with `concurrency` calls in flight.
+#
+#   evaluator = GroundTruthEvaluator(judge=llm_compare, pass_above=0.8, fail_below=0.25)
+#   df = evaluator.evaluate(prompts, responses, expected_answers)
+#   evaluator.stats()        # how many items needed the judge
+#
+# `judge(prompt, response, expected)` returns the comparer's text; its verdict is
+# read from a final "Verdict: correct | partially correct | incorrect" line.
+# GROUND_TRUTH_PASS / GROUND_TRUTH_FAIL set the default band and
+# GROUND_TRUTH_EMBED_MODEL picks a sentence-transformers model for the cosine.
+
+import contextvars
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from vector_index import HashingEmbedder, SentenceTransformerEmbedder, normalize
+
+WORD = re.compile(r"\w+")
+ARTICLES = {"a", "an", "the"}
+VERDICT = re.compile(r"Verdict:\W*(partially correct|correct|incorrect)", re.I)
+
+LOCAL_METRICS = ["Token F1", "ROUGE-L", "Embedding Cosine"]
+DEFAULT_WEIGHTS = {"Token F1": 1 / 3, "ROUGE-L": 1 / 3, "Embedding Cosine": 1 / 3}
+
+# ---------------------------------------
+# Local metrics (whole columns at once)
+# ---------------------------------------
+
+def _tokens(text):
+    return [w for w in WORD.findall(str(text or "").lower()) if w not in ARTICLES]
+
+
+def _token_ids(token_lists, vocab):
+    # Parallel arrays (row, token id) over every token of every text
+    ids = [vocab.setdefault(w, len(vocab)) for tokens in token_lists for w in tokens]
+    rows = np.repeat(np.arange(len(token_lists)), [len(tokens) for tokens in token_lists])
+    return rows, np.asarray(ids, dtype=np.int64)
+
+
+def token_f1(predictions, references):
+    return _token_f1([_tokens(t) for t in predictions], [_tokens(t) for t in references])
+
+
+def _token_f1(pred, ref):
+    # Bag-of-words F1 per pair; the overlap counts for all pairs come from one
+    # sorted intersection of (row, token) keys instead of a Counter per row
+    n = len(pred)
+    vocab = {}
+    pred_rows, pred_ids = _token_ids(pred, vocab)
+    ref_rows, ref_ids = _token_ids(ref, vocab)
+    width = max(len(vocab), 1)
+    pred_keys, pred_counts = np.unique(pred_rows * width + pred_ids, return_counts=True)
+    ref_keys, ref_counts = np.unique(ref_rows * width + ref_ids, return_counts=True)
+    common, a, b = np.intersect1d(pred_keys, ref_keys, assume_unique=True, return_indices=True)
+    overlap = np.bincount(common // width, weights=np.minimum(pred_counts[a], ref_counts[b]), minlength=n)
+    pred_len = np.array([len(t) for t in pred], dtype=float)
+    ref_len = np.array([len(t) for t in ref], dtype=float)
+    precision = overlap / np.maximum(pred_len, 1)
+    recall = overlap / np.maximum(ref_len, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        f1 = np.where(overlap > 0, 2 * precision * recall / (precision + recall), 0.0)
+    # Two empty texts agree perfectly
+    return np.where((pred_len == 0) & (ref_len == 0), 1.0, f1)
+
+
+def lcs_length(a, b):
+    # Bit-parallel LCS (Allison–Dix / Hyyrö): one big-int step per token of `a`
+    # instead of a len(a) × len(b) table
+    masks = {}
+    for k, token in enumerate(b):
+        masks[token] = masks.get(token, 0) | (1 << k)
+    full = (1 << len(b)) - 1
+    row = full
+    for token in a:
+        match = masks.get(token)
+        if match:
+            carry = row & match
+            row = ((row + carry) | (row - carry)) & full
+    return len(b) - row.bit_count()
+
+
+def rouge_l(predictions, references):
+    return _rouge_l([_tokens(t) for t in predictions], [_tokens(t) for t in references])
+
+
+def _rouge_l(pred_tokens, ref_tokens):
+    scores = np.zeros(len(pred_tokens))
+    for i, (pred, ref) in enumerate(zip(pred_tokens, ref_tokens)):
+        if not pred or not ref:
+            scores[i] = float(not pred and not ref)
+            continue
+        lcs = lcs_length(pred, ref)
+        if lcs:
+            precision, recall = lcs / len(pred), lcs / len(ref)
+            scores[i] = 2 * precision * recall / (precision + recall)
+    return scores
+
+
+def embedding_cosine(predictions, references, embed):
+    # One embedding batch per side, then a row-wise dot product of unit vectors
+    pred = normalize(embed([str(t or "") for t in predictions]))
+    ref = normalize(embed([str(t or "") for t in references]))
+    return np.clip(np.einsum("ij,ij->i", pred, ref), -1.0, 1.0).astype(float)
+
+
+def parse_verdict(text):
+    match = VERDICT.search(text or "")
+    return match.group(1).lower() if match else None
+
+# ---------------------------------------
+# Tiered evaluator
+# ---------------------------------------
+
+class GroundTruthEvaluator:
+    def __init__(self, judge=None, embed=None, pass_above=None, fail_below=None, weights=None, concurrency=8):
+        model = os.getenv("GROUND_TRUTH_EMBED_MODEL")
+        self.embed = embed or (SentenceTransformerEmbedder(model) if model else HashingEmbedder())
+        self.judge = judge
+        self.pass_above = pass_above if pass_above is not None else float(os.getenv("GROUND_TRUTH_PASS", "0.8"))
+        self.fail_below = fail_below if fail_below is not None else float(os.getenv("GROUND_TRUTH_FAIL", "0.25"))
+        if self.fail_below > self.pass_above:
+            raise ValueError("fail_below must not be above pass_above")
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.concurrency = concurrency
+        self.items = 0
+        self.judged = 0
+        self.local_seconds = 0.0
+        self.judge_seconds = 0.0
+
+    def local_scores(self, responses, references):
+        # DataFrame with one column per local metric plus the weighted Local Score
+        responses, references = list(responses), list(references)
+        pred, ref = [_tokens(t) for t in responses], [_tokens(t) for t in references]
+        scores = pd.DataFrame({
+            "Token F1": _token_f1(pred, ref),
+            "ROUGE-L": _rouge_l(pred, ref),
+            # Negative cosines carry no extra signal for "same answer?"
+            "Embedding Cosine": np.maximum(embedding_cosine(responses, references, self.embed), 0.0)
+        })
+        total = sum(self.weights.values())
+        scores["Local Score"] = sum(scores[m] * w for m, w in self.weights.items()) / total
+        return scores.round(4)
+
+    def tiers(self, local_score):
+        # "correct" / "incorrect" decided locally, "judge" for the ambiguous band
+        return np.select([local_score >= self.pass_above, local_score <= self.fail_below],
+                         ["correct", "incorrect"], "judge")
+
+    def _judge_all(self, jobs):
+        # jobs: [(prompt, response, expected)] → judge texts, in order
+        def ask(job):
+            try:
+                return self.judge(*job)
+            except Exception as e:
+                return f"Judge failed: {type(e).__name__}: {e}"
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, ask, job) for job in jobs]
+            return [future.result() for future in futures]
+
+    def evaluate(self, prompts, responses, references):
+        prompts, responses, references = list(prompts), list(responses), list(references)
+        start = time.perf_counter()
+        df = pd.DataFrame({"Prompt": prompts, "Response": responses, "Expected": references})
+        df = pd.concat([df, self.local_scores(responses, references)], axis=1)
+        tier = self.tiers(df["Local Score"].to_numpy())
+        df["Source"] = np.where(tier == "judge", "unjudged", "local")
+        df["Verdict"] = np.where(tier == "judge", None, tier)
+        df["Judge Comments"] = None
+        self.local_seconds += time.perf_counter() - start
+        self.items += len(df)
+
+        ambiguous = np.flatnonzero(tier == "judge")
+        if len(ambiguous) and self.judge is not None:
+            start = time.perf_counter()
+            texts = self._judge_all([(prompts[i], responses[i], references[i]) for i in ambiguous])
+            self.judge_seconds += time.perf_counter() - start
+            self.judged += len(ambiguous)
+            column = df.columns.get_loc
+            df.iloc[ambiguous, column("Source")] = "judge"
+            df.iloc[ambiguous, column("Judge Comments")] = texts
+            df.iloc[ambiguous, column("Verdict")] = [parse_verdict(text) for text in texts]
+        return df
+
+    def stats(self):
+        return {
+            "items": self.items,
+            "judged": self.judged,
+            "decided_locally": self.items - self.judged,
+            "judge_share": round(self.judged / self.items, 3) if self.items else None,
+            "local_seconds": round(self.local_seconds, 3),
+            "judge_seconds": round(self.judge_seconds, 3)
+        }
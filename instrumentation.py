@@ -0,0 +1,386 @@
+# 📊 instrumentation.py — Tokens, Cost, Latency and Spans for Every API Call
+#
+# InstrumentedClient wraps a client's create() calls (outermost, so cache hits
+# are seen too) and turns each call into a span: prompt/completion tokens from
+# `response.usage`, cost from a per-model price table, wall latency, retries
+# taken by resilient_client and whether response_cache answered it. Spans nest:
+# open one around a unit of work and every call inside it adds to its totals.
+#
+#   client = InstrumentedClient(CachedClient(ResilientClient(OpenAI())))   # client_factory does this
+#   with client.instrumentation.span("evaluate", stage="judge") as span:
+#       client.chat.completions.create(model="gpt-4", messages=[...])
+#   row.update(span.row())                            # API Calls, Prompt Tokens, ..., Cost USD
+#   client.instrumentation.summary(by=["stage", "model"])   # DataFrame for the results table
+#
+# Every finished call is also a structured log event (logger "instrumentation",
+# plus a JSONL file when INSTRUMENT_LOG is set), and finished spans can be
+# exported OpenTelemetry-style to the console or a file.
+#
+# Settings come from the environment:
+#   INSTRUMENT            0 = client_factory skips this layer (default: on)
+#   INSTRUMENT_LOG        JSONL file that gets one event per API call
+#   INSTRUMENT_SPANS      "console" or a JSONL path for finished spans
+#   INSTRUMENT_OTEL       1 = also emit spans through opentelemetry when it is installed
+#   INSTRUMENT_PRICES     JSON {"model": [input, output]} in USD per 1M tokens, merged over PRICES
+
+import contextvars
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+logger = logging.getLogger("instrumentation")
+
+# USD per 1M (prompt, completion) tokens; the longest matching model prefix wins
+PRICES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-32k": (60.0, 120.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "gpt-3.5-turbo-instruct": (1.5, 2.0),
+}
+
+_current = contextvars.ContextVar("instrumentation_span", default=None)
+
+
+def price_for(model, prices=PRICES):
+    matches = [name for name in prices if model and model.startswith(name)]
+    return prices[max(matches, key=len)] if matches else None
+
+
+def cost_usd(model, prompt_tokens, completion_tokens, prices=PRICES):
+    price = price_for(model, prices)
+    if price is None or prompt_tokens is None:
+        return None
+    return (prompt_tokens * price[0] + (completion_tokens or 0) * price[1]) / 1e6
+
+# ---------------------------------------
+# Hooks for the layers underneath
+# ---------------------------------------
+
+def annotate(**attributes):
+    # Called by inner wrappers (cache, retries) while a call span is active
+    span = _current.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+def increment(name, amount=1):
+    span = _current.get()
+    if span is not None:
+        span.attributes[name] = span.attributes.get(name, 0) + amount
+
+# ---------------------------------------
+# Spans
+# ---------------------------------------
+
+TOTALS = ("calls", "errors", "prompt_tokens", "completion_tokens", "cost_usd", "latency_s", "retries", "cache_hits")
+
+
+class Span:
+    def __init__(self, name, attributes=None, parent=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time = None
+        self.status = "ok"
+        self.totals = dict.fromkeys(TOTALS, 0)
+        self._started = time.perf_counter()
+        self._otel = None
+
+    @property
+    def duration(self):
+        return (self.end_time or time.time()) - self.start_time
+
+    def inherited(self):
+        # Attributes of enclosing spans (e.g. stage="judge"), nearest first
+        merged, span = {}, self.parent
+        while span is not None:
+            merged = {**span.attributes, **merged}
+            span = span.parent
+        return merged
+
+    def row(self):
+        # Totals of every call made inside this span, as result-table columns
+        return {
+            "API Calls": self.totals["calls"],
+            "Prompt Tokens": self.totals["prompt_tokens"],
+            "Completion Tokens": self.totals["completion_tokens"],
+            "Cost USD": round(self.totals["cost_usd"], 6),
+            "API Seconds": round(self.totals["latency_s"], 4)
+        }
+
+    def export(self):
+        # OpenTelemetry-like JSON shape
+        return {
+            "name": self.name,
+            "context": {"trace_id": self.trace_id, "span_id": self.span_id},
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "status": self.status,
+            "attributes": {**self.attributes, **{f"totals.{k}": v for k, v in self.totals.items() if v}}
+        }
+
+# ---------------------------------------
+# Collector
+# ---------------------------------------
+
+class Instrumentation:
+    def __init__(self, prices=None, log_path=None, span_exporter=None, otel=False, max_events=100000):
+        self.prices = {**PRICES, **(prices or {})}
+        self.log_path = log_path
+        self.span_exporter = span_exporter  # "console", a path, or None
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._tracer = None
+        if otel:
+            try:
+                from opentelemetry import trace
+                self._tracer = trace.get_tracer("prompt-engineering")
+            except ImportError:
+                logger.warning("INSTRUMENT_OTEL=1 but opentelemetry is not installed; using the built-in exporter")
+
+    @classmethod
+    def from_env(cls):
+        prices = os.getenv("INSTRUMENT_PRICES")
+        return cls(
+            prices={k: tuple(v) for k, v in json.loads(prices).items()} if prices else None,
+            log_path=os.getenv("INSTRUMENT_LOG"),
+            span_exporter=os.getenv("INSTRUMENT_SPANS"),
+            otel=os.getenv("INSTRUMENT_OTEL") == "1"
+        )
+
+    def _start(self, name, attributes):
+        span = Span(name, attributes, parent=_current.get())
+        if self._tracer is not None:
+            from opentelemetry import trace
+            parent = span.parent._otel if span.parent else None
+            context = trace.set_span_in_context(parent) if parent is not None else None
+            span._otel = self._tracer.start_span(name, context=context)
+        return span
+
+    def _end(self, span):
+        span.end_time = time.time()
+        if span._otel is not None:
+            for key, value in span.export()["attributes"].items():
+                if isinstance(value, (str, bool, int, float)):
+                    span._otel.set_attribute(key, value)
+            span._otel.end()
+        if self.span_exporter:
+            line = json.dumps(span.export(), default=str)
+            with self._lock:
+                if self.span_exporter == "console":
+                    print(line, file=sys.stderr)
+                else:
+                    with open(self.span_exporter, "a", encoding="utf-8") as f:
+                        f.write(line + "\n")
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self._start(name, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            _current.reset(token)
+            self._end(span)
+
+    # ---------------------------------------
+    # API calls
+    # ---------------------------------------
+
+    def start_call(self, endpoint, request):
+        span = self._start(endpoint, {"model": request.get("model"), "stream": bool(request.get("stream"))})
+        return span, _current.set(span)
+
+    def finish_call(self, span, usage=None, error=None):
+        attributes = span.attributes
+        prompt_tokens = getattr(usage, "prompt_tokens", None) if usage is not None else None
+        completion_tokens = getattr(usage, "completion_tokens", None) if usage is not None else None
+        cache_hit = attributes.get("cache") in ("hit", "semantic")
+        # A cached answer costs nothing this time
+        cost = 0.0 if cache_hit else cost_usd(attributes.get("model"), prompt_tokens, completion_tokens, self.prices)
+        if error is not None:
+            span.status = "error"
+            attributes["error"] = type(error).__name__
+        attributes.update({"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                           "cost_usd": cost, "latency_s": round(time.perf_counter() - span._started, 6)})
+        event = {**span.inherited(), **attributes, "name": span.name, "trace_id": span.trace_id,
+                 "span_id": span.span_id, "time": span.start_time, "status": span.status}
+        with self._lock:
+            self.events.append(event)
+            node = span
+            while node is not None:
+                totals = node.totals
+                totals["calls"] += 1
+                totals["errors"] += error is not None
+                totals["prompt_tokens"] += prompt_tokens or 0
+                totals["completion_tokens"] += completion_tokens or 0
+                totals["cost_usd"] += cost or 0.0
+                totals["latency_s"] += attributes["latency_s"]
+                totals["retries"] += attributes.get("retries", 0)
+                totals["cache_hits"] += cache_hit
+                node = node.parent
+        self._end(span)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(event, default=str))
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    # ---------------------------------------
+    # Aggregates
+    # ---------------------------------------
+
+    def summary(self, by="model"):
+        # One row per group: calls, tokens, spend, latency percentiles, retries, cache hit rate
+        import pandas as pd
+
+        by = [by] if isinstance(by, str) else list(by)
+        events = pd.DataFrame(list(self.events))
+        if events.empty:
+            return pd.DataFrame()
+        for column in by:
+            if column not in events:
+                events[column] = None
+        events["retries"] = events.get("retries", pd.Series(0, index=events.index)).fillna(0)
+        events["cache_hit"] = events.get("cache", pd.Series(None, index=events.index)).isin(["hit", "semantic"])
+        events["error"] = events["status"] == "error"
+        grouped = events.fillna({c: "—" for c in by}).groupby(by)
+        table = pd.DataFrame({
+            "Calls": grouped.size(),
+            "Errors": grouped["error"].sum(),
+            "Prompt Tokens": grouped["prompt_tokens"].sum(),
+            "Completion Tokens": grouped["completion_tokens"].sum(),
+            "Cost USD": grouped["cost_usd"].sum().round(6),
+            "Latency p50 (s)": grouped["latency_s"].quantile(0.5).round(4),
+            "Latency p95 (s)": grouped["latency_s"].quantile(0.95).round(4),
+            "Retries": grouped["retries"].sum().astype(int),
+            "Cache Hit Rate": grouped["cache_hit"].mean().round(3)
+        })
+        return table.reset_index()
+
+    def totals(self):
+        spent = list(self.events)
+        return {
+            "calls": len(spent),
+            "prompt_tokens": sum(e.get("prompt_tokens") or 0 for e in spent),
+            "completion_tokens": sum(e.get("completion_tokens") or 0 for e in spent),
+            "cost_usd": round(sum(e.get("cost_usd") or 0.0 for e in spent), 6),
+            "retries": sum(e.get("retries", 0) for e in spent),
+            "cache_hits": sum(e.get("cache") in ("hit", "semantic") for e in spent)
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"totals": self.totals(), "events": list(self.events)}, f, default=str)
+
+
+_default = None
+
+def get_instrumentation():
+    global _default
+    if _default is None:
+        _default = Instrumentation.from_env()
+    return _default
+
+# ---------------------------------------
+# Client wrapper
+# ---------------------------------------
+
+def _instrumented(create, endpoint, instrumentation):
+    # Streams finish their span when the caller has read the last chunk (usage rides on
+    # it), fails, or stops early (break / close()); an early stop usually has no usage yet
+    def wrap_stream(stream, span):
+        usage, error = None, None
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+        except GeneratorExit:
+            span.attributes["closed_early"] = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            instrumentation.finish_call(span, usage, error)
+
+    async def awrap_stream(stream, span):
+        usage, error = None, None
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+        except GeneratorExit:
+            span.attributes["closed_early"] = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            instrumentation.finish_call(span, usage, error)
+
+    if inspect.iscoroutinefunction(inspect.unwrap(create)):
+        async def acreate(**request):
+            span, token = instrumentation.start_call(endpoint, request)
+            try:
+                response = await create(**request)
+            except Exception as error:
+                instrumentation.finish_call(span, error=error)
+                raise
+            finally:
+                _current.reset(token)
+            if request.get("stream"):
+                return awrap_stream(response, span)
+            instrumentation.finish_call(span, getattr(response, "usage", None))
+            return response
+        return acreate
+
+    def create_instrumented(**request):
+        span, token = instrumentation.start_call(endpoint, request)
+        try:
+            response = create(**request)
+        except Exception as error:
+            instrumentation.finish_call(span, error=error)
+            raise
+        finally:
+            _current.reset(token)
+        if request.get("stream"):
+            return wrap_stream(response, span)
+        instrumentation.finish_call(span, getattr(response, "usage", None))
+        return response
+    return create_instrumented
+
+
+class InstrumentedClient:
+    # Drop-in for OpenAI / AsyncOpenAI chat and text completions; other attributes pass through
+    def __init__(self, client, instrumentation=None):
+        self.client = client
+        self.instrumentation = instrumentation or get_instrumentation()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=_instrumented(client.chat.completions.create, "chat.completions", self.instrumentation)
+        ))
+        if hasattr(client, "completions"):
+            self.completions = SimpleNamespace(
+                create=_instrumented(client.completions.create, "completions", self.instrumentation)
+            )
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,209 @@
+# 🧩 prompt_templates.py — Precompiled Prompt Templates with a Cacheable Prefix
+#
+# Templates are parsed once when they are registered: placeholders are checked
+# then (plain {name} fields only, so a typo fails at load time instead of on the
+# thousandth call) and static messages are rendered only once. Every
+# template lays its messages out the same way, static content first:
+#
+#   system message      instructions, rubric, persona
+#   few-shot examples   user/assistant pairs
+#   user message        the per-call values, last
+#
+# Providers cache the longest previously seen token prefix of a prompt (OpenAI
+# from 1024 tokens), so keeping the long, fixed instructions ahead of anything
+# that varies lets high-volume judge prompts reuse it call after call. Values
+# bound at registration (e.g. the criteria list) count as static.
+#
+#   judge = templates.register("judge", system="Score on {criteria}.", user="{response}",
+#                              criteria="Clarity, Specificity")
+#   messages = judge.render(response="...")
+#   templates.report("gpt-4")     # static prefix tokens per template
+#
+#   compile_template("Caption for {product}").format(product="EcoLuxe Sofa")
+
+import string
+from functools import lru_cache
+
+from token_planner import count_message_tokens, count_tokens
+
+# Prompts shorter than this are never prefix-cached by the OpenAI API
+MIN_CACHEABLE_TOKENS = 1024
+
+
+class TemplateError(ValueError):
+    pass
+
+# ---------------------------------------
+# Text templates
+# ---------------------------------------
+
+class TextTemplate:
+    def __init__(self, text):
+        self.text = text
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise TemplateError(f"Malformed template {text[:40]!r}: {e}") from None
+        self._parts = []
+        self._rendered = None
+        fields = []
+        for literal, field, spec, conversion in parsed:
+            if field is not None and (not field.isidentifier() or conversion):
+                raise TemplateError(f"Placeholder {{{field}}} in {text[:40]!r} must be a plain {{name}}")
+            self._parts.append((literal, field, spec or None))
+            if field is not None and field not in fields:
+                fields.append(field)
+        self.fields = tuple(fields)
+        self.static = not fields
+        # Literal text up to the first placeholder ({{ }} already unescaped)
+        self.prefix = self._parts[0][0] if self._parts else ""
+        self._rendered = self.format() if self.static else None
+
+    def format(self, **values):
+        if self._rendered is not None:
+            return self._rendered
+        # Validated at compile time, so str.format's C implementation can do the joining
+        try:
+            return self.text.format_map(values)
+        except KeyError as e:
+            raise TemplateError(f"Missing value for {e.args[0]}") from None
+
+    def bind(self, **values):
+        # A new template with some placeholders filled in
+        if not any(f in values for f in self.fields):
+            return self
+        escaped = []
+        for literal, field, spec in self._parts:
+            escaped.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            if field in values:
+                value = format(values[field], spec) if spec else str(values[field])
+                escaped.append(value.replace("{", "{{").replace("}", "}}"))
+            else:
+                escaped.append("{" + field + (":" + spec if spec else "") + "}")
+        return TextTemplate("".join(escaped))
+
+
+@lru_cache(maxsize=1024)
+def compile_template(text):
+    return TextTemplate(text)
+
+# ---------------------------------------
+# Chat templates
+# ---------------------------------------
+
+class PromptTemplate:
+    def __init__(self, name, user, system=None, examples=(), **static):
+        self.name = name
+        raw = [("system", system)] if system is not None else []
+        for example_user, example_assistant in examples:
+            raw += [("user", example_user), ("assistant", example_assistant)]
+        raw.append(("user", user))
+        compiled = [(role, TextTemplate(text)) for role, text in raw]
+        unused = set(static) - {f for _, t in compiled for f in t.fields}
+        if unused:
+            raise TemplateError(f"Template {name!r} has no placeholder for {', '.join(sorted(unused))}")
+        self.source = tuple(raw)
+        self._messages = [(role, t.bind(**static)) for role, t in compiled]
+        self.fields = tuple(dict.fromkeys(f for _, t in self._messages for f in t.fields))
+        # Leading messages with no placeholders are built once and shared by every render
+        self._static = []
+        for role, template in self._messages:
+            if not template.static:
+                break
+            self._static.append({"role": role, "content": template.format()})
+
+    def render(self, **values):
+        # Messages in canonical order; the static ones are shared, so treat them as read-only
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise TemplateError(f"Template {self.name!r} is missing values for {', '.join(missing)}")
+        messages = list(self._static)
+        for role, template in self._messages[len(self._static):]:
+            messages.append({"role": role, "content": template.format(**values)})
+        return messages
+
+    def static_prefix(self):
+        # Messages that never change plus the literal lead-in of the first one that does
+        tail = self._messages[len(self._static):]
+        return self._static, tail[0][1].prefix if tail else ""
+
+    def prefix_tokens(self, model="gpt-4"):
+        static, lead = self.static_prefix()
+        tokens = count_message_tokens(static, model) if static else 0
+        return tokens + (count_tokens(lead, model) if lead else 0)
+
+
+class TemplateRegistry:
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, name, user, system=None, examples=(), **static):
+        template = PromptTemplate(name, user, system, examples, **static)
+        existing = self._templates.get(name)
+        if existing is not None and [t.text for _, t in existing._messages] != [t.text for _, t in template._messages]:
+            raise TemplateError(f"A different template is already registered as {name!r}")
+        self._templates[name] = template
+        return template
+
+    def __getitem__(self, name):
+        return self._templates[name]
+
+    def __contains__(self, name):
+        return name in self._templates
+
+    def render(self, name, **values):
+        return self._templates[name].render(**values)
+
+    def report(self, model="gpt-4"):
+        rows = []
+        for name, template in self._templates.items():
+            tokens = template.prefix_tokens(model)
+            rows.append({
+                "Template": name,
+                "Static Messages": len(template._static),
+                "Prefix Tokens": tokens,
+                "Prefix Cacheable": tokens >= MIN_CACHEABLE_TOKENS,
+                "Fields": ", ".join(template.fields)
+            })
+        return rows
+
+
+templates = TemplateRegistry()
+
+# ---------------------------------------
+# Shared judge layout (05, 08, 09, batch_judge)
+# ---------------------------------------
+
+JUDGE_SYSTEM = """{evaluator}
+
+{rubric}"""
+
+# 08/09's rubric wording; 05 passes its own through `rubric=`
+JUDGE_RUBRIC = """Score the response from 1–10 in the following categories:
+{criteria_list}
+
+Return JSON like:
+{example}"""
+
+JUDGE_USER = """Evaluate the response to this prompt:
+Prompt: "{prompt}"
+
+Response:
+{response}"""
+
+
+def judge_example(criteria, scores=None, comment="Short and precise, but lacks vivid examples."):
+    scores = scores or [8 - i % 3 for i in range(len(criteria))]
+    lines = [f'  "{c}": {s},' for c, s in zip(criteria, scores)]
+    return "{\n" + "\n".join(lines) + f'\n  "Comments": "{comment}"\n}}'
+
+
+def register_judge(name, criteria, evaluator="You are a strict evaluator of model outputs.",
+                   rubric=JUDGE_RUBRIC, user=JUDGE_USER, example=None, registry=templates):
+    # Persona, rubric and output format are fixed per criteria list, so they lead the prompt.
+    # `rubric` may use {criteria} (comma-separated), {criteria_list} and {example}.
+    rubric = rubric.format(criteria=", ".join(criteria), criteria_list="\n".join(f"- {c}" for c in criteria),
+                           example=example or judge_example(criteria))
+    return registry.register(name, user, system=JUDGE_SYSTEM, evaluator=evaluator, rubric=rubric)
@@ -0,0 +1,238 @@
+# 📼 replay.py — Record API Traffic, Replay It Offline
+#
+# Record mode wraps a raw OpenAI / AsyncOpenAI client and appends every
+# successful chat or text completion to a gzip-compressed JSONL cassette with
+# its latency (and time-to-first-token for streamed calls). Replay mode serves
+# a cassette from stub_server, so 05, 08 and 09 can be rerun, load-tested and
+# profiled with no network:
+#
+#   OPENAI_RECORD=evals.cassette.gz python 05_automated_testing.py     # record (live API)
+#   python stub_server.py --cassette evals.cassette.gz --latency-mode recorded
+#   OPENAI_BASE_URL=http://127.0.0.1:8787/v1 python 05_automated_testing.py
+#
+# Requests are matched on the same key as response_cache (stream flags ignored,
+# so a streamed recording also answers a plain call and vice versa). Repeated
+# identical requests — sampling with temperature > 0 — replay their recordings
+# in order, then wrap around.
+#
+# Latency modes for replay:
+#   recorded   each reply waits as long as it took when recorded (default)
+#   sampled    waits are drawn from all recorded latencies, whichever reply is served
+#   fixed      the stub's own --latency / --jitter / --latency-sigma settings
+
+import gzip
+import inspect
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+from response_cache import request_key
+
+VOLATILE_FIELDS = ("id", "created", "system_fingerprint", "service_tier")
+
+
+def replay_key(endpoint, request):
+    return request_key(endpoint, {k: v for k, v in request.items() if k not in ("stream", "stream_options")})
+
+# ---------------------------------------
+# Cassette file
+# ---------------------------------------
+
+class Cassette:
+    # Appends gzip members, so a cassette can be recorded across several runs
+    def __init__(self, path):
+        self.path = path
+        self.recorded = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, request, response, latency, ttft=None):
+        entry = {"key": replay_key(endpoint, request), "endpoint": endpoint,
+                 "latency": round(latency, 4), "response": response}
+        if ttft is not None:
+            entry["ttft"] = round(ttft, 4)
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+        with self._lock:
+            if self._file is None:
+                self._file = gzip.open(self.path, "ab")
+            self._file.write(line)
+            self.recorded += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def entries(self):
+        # A run killed mid-write leaves a truncated last member; everything before it is kept
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            except (EOFError, json.JSONDecodeError):
+                return
+
+# ---------------------------------------
+# Record mode
+# ---------------------------------------
+
+def _as_dict(response):
+    data = response.model_dump(mode="json", exclude_none=True) if hasattr(response, "model_dump") else dict(response)
+    return {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+
+
+class _StreamCollector:
+    # Rebuilds a chat.completion from the chunks a caller iterates over
+    def __init__(self, started):
+        self.started = started
+        self.first_token_at = None
+        self.model = None
+        self.parts = []
+        self.finish_reason = None
+        self.usage = None
+
+    def add(self, chunk):
+        self.model = chunk.model or self.model
+        if chunk.usage:
+            self.usage = chunk.usage.model_dump(mode="json", exclude_none=True)
+        if chunk.choices:
+            choice = chunk.choices[0]
+            if choice.delta and choice.delta.content:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                self.parts.append(choice.delta.content)
+            self.finish_reason = choice.finish_reason or self.finish_reason
+
+    def response(self):
+        response = {"object": "chat.completion", "model": self.model, "choices": [{
+            "index": 0, "message": {"role": "assistant", "content": "".join(self.parts)},
+            "finish_reason": self.finish_reason or "stop"}]}
+        if self.usage:
+            response["usage"] = self.usage
+        return response
+
+    def ttft(self):
+        return self.first_token_at - self.started if self.first_token_at else None
+
+
+def _recording(create, endpoint, cassette):
+    # Streams are recorded once the caller has read them to the end
+    def finish(request, started, collector):
+        cassette.record(endpoint, request, collector.response(), time.perf_counter() - started, collector.ttft())
+
+    if inspect.iscoroutinefunction(inspect.unwrap(create)):
+        async def arecord(**request):
+            started = time.perf_counter()
+            response = await create(**request)
+            if not request.get("stream"):
+                cassette.record(endpoint, request, _as_dict(response), time.perf_counter() - started)
+                return response
+            if endpoint != "chat.completions":
+                return response
+
+            async def chunks():
+                collector = _StreamCollector(started)
+                async for chunk in response:
+                    collector.add(chunk)
+                    yield chunk
+                finish(request, started, collector)
+            return chunks()
+        return arecord
+
+    def record(**request):
+        started = time.perf_counter()
+        response = create(**request)
+        if not request.get("stream"):
+            cassette.record(endpoint, request, _as_dict(response), time.perf_counter() - started)
+            return response
+        if endpoint != "chat.completions":
+            return response
+
+        def chunks():
+            collector = _StreamCollector(started)
+            for chunk in response:
+                collector.add(chunk)
+                yield chunk
+            finish(request, started, collector)
+        return chunks()
+    return record
+
+
+class RecordingClient:
+    # Wrap the raw client (under retries and caches) so only real API calls are recorded
+    def __init__(self, client, cassette):
+        self.client = client
+        self.cassette = cassette if isinstance(cassette, Cassette) else Cassette(cassette)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=_recording(client.chat.completions.create, "chat.completions", self.cassette)
+        ))
+        if hasattr(client, "completions"):
+            self.completions = SimpleNamespace(
+                create=_recording(client.completions.create, "completions", self.cassette)
+            )
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+# ---------------------------------------
+# Replay mode
+# ---------------------------------------
+
+class ReplayPlayer:
+    # Looked up by stub_server for each request; on a miss it falls back to the
+    # stub's canned replies (miss="stub") or answers 404 (miss="error")
+    def __init__(self, path, latency_mode="recorded", latency_scale=1.0, miss="stub", seed=None):
+        if latency_mode not in ("recorded", "sampled", "fixed"):
+            raise ValueError(f"Unknown latency mode {latency_mode!r}")
+        self.latency_mode = latency_mode
+        self.latency_scale = latency_scale
+        self.miss = miss
+        self.hits = 0
+        self.misses = 0
+        self._entries = defaultdict(list)
+        self._cursor = defaultdict(int)
+        self._timings = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        for entry in Cassette(path).entries():
+            self._entries[entry["key"]].append(entry)
+            self._timings.append((entry.get("ttft"), entry["latency"]))
+
+    def __len__(self):
+        return len(self._timings)
+
+    def lookup(self, endpoint, body):
+        key = replay_key(endpoint, body)
+        with self._lock:
+            recorded = self._entries.get(key)
+            if not recorded:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = recorded[self._cursor[key] % len(recorded)]
+            self._cursor[key] += 1
+            return entry
+
+    def timing(self, entry):
+        # (seconds to first token or None, total seconds), or None to use the stub's latency
+        if self.latency_mode == "fixed" or not self._timings:
+            return None
+        if self.latency_mode == "sampled":
+            with self._lock:
+                ttft, latency = self._rng.choice(self._timings)
+        elif entry is None:
+            return None
+        else:
+            ttft, latency = entry.get("ttft"), entry["latency"]
+        scale = self.latency_scale
+        return (ttft * scale if ttft is not None else None), latency * scale
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,262 @@
+# 🛡️ resilient_client.py — Retries, Backoff and Adaptive Concurrency
+#
+# Wraps the client's create() calls so 429s and transient 5xx/connection
+# errors are retried with full-jitter exponential backoff, honoring the
+# server's Retry-After / retry-after-ms headers when present. An AIMD
+# controller caps requests in flight: the cap grows by ~1 per window of
+# successes and halves on a 429, so a run settles at the highest parallelism
+# the quota allows. Per-model latency histograms are kept for export.
+#
+#   client = ResilientClient(OpenAI(max_retries=0))   # the SDK's own retries off
+#   client.chat.completions.create(model="gpt-4", messages=[...])
+#   print(client.histogram.export())
+
+import asyncio
+import bisect
+import email.utils
+import inspect
+import json
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from types import SimpleNamespace
+
+import openai
+
+from instrumentation import increment
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+# ---------------------------------------
+# Retry policy
+# ---------------------------------------
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)  # HTTP-date form
+    except (TypeError, ValueError):
+        return None  # malformed header: fall back to the backoff schedule
+    return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def status_of(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in RETRYABLE_STATUSES
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=6, base_delay=0.5, max_delay=60.0, max_retry_after=120.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, error):
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(hinted, self.max_retry_after)
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+# ---------------------------------------
+# AIMD concurrency controller
+# ---------------------------------------
+
+class AIMDController:
+    # Use one controller per calling style: threads call slot(), coroutines aslot()
+    def __init__(self, initial=4, minimum=1, maximum=64, decrease=0.5, cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.throttles = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_cond = None
+
+    def on_success(self):
+        # +1 per full window of successes ≈ additive increase per round trip
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self):
+        # Many in-flight requests see the same 429 burst; back off once per cooldown
+        self.throttles += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_decrease = now
+
+    def _has_room(self):
+        return self.in_flight < max(self.minimum, int(self.limit))
+
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            self._cond.wait_for(self._has_room)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    @asynccontextmanager
+    async def aslot(self):
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        async with self._async_cond:
+            await self._async_cond.wait_for(self._has_room)
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._async_cond:
+                self.in_flight -= 1
+                self._async_cond.notify_all()
+
+# ---------------------------------------
+# Latency histograms
+# ---------------------------------------
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def observe(self, model, seconds):
+        with self._lock:
+            entry = self._models.setdefault(model, {"counts": [0] * (len(self.buckets) + 1), "count": 0, "sum": 0.0})
+            entry["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+            entry["count"] += 1
+            entry["sum"] += seconds
+
+    def percentile(self, model, q):
+        # Upper bound of the bucket holding the q-th observation
+        entry = self._models.get(model)
+        if not entry or not entry["count"]:
+            return None
+        target, seen = q * entry["count"], 0
+        for bound, count in zip(self.buckets + (float("inf"),), entry["counts"]):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def export(self):
+        report = {}
+        for model, entry in self._models.items():
+            report[model] = {
+                "count": entry["count"],
+                "mean": entry["sum"] / entry["count"],
+                "p50": self.percentile(model, 0.50),
+                "p95": self.percentile(model, 0.95),
+                "p99": self.percentile(model, 0.99),
+                "buckets": {f"le_{b}": c for b, c in zip(self.buckets + ("inf",), entry["counts"])}
+            }
+        return report
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, indent=2)
+
+# ---------------------------------------
+# Client wrapper
+# ---------------------------------------
+
+class ResilientClient:
+    def __init__(self, client, policy=None, controller=None, histogram=None):
+        self.client = client
+        self.policy = policy or RetryPolicy()
+        self.controller = controller or AIMDController()
+        self.histogram = histogram or LatencyHistogram()
+        self.retries = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._wrap(client.chat.completions.create)))
+        if hasattr(client, "completions"):
+            self.completions = SimpleNamespace(create=self._wrap(client.completions.create))
+
+    def _wrap(self, create):
+        if inspect.iscoroutinefunction(inspect.unwrap(create)):
+            return self._wrap_async(create)
+        return self._wrap_sync(create)
+
+    def _give_up(self, attempt, error):
+        if not is_retryable(error) or attempt >= self.policy.max_retries:
+            return True
+        if status_of(error) == 429:
+            self.controller.on_throttle()
+        self.retries += 1
+        increment("retries")
+        return False
+
+    def _wrap_sync(self, create):
+        def create_with_retries(**request):
+            for attempt in range(self.policy.max_retries + 1):
+                with self.controller.slot():
+                    start = time.perf_counter()
+                    try:
+                        response = create(**request)
+                    except Exception as error:
+                        if self._give_up(attempt, error):
+                            raise
+                        delay = self.policy.delay(attempt, error)
+                    else:
+                        self.histogram.observe(request.get("model"), time.perf_counter() - start)
+                        self.controller.on_success()
+                        return response
+                time.sleep(delay)  # outside the slot so others can use it
+        return create_with_retries
+
+    def _wrap_async(self, create):
+        async def create_with_retries(**request):
+            for attempt in range(self.policy.max_retries + 1):
+                async with self.controller.aslot():
+                    start = time.perf_counter()
+                    try:
+                        response = await create(**request)
+                    except Exception as error:
+                        if self._give_up(attempt, error):
+                            raise
+                        delay = self.policy.delay(attempt, error)
+                    else:
+                        self.histogram.observe(request.get("model"), time.perf_counter() - start)
+                        self.controller.on_success()
+                        return response
+                await asyncio.sleep(delay)
+        return create_with_retries
+
+    def stats(self):
+        return {
+            "retries": self.retries,
+            "throttles": self.controller.throttles,
+            "concurrency_limit": round(self.controller.limit, 2)
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,242 @@
+# 💾 response_cache.py — Persistent Response Cache for the Notebook Helpers
+#
+# Identical requests (model, messages, temperature, max_tokens, ...) are served
+# from a SQLite file instead of calling the API again. Entries expire after a
+# TTL and the least recently used ones are evicted once the file grows past
+# `max_bytes`. Wrap any client to use it:
+#
+#   client = CachedClient(OpenAI(...))
+#   client.chat.completions.create(model="gpt-4", messages=[...])
+#
+# Settings come from the environment so every script shares one cache:
+#   PROMPT_CACHE_PATH            (default: .prompt_cache.sqlite)
+#   PROMPT_CACHE_TTL             seconds, 0 = never expire (default: 7 days)
+#   PROMPT_CACHE_MAX_MB          (default: 512)
+#   PROMPT_CACHE_BYPASS_SAMPLING 1 = always call the API when temperature > 0
+#   PROMPT_CACHE_DISABLE         1 = pass every call straight through
+#
+# Multi-sample requests (n > 1, see sampling.py) are never cached: they exist to
+# measure how answers vary, and a replay would freeze that variation.
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+from instrumentation import annotate
+
+# ---------------------------------------
+# Request keys
+# ---------------------------------------
+
+def request_key(endpoint, request):
+    # Stable across runs and dict ordering: hash the canonical JSON of the full request
+    canonical = json.dumps({"endpoint": endpoint, **request}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _dump(response):
+    if hasattr(response, "model_dump_json"):
+        cls = type(response)
+        return f"{cls.__module__}:{cls.__qualname__}", response.model_dump_json()
+    return "", json.dumps(response)
+
+
+def _load(response_type, body):
+    if not response_type:
+        return json.loads(body)
+    module, name = response_type.split(":")
+    cls = getattr(importlib.import_module(module), name)
+    return cls.model_validate_json(body)
+
+# ---------------------------------------
+# Cache store
+# ---------------------------------------
+
+class ResponseCache:
+    def __init__(self, path=".prompt_cache.sqlite", ttl=7 * 24 * 3600, max_bytes=512 * 1024 * 1024,
+                 bypass_sampling=False, enabled=True):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bypass_sampling = bypass_sampling
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._db = None
+        if not enabled:
+            return  # every call bypasses the cache, so don't create the file
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response_type TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        # Running byte total, so put() needs no SUM() scan; resynced when over budget
+        self._bytes = self._total()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("PROMPT_CACHE_PATH", ".prompt_cache.sqlite"),
+            ttl=float(os.getenv("PROMPT_CACHE_TTL", 7 * 24 * 3600)),
+            max_bytes=int(float(os.getenv("PROMPT_CACHE_MAX_MB", 512)) * 1024 * 1024),
+            bypass_sampling=os.getenv("PROMPT_CACHE_BYPASS_SAMPLING") == "1",
+            enabled=os.getenv("PROMPT_CACHE_DISABLE") != "1"
+        )
+
+    def should_bypass(self, request):
+        if not self.enabled or request.get("stream") or (request.get("n") or 1) > 1:
+            return True
+        return self.bypass_sampling and (request.get("temperature") or 0) > 0
+
+    def get(self, key):
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response_type, body, size, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response_type, body, size, created = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return _load(response_type, body)
+
+    def put(self, key, response):
+        if self._db is None:
+            return
+        response_type, body = _dump(response)
+        now = time.time()
+        with self._lock:
+            # A replaced row gives its old size back
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response_type, body, len(body), now, now)
+            )
+            self._bytes += len(body) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _total(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        # Other processes may share the file, so check the real total before evicting
+        total = self._bytes = self._total()
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used rows until we are back under the limit
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._bytes = total
+
+    def purge_expired(self):
+        if self.ttl and self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+                self._bytes = self._total()
+
+    def clear(self):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+_default_cache = None
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache.from_env()
+    return _default_cache
+
+# ---------------------------------------
+# Client wrapper
+# ---------------------------------------
+
+def _cached(create, endpoint, cache):
+    def lookup(request):
+        if cache.should_bypass(request):
+            cache.bypassed += 1
+            annotate(cache="bypass")
+            return None, None
+        key = request_key(endpoint, request)
+        response = cache.get(key)
+        annotate(cache="miss" if response is None else "hit")
+        return key, response
+
+    if inspect.iscoroutinefunction(inspect.unwrap(create)):
+        async def acreate(**request):
+            key, response = lookup(request)
+            if response is None:
+                response = await create(**request)
+                if key:
+                    cache.put(key, response)
+            return response
+        return acreate
+
+    def create_cached(**request):
+        key, response = lookup(request)
+        if response is None:
+            response = create(**request)
+            if key:
+                cache.put(key, response)
+        return response
+    return create_cached
+
+
+class CachedClient:
+    # Drop-in for OpenAI / AsyncOpenAI: exposes the same create() call sites
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache or get_cache()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=_cached(client.chat.completions.create, "chat.completions", self.cache)
+        ))
+        if hasattr(client, "completions"):
+            self.completions = SimpleNamespace(
+                create=_cached(client.completions.create, "completions", self.cache)
+            )
+
+    def __getattr__(self, name):
+        # files, batches, models, ... go straight to the wrapped client
+        return getattr(self.client, name)
@@ -0,0 +1,138 @@
+# 🧾 result_sink.py — Streaming Result Writer and Lazy Reader
+#
+# Scored rows are written as they complete instead of piling up in a list
+# until a final to_csv. Rows are buffered and flushed once `flush_rows` rows
+# or `flush_seconds` seconds have accumulated, so a crash loses at most one
+# small buffer and memory stays flat on long runs.
+#
+#   *.jsonl   → one JSON object per line, appended on every flush
+#   *.parquet → a directory of part files, one row group per flush
+#              (each part is complete on disk, so it can be read mid-run)
+#
+#   with ResultSink("sweep.jsonl") as sink:
+#       sink.write({"Prompt": ..., "Clarity": 8})
+#   df = read_results("sweep.jsonl")
+
+import glob
+import json
+import os
+import shutil
+import threading
+import time
+
+
+def _format_for(path):
+    return "parquet" if path.rstrip("/").endswith(".parquet") else "jsonl"
+
+# ---------------------------------------
+# Writer
+# ---------------------------------------
+
+class ResultSink:
+    def __init__(self, path, flush_rows=100, flush_seconds=5.0, append=False):
+        self.path = path
+        self.format = _format_for(path)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._part = 0
+
+        if self.format == "parquet":
+            # Imported here so JSONL users don't need pyarrow installed
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa, self._pq = pa, pq
+            if not append and os.path.isdir(path):
+                shutil.rmtree(path)
+            os.makedirs(path, exist_ok=True)
+            self._part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+        else:
+            self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, row):
+        with self._lock:
+            self._buffer.append(row)
+            due = (len(self._buffer) >= self.flush_rows
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+            if due:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        if self.format == "parquet":
+            table = self._pa.Table.from_pylist(rows)
+            part_path = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+            self._pq.write_table(table, part_path + ".tmp")
+            os.replace(part_path + ".tmp", part_path)
+            self._part += 1
+        else:
+            self._file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        self.flush()
+        if self.format == "jsonl":
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ---------------------------------------
+# Lazy reader
+# ---------------------------------------
+
+def _parquet_dataset(path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+    if not parts:
+        return None
+    # An all-None column is typed null in one part and string in another; unify them
+    schema = pa.unify_schemas([pq.read_schema(p) for p in parts])
+    return ds.dataset(parts, schema=schema, format="parquet")
+
+
+def iter_results(path, columns=None, batch_size=1000):
+    # Yields one dict per row without loading the whole file
+    if _format_for(path) == "parquet":
+        dataset = _parquet_dataset(path)
+        if dataset is None:
+            return
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+            yield from batch.to_pylist()
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            yield {c: row.get(c) for c in columns} if columns else row
+
+
+def read_results(path, columns=None):
+    # Materializes the rows as a DataFrame for analysis (safe to call mid-run)
+    import pandas as pd
+
+    if _format_for(path) == "parquet":
+        dataset = _parquet_dataset(path)
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+        return dataset.to_table(columns=columns).to_pandas()
+    return pd.DataFrame(iter_results(path, columns=columns), columns=columns)
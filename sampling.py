@@ -0,0 +1,204 @@
+# 🎲 sampling.py — Many Samples per Request (n > 1) with Local Aggregation
+#
+# Stability checks (how much does the answer change between runs?) used to
+# send one request per sample. The chat API can return `n` completions for a
+# single request: the prompt is sent and billed once and all samples come back
+# in one round trip. sample_chat asks for them that way (split evenly into
+# requests of at most MAX_N, none of them a lone sample) and returns a SampleSet that aggregates
+# them locally. Requests with n > 1 always skip the response and semantic
+# caches, so every call draws fresh samples:
+#
+#   samples = sample_chat(client, n=10, model="gpt-4", messages=[...], temperature=0.7)
+#   samples.majority()          # ("most common answer", share of samples that gave it)
+#   samples.consensus_json()    # field-wise merge of JSON replies (mean of numbers, vote on the rest)
+#   samples.diversity()         # distinct answers, mean pairwise Jaccard distance, distinct bigrams
+#   samples.variance()          # per-sample spread: length, and every numeric JSON field
+#   row.update(samples.as_row())
+#
+#   samples = await asample_chat(async_client, n=10, ...)
+#
+# Answers are compared after normalization (case, whitespace and trailing
+# punctuation), so "Velvet." and "velvet" count as the same vote.
+
+import asyncio
+import inspect
+import re
+import statistics
+import time
+from collections import Counter
+
+import numpy as np
+
+from score_parser import ScoreParseError, extract_json
+
+MAX_N = 128  # the API's limit on completions per request
+WORD = re.compile(r"\w+")
+
+# ---------------------------------------
+# Requests
+# ---------------------------------------
+
+def _chunks(n, max_n):
+    # Even split: 129 → [65, 64], so no request is a single (cacheable) sample
+    requests = -(-n // max_n)
+    return [n // requests + (k < n % requests) for k in range(requests)]
+
+
+def _collect(samples, response):
+    for choice in response.choices:
+        samples.texts.append(choice.message.content or "")
+        samples.finish_reasons.append(choice.finish_reason)
+    usage = getattr(response, "usage", None)
+    if usage:
+        samples.prompt_tokens += usage.prompt_tokens or 0
+        samples.completion_tokens += usage.completion_tokens or 0
+
+
+def sample_chat(client, n=5, max_n=MAX_N, **request):
+    if inspect.iscoroutinefunction(inspect.unwrap(client.chat.completions.create)):
+        raise TypeError("sample_chat needs a sync client; use `await asample_chat(...)` with an async one")
+    samples = SampleSet(request.get("model"))
+    for size in _chunks(n, max_n):
+        samples.requests += 1
+        _collect(samples, client.chat.completions.create(**{**request, "n": size}))
+    samples.latency = time.perf_counter() - samples.started
+    return samples
+
+
+async def asample_chat(client, n=5, max_n=MAX_N, **request):
+    samples = SampleSet(request.get("model"))
+    responses = await asyncio.gather(*(client.chat.completions.create(**{**request, "n": size})
+                                       for size in _chunks(n, max_n)))
+    for response in responses:
+        samples.requests += 1
+        _collect(samples, response)
+    samples.latency = time.perf_counter() - samples.started
+    return samples
+
+# ---------------------------------------
+# Aggregation
+# ---------------------------------------
+
+def normalize_answer(text):
+    return " ".join((text or "").lower().split()).rstrip(".!?;: ")
+
+
+def _spread(values):
+    values = [float(v) for v in values]
+    return {
+        "mean": round(statistics.fmean(values), 4),
+        "std": round(statistics.pstdev(values), 4),
+        "min": min(values),
+        "max": max(values)
+    }
+
+
+class SampleSet:
+    def __init__(self, model):
+        self.model = model
+        self.texts = []
+        self.finish_reasons = []
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = time.perf_counter()
+        self.latency = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        return iter(self.texts)
+
+    def votes(self):
+        # Counter of normalized answers, each mapped back to its first original wording
+        counts = Counter(normalize_answer(t) for t in self.texts)
+        first = {}
+        for text in self.texts:
+            first.setdefault(normalize_answer(text), text)
+        return Counter({first[key]: count for key, count in counts.items()})
+
+    def majority(self):
+        # (most common answer, share of samples); ties go to the answer seen first
+        if not self.texts:
+            return None, 0.0
+        answer, count = self.votes().most_common(1)[0]
+        return answer, count / len(self.texts)
+
+    def parsed_json(self):
+        parsed = []
+        for text in self.texts:
+            try:
+                obj = extract_json(text)
+            except ScoreParseError:
+                continue
+            if isinstance(obj, dict):
+                parsed.append(obj)
+        return parsed
+
+    def consensus_json(self):
+        # Numbers → mean over the samples that have the field; anything else → majority vote.
+        # Returns (merged dict, {field: share of parsed samples agreeing with the merged value}).
+        parsed = self.parsed_json()
+        merged, agreement = {}, {}
+        for key in dict.fromkeys(k for obj in parsed for k in obj):
+            values = [obj[key] for obj in parsed if key in obj]
+            numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values)
+            if numeric:
+                mean = statistics.fmean(values)
+                merged[key] = round(mean) if all(isinstance(v, int) for v in values) else round(mean, 4)
+                agreement[key] = sum(v == merged[key] for v in values) / len(parsed)
+            else:
+                value, count = Counter(repr(v) for v in values).most_common(1)[0]
+                merged[key] = next(v for v in values if repr(v) == value)
+                agreement[key] = count / len(parsed)
+        return merged, agreement
+
+    def diversity(self):
+        # Distinct answers, mean pairwise Jaccard distance of the word sets (one
+        # matrix product for all pairs) and the distinct-bigram ratio across samples
+        n = len(self.texts)
+        tokens = [WORD.findall(t.lower()) for t in self.texts]
+        vocab = {w: i for i, w in enumerate(dict.fromkeys(w for words in tokens for w in words))}
+        jaccard = 0.0
+        if n > 1 and vocab:
+            present = np.zeros((n, len(vocab)), dtype=np.float32)
+            for row, words in enumerate(tokens):
+                present[row, [vocab[w] for w in words]] = 1.0
+            shared = present @ present.T
+            sizes = present.sum(1)
+            union = sizes[:, None] + sizes[None, :] - shared
+            with np.errstate(invalid="ignore", divide="ignore"):
+                distance = np.where(union > 0, 1 - shared / union, 0.0)
+            jaccard = float(distance[np.triu_indices(n, 1)].mean())
+        bigrams = [b for words in tokens for b in zip(words, words[1:])]
+        return {
+            "samples": n,
+            "distinct_answers": len(set(normalize_answer(t) for t in self.texts)),
+            "mean_jaccard_distance": round(jaccard, 4),
+            "distinct_bigrams": round(len(set(bigrams)) / len(bigrams), 4) if bigrams else None
+        }
+
+    def variance(self):
+        # Per-sample spread of the reply length and of every numeric JSON field
+        report = {}
+        if self.texts:
+            report["Word Count"] = _spread([len(WORD.findall(t)) for t in self.texts])
+        parsed = self.parsed_json()
+        for key in dict.fromkeys(k for obj in parsed for k in obj):
+            values = [obj[key] for obj in parsed if key in obj]
+            if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                report[key] = _spread(values)
+        return report
+
+    def as_row(self):
+        answer, share = self.majority()
+        diversity = self.diversity()
+        return {
+            "Samples": len(self.texts),
+            "Sample Requests": self.requests,
+            "Majority Share": round(share, 4),
+            "Distinct Answers": diversity["distinct_answers"],
+            "Jaccard Distance": diversity["mean_jaccard_distance"],
+            "Latency (s)": round(self.latency, 4) if self.latency is not None else None
+        }
@@ -0,0 +1,156 @@
+# 🔍 score_parser.py — Safe Parsing of Judge Scores
+#
+# Replaces eval() on model output. Judge replies are cleaned of code fences,
+# parsed with json.loads, and, failing that, scanned for the first JSON object
+# embedded in the text. The result is checked against a schema compiled once
+# per criteria list (integer scores in range plus a Comments string).
+#
+#   parser = ScoreParser(["Clarity", "Specificity", "Verbosity"])
+#   scores = parser.parse_or_default(raw_reply)
+#   print(parser.stats())
+
+import ast
+import json
+import re
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_decoder = json.JSONDecoder()
+
+
+class ScoreParseError(ValueError):
+    pass
+
+# ---------------------------------------
+# JSON extraction
+# ---------------------------------------
+
+def strip_fences(text):
+    return _FENCE.sub("", text).strip()
+
+
+def extract_json(text, start_char="{"):
+    # Fast path: the whole reply is JSON
+    text = strip_fences(text)
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    # Tolerant path: decode from each candidate opening bracket until one parses
+    pos = text.find(start_char)
+    while pos != -1:
+        try:
+            obj, _ = _decoder.raw_decode(text, pos)
+            return obj
+        except ValueError:
+            pos = text.find(start_char, pos + 1)
+
+    # Last resort for Python-style dicts ('single quotes', True/None) the old eval() accepted.
+    # literal_eval only builds literals, so nothing in the reply is executed.
+    end_char = "}" if start_char == "{" else "]"
+    first, last = text.find(start_char), text.rfind(end_char)
+    if first != -1 and last > first:
+        try:
+            return ast.literal_eval(text[first:last + 1])
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    raise ScoreParseError(f"No JSON object found in: {text[:80]!r}")
+
+# ---------------------------------------
+# Schema
+# ---------------------------------------
+
+class ScoreSchema:
+    def __init__(self, criteria, comments_key="Comments", min_score=1, max_score=10):
+        self.criteria = tuple(criteria)
+        self.comments_key = comments_key
+        self.min_score = min_score
+        self.max_score = max_score
+        self.keys = self.criteria + (comments_key,)
+
+    def _score(self, name, value):
+        if isinstance(value, bool):
+            raise ScoreParseError(f"{name} is not a number: {value!r}")
+        if isinstance(value, str):
+            value = value.strip().split("/")[0]  # "8/10" → "8"
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ScoreParseError(f"{name} is not a number: {value!r}")
+        if not self.min_score <= number <= self.max_score:
+            raise ScoreParseError(f"{name}={number} outside {self.min_score}–{self.max_score}")
+        return int(round(number))
+
+    def validate(self, obj):
+        if not isinstance(obj, dict):
+            raise ScoreParseError(f"Expected a JSON object, got {type(obj).__name__}")
+        missing = [c for c in self.criteria if c not in obj]
+        if missing:
+            raise ScoreParseError(f"Missing criteria: {', '.join(missing)}")
+        scores = {c: self._score(c, obj[c]) for c in self.criteria}
+        comments = obj.get(self.comments_key)
+        scores[self.comments_key] = "" if comments is None else str(comments)
+        return scores
+
+    def empty(self, comment="Failed to parse"):
+        return {**{c: None for c in self.criteria}, self.comments_key: comment}
+
+# ---------------------------------------
+# Parser with failure accounting
+# ---------------------------------------
+
+class ScoreParser:
+    def __init__(self, criteria, **schema_options):
+        self.schema = ScoreSchema(criteria, **schema_options)
+        self.parsed = 0
+        self.failed = 0
+
+    def parse(self, text):
+        try:
+            if text is None:
+                raise ScoreParseError("Empty judge reply")
+            scores = self.schema.validate(extract_json(text))
+        except ScoreParseError:
+            self.failed += 1
+            raise
+        self.parsed += 1
+        return scores
+
+    def parse_or_default(self, text, comment="Failed to parse"):
+        try:
+            return self.parse(text)
+        except ScoreParseError:
+            return self.schema.empty(comment)
+
+    def parse_many(self, text, id_key="id"):
+        # Batched judge replies: a JSON array (or {"results": [...]}) of score objects,
+        # each tagged with its item id. Returns {id: scores}; bad entries are skipped.
+        try:
+            data = extract_json(text or "", start_char="[")
+        except ScoreParseError:
+            data = None
+        if isinstance(data, dict):
+            data = next((v for v in data.values() if isinstance(v, list)), [data])
+        if not isinstance(data, list):
+            self.failed += 1
+            return {}
+
+        scores = {}
+        for entry in data:
+            if not isinstance(entry, dict) or id_key not in entry:
+                self.failed += 1
+                continue
+            try:
+                scores[str(entry[id_key])] = self.schema.validate(entry)
+                self.parsed += 1
+            except ScoreParseError:
+                self.failed += 1
+        return scores
+
+    def stats(self):
+        total = self.parsed + self.failed
+        return {
+            "parsed": self.parsed,
+            "failed": self.failed,
+            "failure_rate": self.failed / total if total else 0.0
+        }
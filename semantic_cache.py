@@ -0,0 +1,308 @@
+# 🧲 semantic_cache.py — Similarity Cache for Near-Duplicate Prompts
+#
+# The response cache only matches byte-identical requests. This optional layer
+# embeds the user turn of each chat request and returns a stored response when
+# a past request in the same namespace is at least `threshold` cosine-similar.
+# A namespace is the model, the sampling parameters, the system prompt and any
+# earlier turns, all matched exactly. Only the last user message is compared
+# by similarity, so a different persona or max_tokens never shares answers.
+#
+# Multi-sample (n > 1) and streamed requests are never cached.
+# Long user turns (judge prompts that embed a whole response) are skipped: two
+# of them can be near-identical while asking about different responses. For the
+# same reason a close match that is a minimal pair of the new prompt is never
+# served: one of the two is negated and the other isn't, or the words that differ
+# include a number ("two dogs" → "three dogs") or a name ("Paris" → "London",
+# capitalized mid-sentence). Embeddings score those as near-duplicates while the
+# answer changes. Rewordings ("What is" → "What's") still hit.
+#
+# Only a real sentence embedder (SEMANTIC_CACHE_MODEL) matches paraphrases; the
+# feature-hashing fallback is purely lexical, so client_factory refuses to
+# enable the layer without a model.
+#
+#   client = SemanticCachedClient(OpenAI(...))          # or SEMANTIC_CACHE=1 with client_factory
+#   client.chat.completions.create(model="gpt-4", messages=[...])
+#   client.semantic_cache.stats()
+#
+# Settings come from the environment:
+#   SEMANTIC_CACHE                1 = enable in client_factory.get_client()
+#   SEMANTIC_CACHE_PATH           (default: .semantic_cache.sqlite)
+#   SEMANTIC_CACHE_THRESHOLD      cosine similarity needed for a hit (default: 0.92)
+#   SEMANTIC_CACHE_MAX_ENTRIES    per namespace, least recently used evicted first (default: 5000)
+#   SEMANTIC_CACHE_MAX_CHARS      longer user turns are never matched (default: 1000)
+#   SEMANTIC_CACHE_MODEL          local sentence-transformers model (required by client_factory)
+#   SEMANTIC_CACHE_LOG            JSONL file that gets one line per lookup with its best similarity
+
+import hashlib
+import inspect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+
+from instrumentation import annotate
+from response_cache import _dump, _load
+from vector_index import HashingEmbedder, SentenceTransformerEmbedder, normalize
+
+WORD = re.compile(r"\w+(?:'\w+)?")
+NEGATIONS = {"not", "no", "never", "none", "nor", "without", "cannot", "neither", "nothing"}
+NUMBER_WORDS = {"zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+                "eleven", "twelve", "twenty", "thirty", "fifty", "hundred", "thousand", "million",
+                "billion", "dozen", "half", "once", "twice"}
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+# ---------------------------------------
+# Request → (namespace, text)
+# ---------------------------------------
+
+def split_request(request):
+    # Everything but the last user message must match exactly; that message is embedded
+    messages = request.get("messages") or []
+    if not messages or messages[-1].get("role") != "user" or not isinstance(messages[-1].get("content"), str):
+        return None, None
+    context = {k: v for k, v in request.items() if k != "messages"}
+    context["messages"] = messages[:-1]
+    canonical = json.dumps(context, sort_keys=True, separators=(",", ":"), default=str)
+    namespace = f"{request.get('model')}:{hashlib.sha256(canonical.encode()).hexdigest()[:16]}"
+    return namespace, messages[-1]["content"]
+
+def _words(text):
+    # (lowercased words, the ones that look like names: capitalized but not opening a sentence)
+    words, names = set(), set()
+    for sentence in SENTENCE_BREAK.split(text.strip()):
+        for i, word in enumerate(WORD.findall(sentence)):
+            words.add(word.lower())
+            if i and word[0].isupper() and word != "I" and not word.startswith("I'"):
+                names.add(word.lower())
+    return words, names
+
+
+def _negated(words):
+    return any(w in NEGATIONS or w.endswith("n't") for w in words)
+
+
+def _number(word):
+    return word in NUMBER_WORDS or any(c.isdigit() for c in word)
+
+
+def minimal_pair(a, b):
+    # True when two near-identical prompts can't share an answer: one is negated and the
+    # other isn't, or the differing words include a number or a name
+    (words_a, names_a), (words_b, names_b) = _words(a), _words(b)
+    changed = words_a ^ words_b
+    if not changed:
+        return False
+    if _negated(words_a) != _negated(words_b):
+        return True
+    return any(_number(w) for w in changed) or bool(changed & (names_a | names_b))
+
+# ---------------------------------------
+# Cache store
+# ---------------------------------------
+
+class SemanticCache:
+    def __init__(self, path=".semantic_cache.sqlite", embed=None, threshold=0.92, max_entries=5000,
+                 max_chars=1000, log_path=None, enabled=True):
+        self.path = path
+        self.embed = embed or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.log_path = log_path
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.rejected = 0  # similar enough, but a minimal pair of the prompt
+        self.hit_similarities = deque(maxlen=10000)
+        self.miss_similarities = deque(maxlen=10000)  # best match that wasn't close enough
+        self._namespaces = {}  # namespace → (ids, matrix) loaded on first use
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                namespace TEXT NOT NULL,
+                text TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response_type TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace, accessed)")
+
+    @classmethod
+    def from_env(cls):
+        model = os.getenv("SEMANTIC_CACHE_MODEL")
+        return cls(
+            path=os.getenv("SEMANTIC_CACHE_PATH", ".semantic_cache.sqlite"),
+            embed=SentenceTransformerEmbedder(model) if model else None,
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            max_chars=int(os.getenv("SEMANTIC_CACHE_MAX_CHARS", "1000")),
+            log_path=os.getenv("SEMANTIC_CACHE_LOG")
+        )
+
+    def _vectors(self, namespace):
+        # (ids, matrix) of a namespace; the matrix has spare rows so inserts don't copy it
+        if namespace not in self._namespaces:
+            rows = self._db.execute("SELECT id, vector FROM entries WHERE namespace = ? ORDER BY id",
+                                    (namespace,)).fetchall()
+            ids = [row[0] for row in rows]
+            matrix = np.zeros((max(16, 2 * len(rows)), self.embed.dim), dtype=np.float32)
+            for i, row in enumerate(rows):
+                matrix[i] = np.frombuffer(row[1], dtype=np.float32)
+            self._namespaces[namespace] = (ids, matrix)
+        ids, matrix = self._namespaces[namespace]
+        return ids, matrix[:len(ids)]
+
+    def _embed(self, text):
+        return normalize(self.embed([text]))[0]
+
+    def _log(self, namespace, similarity, hit):
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"time": time.time(), "namespace": namespace,
+                                    "similarity": similarity, "hit": hit}) + "\n")
+
+    def lookup(self, request):
+        # Returns (namespace, text, vector, response); response is None on a miss or skip
+        namespace, text = split_request(request)
+        if (not self.enabled or request.get("stream") or (request.get("n") or 1) > 1
+                or namespace is None or len(text) > self.max_chars):
+            self.skipped += 1
+            return None, None, None, None
+        vector = self._embed(text)
+        with self._lock:
+            ids, matrix = self._vectors(namespace)
+            best, similarity = None, None
+            if len(ids):
+                scores = matrix @ vector
+                best = int(np.argmax(scores))
+                similarity = float(scores[best])
+            if similarity is None or similarity < self.threshold:
+                self.misses += 1
+                if similarity is not None:
+                    self.miss_similarities.append(similarity)
+                self._log(namespace, similarity, False)
+                return namespace, text, vector, None
+            row = self._db.execute("SELECT text, response_type, body FROM entries WHERE id = ?",
+                                   (ids[best],)).fetchone()
+            if minimal_pair(text, row[0]):
+                self.misses += 1
+                self.rejected += 1
+                self.miss_similarities.append(similarity)
+                self._log(namespace, similarity, False)
+                return namespace, text, vector, None
+            self._db.execute("UPDATE entries SET accessed = ? WHERE id = ?", (time.time(), ids[best]))
+            self.hits += 1
+            self.hit_similarities.append(similarity)
+            self._log(namespace, similarity, True)
+            annotate(cache="semantic", similarity=round(similarity, 4))
+        return namespace, text, vector, _load(row[1], row[2])
+
+    def put(self, namespace, text, vector, response):
+        response_type, body = _dump(response)
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO entries (namespace, text, vector, response_type, body, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, text, vector.astype(np.float32).tobytes(), response_type, body, now, now)
+            )
+            self._vectors(namespace)
+            ids, matrix = self._namespaces[namespace]
+            if len(ids) == len(matrix):
+                matrix = np.concatenate([matrix, np.zeros_like(matrix)])
+            matrix[len(ids)] = vector
+            ids.append(cursor.lastrowid)
+            self._namespaces[namespace] = (ids, matrix)
+            self._evict(namespace)
+
+    def _evict(self, namespace):
+        ids, matrix = self._namespaces[namespace]
+        excess = len(ids) - self.max_entries
+        if excess <= 0:
+            return
+        # Least recently used entries of this namespace only, 10% extra so eviction is occasional
+        excess += self.max_entries // 10
+        stale = {row[0] for row in self._db.execute(
+            "SELECT id FROM entries WHERE namespace = ? ORDER BY accessed LIMIT ?", (namespace, excess))}
+        self._db.executemany("DELETE FROM entries WHERE id = ?", [(i,) for i in stale])
+        keep = [i for i, entry in enumerate(ids) if entry not in stale]
+        matrix[:len(keep)] = matrix[keep]
+        self._namespaces[namespace] = ([ids[i] for i in keep], matrix)
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._db.execute("DELETE FROM entries")
+                self._namespaces.clear()
+            else:
+                self._db.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                self._namespaces.pop(namespace, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        hit_sims = np.array(self.hit_similarities) if self.hit_similarities else None
+        miss_sims = np.array(self.miss_similarities) if self.miss_similarities else None
+        with self._lock:
+            namespaces = self._db.execute("SELECT COUNT(DISTINCT namespace) FROM entries").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "rejected_minimal_pairs": self.rejected,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "hit_similarity_min": float(hit_sims.min()) if hit_sims is not None else None,
+            "hit_similarity_mean": float(hit_sims.mean()) if hit_sims is not None else None,
+            # How close misses came: useful when tuning the threshold
+            "miss_similarity_p90": float(np.percentile(miss_sims, 90)) if miss_sims is not None else None,
+            "namespaces": namespaces
+        }
+
+# ---------------------------------------
+# Client wrapper
+# ---------------------------------------
+
+def _semantic(create, cache):
+    if inspect.iscoroutinefunction(inspect.unwrap(create)):
+        async def acreate(**request):
+            namespace, text, vector, response = cache.lookup(request)
+            if response is None:
+                response = await create(**request)
+                if namespace:
+                    cache.put(namespace, text, vector, response)
+            return response
+        return acreate
+
+    def create_cached(**request):
+        namespace, text, vector, response = cache.lookup(request)
+        if response is None:
+            response = create(**request)
+            if namespace:
+                cache.put(namespace, text, vector, response)
+        return response
+    return create_cached
+
+
+class SemanticCachedClient:
+    # Drop-in for OpenAI / AsyncOpenAI chat calls; other attributes pass through
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.semantic_cache = cache or SemanticCache.from_env()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            create=_semantic(client.chat.completions.create, self.semantic_cache)
+        ))
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
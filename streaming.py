@@ -0,0 +1,130 @@
+# 🌊 streaming.py — Token Streaming with Latency Metrics
+#
+# stream=True versions of the chat helpers. A ChatStream yields text deltas as
+# they arrive and records time-to-first-token, tokens/sec and total latency;
+# once it has been consumed, `.text` holds the full reply and `.stats` the
+# timings (ready to merge into a result row next to Word Count).
+#
+#   stream = stream_chat(client, model="gpt-4", messages=[...])
+#   for token in stream:
+#       print(token, end="", flush=True)
+#   row.update(stream.stats.as_row())
+#
+#   stream = await astream_chat(async_client, model="gpt-4", messages=[...])
+#   async for token in stream: ...
+
+import time
+
+from token_planner import count_tokens
+
+
+class StreamStats:
+    def __init__(self, model):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished = None
+        self.completion_tokens = None  # from the API's usage chunk when it sends one
+
+    @property
+    def ttft(self):
+        return self.first_token_at - self.started if self.first_token_at else None
+
+    @property
+    def latency(self):
+        return self.finished - self.started if self.finished else None
+
+    def tokens_per_sec(self):
+        # Generation speed after the first token arrives
+        if not self.finished or not self.first_token_at or not self.completion_tokens:
+            return None
+        generating = self.finished - self.first_token_at
+        return self.completion_tokens / generating if generating > 0 else None
+
+    def as_row(self):
+        return {
+            "TTFT (s)": round(self.ttft, 4) if self.ttft is not None else None,
+            "Tokens/sec": round(self.tokens_per_sec(), 2) if self.tokens_per_sec() else None,
+            "Latency (s)": round(self.latency, 4) if self.latency is not None else None
+        }
+
+
+def _stream_request(request):
+    return {**request, "stream": True, "stream_options": {"include_usage": True}}
+
+
+class _StreamBase:
+    def __init__(self, model):
+        self.stats = StreamStats(model)
+        self._parts = []
+
+    @property
+    def text(self):
+        return "".join(self._parts)
+
+    def _handle(self, chunk):
+        # Returns the delta text in this chunk (or None)
+        usage = getattr(chunk, "usage", None)
+        if usage:
+            self.stats.completion_tokens = usage.completion_tokens
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if self.stats.first_token_at is None:
+                self.stats.first_token_at = time.perf_counter()
+            self._parts.append(delta)
+        return delta
+
+    def _finish(self):
+        self.stats.finished = time.perf_counter()
+        if self.stats.completion_tokens is None:
+            self.stats.completion_tokens = count_tokens(self.text, self.stats.model)
+
+
+class ChatStream(_StreamBase):
+    def __init__(self, client, request):
+        super().__init__(request["model"])
+        self._stream = client.chat.completions.create(**_stream_request(request))
+
+    def __iter__(self):
+        for chunk in self._stream:
+            delta = self._handle(chunk)
+            if delta:
+                yield delta
+        self._finish()
+
+    def consume(self):
+        for _ in self:
+            pass
+        return self.text
+
+
+class AsyncChatStream(_StreamBase):
+    def __init__(self, request):
+        super().__init__(request["model"])
+        self._stream = None
+
+    async def _open(self, client, request):
+        self._stream = await client.chat.completions.create(**_stream_request(request))
+        return self
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            delta = self._handle(chunk)
+            if delta:
+                yield delta
+        self._finish()
+
+    async def consume(self):
+        async for _ in self:
+            pass
+        return self.text
+
+
+def stream_chat(client, **request):
+    return ChatStream(client, request)
+
+
+async def astream_chat(client, **request):
+    return await AsyncChatStream(request)._open(client, request)
@@ -0,0 +1,415 @@
+# 🧪 stub_server.py — Local Chat Completions Stub
+#
+# A tiny HTTP server that speaks just enough of the /v1/chat/completions
+# protocol for the notebooks to run offline, plus an in-process fake of the
+# Batch API (FakeBatchClient). Point a client at the server with:
+#
+#   with StubServer(latency=0.2) as server:
+#       client = AsyncOpenAI(base_url=server.base_url, api_key="stub")
+#
+# or run `python stub_server.py --port 8787` and export
+# OPENAI_BASE_URL=http://127.0.0.1:8787/v1 before launching a script.
+#
+# With --cassette the server replays responses recorded by replay.py instead of
+# canned ones (see replay.py for the latency modes).
+
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+# ---------------------------------------
+# Canned replies
+# ---------------------------------------
+
+SCORE_REPLY = json.dumps({
+    "Clarity": 8,
+    "Specificity": 7,
+    "Relevance": 9,
+    "Verbosity": 6,
+    "Comments": "Stub evaluation."
+})
+
+
+def default_reply(body):
+    # Judge prompts ask for JSON scores (an array for batched judging); everything else gets an echo.
+    # The scoring instructions may sit in the system message, ahead of the user turn.
+    messages = body.get("messages") or []
+    user_msg = messages[-1]["content"] if messages else ""
+    instructions = " ".join(str(m.get("content", "")) for m in messages)
+    pair = re.search(r"Response A:\n(.*?)\n\nResponse B:\n(.*)", user_msg, re.S)
+    if pair and "Winner:" in instructions:
+        # Pairwise judging: the longer response wins, so verdicts don't depend on position
+        a, b = (len(text.strip()) for text in pair.groups())
+        return "Stub comparison.\nWinner: " + ("A" if a > b else "B" if b > a else "tie")
+    if "Ground Truth:" in user_msg and "Verdict:" in instructions:
+        return "Stub comparison against the ground truth.\nVerdict: partially correct"
+    batch_ids = re.findall(r"^### Response (\S+)$", user_msg, re.M)
+    if batch_ids:
+        return json.dumps([{"id": item_id, **json.loads(SCORE_REPLY)} for item_id in batch_ids])
+    if "Score" in instructions or "score" in instructions:
+        return SCORE_REPLY
+    return f"Stub answer to: {user_msg[:80]}"
+
+
+def sample_variant(content, index, temperature):
+    # With n > 1, samples after the first drift from it more often at higher temperatures
+    # (a JSON reply gets one score nudged, so it stays parseable)
+    rng = random.Random(f"{content}:{index}")
+    if index == 0 or rng.random() >= min(1.0, (temperature or 0) / 2):
+        return content
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return f"{content} (alt {rng.randint(1, 3)})"
+    scores = [key for key, value in data.items() if isinstance(value, int)] if isinstance(data, dict) else []
+    if not scores:
+        return content
+    key = rng.choice(scores)
+    data[key] = max(1, min(10, data[key] + rng.choice([-1, 1])))
+    return json.dumps(data)
+
+
+def chat_completion_payload(body, content):
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+    samples = [sample_variant(content, k, body.get("temperature", 1.0)) for k in range(int(body.get("n") or 1))]
+    completion_tokens = sum(len(sample.split()) for sample in samples)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": k,
+            "message": {"role": "assistant", "content": sample},
+            "finish_reason": "stop"
+        } for k, sample in enumerate(samples)],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+def recorded_payload(entry, body):
+    # A cassette entry (replay.py) with fresh id/created fields
+    prefix = "chatcmpl" if entry["endpoint"] == "chat.completions" else "cmpl"
+    return {"id": f"{prefix}-{uuid.uuid4().hex[:12]}", "created": int(time.time()), **entry["response"]}
+
+
+def tool_call_payload(body):
+    # One call per offered tool; every argument is the user's question (or 1 / true for non-strings)
+    question = str(body["messages"][-1].get("content", ""))
+    calls = []
+    for i, tool in enumerate(body["tools"]):
+        properties = tool["function"].get("parameters", {}).get("properties", {})
+        args = {name: {"integer": 1, "number": 1.0, "boolean": True}.get(spec.get("type"), question)
+                for name, spec in properties.items()}
+        calls.append({"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                      "function": {"name": tool["function"]["name"], "arguments": json.dumps(args)}})
+    payload = chat_completion_payload(body, "")
+    payload["choices"][0].update({"message": {"role": "assistant", "content": None, "tool_calls": calls},
+                                  "finish_reason": "tool_calls"})
+    return payload
+
+
+def text_completion_payload(body, content):
+    # Legacy /v1/completions shape used by 01_basics
+    return {
+        "id": f"cmpl-{uuid.uuid4().hex[:12]}",
+        "object": "text_completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "text": content, "finish_reason": "stop", "logprobs": None}],
+        "usage": {
+            "prompt_tokens": len(str(body.get("prompt", "")).split()),
+            "completion_tokens": len(content.split()),
+            "total_tokens": len(str(body.get("prompt", "")).split()) + len(content.split())
+        }
+    }
+
+# ---------------------------------------
+# Fake Batch API (in-process)
+# ---------------------------------------
+
+class FakeBatchClient:
+    # Mimics client.files / client.batches closely enough for BatchRunner.
+    # Each batch reports "in_progress" for `polls_until_done` polls, then
+    # completes with replies from `reply`; ids in `fail_ids` come back as errors.
+    def __init__(self, reply=default_reply, polls_until_done=1, fail_ids=()):
+        self.reply = reply
+        self.polls_until_done = polls_until_done
+        self.fail_ids = set(fail_ids)
+        self._files = {}
+        self._batches = {}
+        self.submitted = []
+        self.files = _FakeFiles(self)
+        self.batches = _FakeBatches(self)
+
+    def _store(self, text):
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self._files[file_id] = text
+        return file_id
+
+    def _finish(self, batch):
+        output, errors = [], []
+        for line in self._files[batch.input_file_id].splitlines():
+            record = json.loads(line)
+            cid = record["custom_id"]
+            if cid in self.fail_ids:
+                errors.append({"custom_id": cid, "response": None,
+                               "error": {"code": "server_error", "message": "Injected failure"}})
+                continue
+            body = chat_completion_payload(record["body"], self.reply(record["body"]))
+            output.append({"custom_id": cid, "response": {"status_code": 200, "body": body}, "error": None})
+        batch.output_file_id = self._store("\n".join(json.dumps(r) for r in output)) if output else None
+        batch.error_file_id = self._store("\n".join(json.dumps(r) for r in errors)) if errors else None
+        batch.status = "completed"
+
+
+class _FakeFiles:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def create(self, file, purpose):
+        return SimpleNamespace(id=self.fake._store(file.read().decode()), purpose=purpose)
+
+    def content(self, file_id):
+        return SimpleNamespace(text=self.fake._files[file_id])
+
+
+class _FakeBatches:
+    def __init__(self, fake):
+        self.fake = fake
+
+    def create(self, input_file_id, endpoint, completion_window):
+        batch = SimpleNamespace(id=f"batch_{uuid.uuid4().hex[:12]}", status="validating",
+                                input_file_id=input_file_id, output_file_id=None,
+                                error_file_id=None, polls=0)
+        self.fake._batches[batch.id] = batch
+        self.fake.submitted.append(batch.id)
+        return batch
+
+    def retrieve(self, batch_id):
+        batch = self.fake._batches[batch_id]
+        if batch.status not in ("completed", "failed"):
+            batch.polls += 1
+            batch.status = "in_progress"
+            if batch.polls > self.fake.polls_until_done:
+                self.fake._finish(batch)
+        return batch
+
+# ---------------------------------------
+# Server
+# ---------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle + delayed ACK add ~40ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_chat(self, body, payload, token_delay):
+        # Server-sent events, one word per chunk, like stream=True on the real API
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        content = payload["choices"][0]["message"]["content"] or ""
+        base = {k: payload[k] for k in ("id", "created", "model")}
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(token_delay)
+            delta = {"content": word if i == 0 else " " + word}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        final = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": payload["choices"][0]["finish_reason"]}]}
+        self._write_chunk(f"data: {json.dumps(final)}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage") and payload.get("usage"):
+            usage = {**base, "object": "chat.completion.chunk", "choices": [], "usage": payload["usage"]}
+            self._write_chunk(f"data: {json.dumps(usage)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        path = self.path.rstrip("/")
+        if not path.endswith("/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        stub.request_count += 1
+        chat = path.endswith("/chat/completions")
+        streamed = chat and body.get("stream")
+        entry = stub.player.lookup("chat.completions" if chat else "completions", body) if stub.player else None
+        if entry is None and stub.player and stub.player.miss == "error":
+            self._send_json(404, {"error": {"message": "No recorded response for this request", "type": "replay_miss"}})
+            return
+
+        wait, token_delay = stub.timing(entry, streamed)
+        time.sleep(wait)
+        failure = stub.next_failure()
+        if failure:
+            headers = {"Retry-After": str(stub.retry_after)} if failure == 429 and stub.retry_after is not None else {}
+            self._send_json(failure, {"error": {"message": f"Injected {failure}", "type": "stub_error"}}, headers)
+            return
+        wants_tools = body.get("tools") and body.get("tool_choice") != "none"
+        if entry is not None:
+            payload = recorded_payload(entry, body)
+        elif chat and wants_tools and body["messages"][-1].get("role") != "tool":
+            payload = tool_call_payload(body)
+        elif chat:
+            payload = chat_completion_payload(body, stub.reply(body))
+        else:
+            prompt = str(body.get("prompt", ""))
+            payload = text_completion_payload(body, stub.reply({"messages": [{"content": prompt}]}))
+        if streamed:
+            self._stream_chat(body, payload, token_delay)
+        else:
+            self._send_json(200, payload)
+
+
+class StubServer:
+    # Failure injection: `fail_first` requests fail outright, then each request
+    # fails with probability `fail_rate`. Failures use `fail_status` (429 or 5xx)
+    # and 429s carry `Retry-After: retry_after` when it is set.
+    # latency_sigma > 0 draws latencies from a lognormal with median `latency`.
+    # `player` (a replay.ReplayPlayer) serves recorded responses and timings.
+    def __init__(self, latency=0.0, jitter=0.0, reply=default_reply, host="127.0.0.1", port=0,
+                 fail_rate=0.0, fail_first=0, fail_status=429, retry_after=None, token_delay=0.0,
+                 latency_sigma=0.0, player=None):
+        self.latency = latency
+        self.token_delay = token_delay  # seconds between streamed chunks
+        self.jitter = jitter
+        self.latency_sigma = latency_sigma
+        self.reply = reply
+        self.player = player
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.failure_count = 0
+        self._fail_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    def next_failure(self):
+        with self._fail_lock:
+            if self.fail_first > 0:
+                self.fail_first -= 1
+            elif random.random() >= self.fail_rate:
+                return None
+            self.failure_count += 1
+            return self.fail_status
+
+    def sample_latency(self):
+        if self.latency_sigma > 0:
+            return self.latency * random.lognormvariate(0.0, self.latency_sigma)
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def timing(self, entry=None, streamed=False):
+        # (seconds before the first byte, seconds between streamed chunks)
+        recorded = self.player.timing(entry) if self.player else None
+        if recorded is None:
+            return self.sample_latency(), self.token_delay
+        ttft, latency = recorded
+        if not streamed or ttft is None:
+            return latency, self.token_delay if streamed else 0.0
+        if entry is None or entry["endpoint"] != "chat.completions":
+            return ttft, self.token_delay
+        # Spread the generation time of a streamed recording over its chunks
+        words = len((entry["response"]["choices"][0]["message"].get("content") or "").split(" "))
+        return ttft, max(0.0, latency - ttft) / max(1, words - 1)
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a stub chat completions endpoint.")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests that fail")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on 429s")
+    parser.add_argument("--latency-sigma", type=float, default=0.0,
+                        help="Lognormal spread around --latency (0 = uniform jitter)")
+    parser.add_argument("--cassette", help="Replay responses recorded with OPENAI_RECORD")
+    parser.add_argument("--latency-mode", default="recorded", choices=["recorded", "sampled", "fixed"])
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on recorded latencies")
+    parser.add_argument("--on-miss", default="stub", choices=["stub", "error"],
+                        help="Unrecorded requests get a canned reply or a 404")
+    args = parser.parse_args()
+
+    player = None
+    if args.cassette:
+        from replay import ReplayPlayer
+        player = ReplayPlayer(args.cassette, latency_mode=args.latency_mode, latency_scale=args.latency_scale,
+                              miss=args.on_miss)
+    server = StubServer(latency=args.latency, jitter=args.jitter, port=args.port, fail_rate=args.fail_rate,
+                        fail_status=args.fail_status, retry_after=args.retry_after, token_delay=args.token_delay,
+                        latency_sigma=args.latency_sigma, player=player)
+    print(f"🧪 Stub server listening on {server.base_url}")
+    if player:
+        print(f"📼 Replaying {len(player)} recorded responses from {args.cassette}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        if player:
+            print("📼 Replay:", player.stats())
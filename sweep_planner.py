@@ -0,0 +1,245 @@
+# 🎯 sweep_planner.py — Adaptive Parameter Search Under a Call Budget
+#
+# Alternatives to crossing every prompt with every temperature × max_tokens
+# value. The planner asks `evaluate(config, prompt)` for a judge score (higher
+# is better) and spends at most `budget` API calls finding the best config:
+#
+#   grid()                   every config from list-valued parameters
+#   random(n)                n random configs
+#   successive_halving(n)    n configs on a few prompts, the top 1/eta move on to more prompts
+#   hyperband()              several successive-halving brackets, from many-configs/few-prompts
+#                            to few-configs/all-prompts
+#   bayesian(n)              Gaussian-process expected improvement over continuous parameters
+#
+# grid, random and bayesian stop a configuration early once its mean score trails
+# the best fully evaluated configuration by more than `margin` after `min_prompts`
+# prompts. successive_halving and hyperband don't use the margin; they cut all but
+# the top 1/eta configurations at the end of each rung.
+#
+#   space = {"temperature": (0.0, 1.2), "max_tokens": (50, 400), "top_p": [0.8, 1.0]}
+#   planner = SweepPlanner(space, evaluate, prompts, budget=60, calls_per_eval=2)
+#   planner.bayesian(n=12)
+#   planner.best()  →  ({"temperature": 0.41, "max_tokens": 212, "top_p": 1.0}, 8.3)
+#
+# Parameters are given as a list (discrete choices) or a (low, high) tuple
+# (continuous; integers when both bounds are ints).
+
+import itertools
+import math
+
+import numpy as np
+
+
+class BudgetExhausted(Exception):
+    pass
+
+# ---------------------------------------
+# Search space
+# ---------------------------------------
+
+def sample_config(space, rng):
+    config = {}
+    for name, values in space.items():
+        if isinstance(values, list):
+            config[name] = values[rng.integers(len(values))]
+        elif all(isinstance(v, int) for v in values):
+            config[name] = int(rng.integers(values[0], values[1] + 1))
+        else:
+            config[name] = round(float(rng.uniform(*values)), 3)
+    return config
+
+
+def encode_config(space, config):
+    # Maps a config into [0, 1]^d for the Gaussian process
+    point = []
+    for name, values in space.items():
+        if isinstance(values, list):
+            point.append(values.index(config[name]) / max(1, len(values) - 1))
+        else:
+            low, high = values
+            point.append((config[name] - low) / ((high - low) or 1))
+    return np.array(point, dtype=float)
+
+
+def _key(config):
+    return tuple(sorted(config.items()))
+
+# ---------------------------------------
+# Gaussian process (expected improvement)
+# ---------------------------------------
+
+def _rbf(a, b, lengthscale):
+    d2 = ((a[:, None, :] - b[None, :, :]) ** 2).sum(-1)
+    return np.exp(-0.5 * d2 / lengthscale ** 2)
+
+
+def expected_improvement(x_seen, y_seen, candidates, lengthscale=0.25, noise=1e-2, xi=0.01):
+    mean, std = y_seen.mean(), y_seen.std() or 1.0
+    y = (y_seen - mean) / std
+    k = _rbf(x_seen, x_seen, lengthscale) + noise * np.eye(len(x_seen))
+    k_star = _rbf(candidates, x_seen, lengthscale)
+    chol = np.linalg.cholesky(k)
+    alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, y))
+    mu = k_star @ alpha
+    v = np.linalg.solve(chol, k_star.T)
+    sigma = np.sqrt(np.clip(1.0 - (v ** 2).sum(0), 1e-12, None))
+    improvement = mu - y.max() - xi
+    z = improvement / sigma
+    cdf = 0.5 * (1 + np.vectorize(math.erf)(z / math.sqrt(2)))
+    pdf = np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+    return improvement * cdf + sigma * pdf
+
+# ---------------------------------------
+# Planner
+# ---------------------------------------
+
+class SweepPlanner:
+    def __init__(self, space, evaluate, prompts, budget=None, calls_per_eval=2, min_prompts=1,
+                 margin=1.5, seed=0):
+        self.space = space
+        self.evaluate = evaluate
+        self.prompts = list(prompts)
+        self.budget = budget
+        self.calls_per_eval = calls_per_eval
+        self.min_prompts = min_prompts
+        self.margin = margin
+        self.rng = np.random.default_rng(seed)
+        self.calls = 0
+        self.stopped_early = 0
+        self.scores = {}   # config key → {prompt index: score}
+        self.configs = {}  # config key → config
+
+    # ---------------------------------------
+    # Evaluation with budget + early stopping
+    # ---------------------------------------
+
+    def _score(self, config, index):
+        key = _key(config)
+        self.configs[key] = config
+        seen = self.scores.setdefault(key, {})
+        if index not in seen:
+            if self.budget is not None and self.calls + self.calls_per_eval > self.budget:
+                raise BudgetExhausted()
+            self.calls += self.calls_per_eval
+            score = self.evaluate(config, self.prompts[index])
+            seen[index] = float("nan") if score is None else float(score)
+        return seen[index]
+
+    def _mean(self, key):
+        values = [s for s in self.scores.get(key, {}).values() if not math.isnan(s)]
+        return sum(values) / len(values) if values else float("-inf")
+
+    def _best_complete(self):
+        complete = [k for k, s in self.scores.items() if len(s) == len(self.prompts)]
+        return max((self._mean(k) for k in complete), default=None)
+
+    def run_config(self, config, n_prompts=None):
+        # Scores a config on its first n prompts, stopping early once it's clearly dominated
+        n_prompts = n_prompts or len(self.prompts)
+        for index in range(n_prompts):
+            self._score(config, index)
+            best = self._best_complete()
+            done = index + 1
+            if (best is not None and done >= self.min_prompts and done < n_prompts
+                    and self._mean(_key(config)) + self.margin < best):
+                self.stopped_early += 1
+                break
+        return self._mean(_key(config))
+
+    # ---------------------------------------
+    # Strategies
+    # ---------------------------------------
+
+    def grid(self):
+        names = list(self.space)
+        choices = [v if isinstance(v, list) else list(v) for v in self.space.values()]
+        try:
+            for combo in itertools.product(*choices):
+                self.run_config(dict(zip(names, combo)))
+        except BudgetExhausted:
+            pass
+        return self.best()
+
+    def random(self, n=None):
+        # n=None keeps sampling until the budget runs out
+        if n is None and self.budget is None:
+            raise ValueError("random() needs n or a budget")
+        try:
+            for _ in itertools.count() if n is None else range(n):
+                self.run_config(sample_config(self.space, self.rng))
+        except BudgetExhausted:
+            pass
+        return self.best()
+
+    def successive_halving(self, n=27, eta=3, min_prompts=1, configs=None):
+        # Rung r scores the survivors on min_prompts × eta^r prompts (scores are reused)
+        configs = configs or [sample_config(self.space, self.rng) for _ in range(n)]
+        n_prompts = min_prompts
+        try:
+            while configs:
+                n_prompts = min(n_prompts, len(self.prompts))
+                for config in configs:
+                    for index in range(n_prompts):
+                        self._score(config, index)
+                if n_prompts == len(self.prompts) or len(configs) == 1:
+                    break
+                ranked = sorted(configs, key=lambda c: self._mean(_key(c)), reverse=True)
+                keep = max(1, len(configs) // eta)
+                self.stopped_early += len(configs) - keep
+                configs = ranked[:keep]
+                n_prompts *= eta
+        except BudgetExhausted:
+            pass
+        return self.best()
+
+    def hyperband(self, eta=3):
+        # Brackets trade breadth for depth; each is a successive-halving run
+        levels = max(0, int(math.log(len(self.prompts), eta)))
+        for s in range(levels, -1, -1):
+            n = int(math.ceil((levels + 1) / (s + 1) * eta ** s))
+            min_prompts = max(1, len(self.prompts) // eta ** s)
+            self.successive_halving(n=n, eta=eta, min_prompts=min_prompts)
+            if self.budget is not None and self.calls + self.calls_per_eval > self.budget:
+                break
+        return self.best()
+
+    def bayesian(self, n=20, n_init=5, candidates=512):
+        # Random starts, then the config with the highest expected improvement each round
+        try:
+            for i in range(n):
+                if i < n_init or len(self.scores) < 2:
+                    config = sample_config(self.space, self.rng)
+                else:
+                    seen = [k for k in self.scores if self._mean(k) > float("-inf")]
+                    x = np.array([encode_config(self.space, self.configs[k]) for k in seen])
+                    y = np.array([self._mean(k) for k in seen])
+                    pool = [sample_config(self.space, self.rng) for _ in range(candidates)]
+                    pool = [c for c in pool if _key(c) not in self.scores] or pool
+                    ei = expected_improvement(x, y, np.array([encode_config(self.space, c) for c in pool]))
+                    config = pool[int(np.argmax(ei))]
+                self.run_config(config)
+        except BudgetExhausted:
+            pass
+        return self.best()
+
+    # ---------------------------------------
+    # Results
+    # ---------------------------------------
+
+    def best(self):
+        # Best config among those scored on every prompt (else on the most prompts)
+        if not self.scores:
+            return None, None
+        most = max(len(s) for s in self.scores.values())
+        candidates = [k for k, s in self.scores.items() if len(s) == most]
+        key = max(candidates, key=self._mean)
+        return self.configs[key], self._mean(key)
+
+    def summary(self):
+        rows = [{**self.configs[k], "Mean Score": self._mean(k), "Prompts Scored": len(s)}
+                for k, s in self.scores.items()]
+        return sorted(rows, key=lambda r: (r["Prompts Scored"], r["Mean Score"]), reverse=True)
+
+    def stats(self):
+        return {"calls": self.calls, "budget": self.budget, "configs": len(self.scores),
+                "stopped_early": self.stopped_early}
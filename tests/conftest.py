@@ -0,0 +1,18 @@
+import pytest
+
+import response_cache
+from stub_server import StubServer
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(tmp_path, monkeypatch):
+    # Clients built through client_factory get a fresh shared response cache under tmp_path
+    monkeypatch.setenv("PROMPT_CACHE_PATH", str(tmp_path / "prompt_cache.sqlite"))
+    monkeypatch.setattr(response_cache, "_default_cache", None)
+
+
+@pytest.fixture
+def stub():
+    # A local chat completions endpoint on a free port; tests tweak its failure settings
+    with StubServer() as server:
+        yield server
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from openai import AsyncOpenAI, OpenAI
+
+from async_runner import ModelRateLimiter, RateLimitedChat, TokenBucket, run_grid
+from response_cache import CachedClient, ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Why is velvet popular in mid-century modern interiors?"}]
+
+
+def test_token_bucket_paces_requests_past_its_burst():
+    async def drain():
+        bucket = TokenBucket(600, capacity=2)  # 10 per second once the burst of 2 is spent
+        start = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    assert 0.25 <= asyncio.run(drain()) < 1.0
+
+
+def test_rate_limited_chat_waits_for_the_model_budget(stub):
+    async def run():
+        limiter = ModelRateLimiter({"gpt-4": {"rpm": 600, "tpm": 10 ** 9}})
+        async with AsyncOpenAI(base_url=stub.base_url, api_key="stub", max_retries=0) as raw:
+            client = RateLimitedChat(raw, limiter)
+            # No burst allowance: 10 requests/s from the start
+            requests = limiter._buckets_for("gpt-4")[0]
+            requests.tokens, requests.updated = 0, time.monotonic()
+            start = time.monotonic()
+            results = await run_grid(range(4), lambda _: client.chat.completions.create(
+                model="gpt-4", messages=MESSAGES), concurrency=4)
+            return time.monotonic() - start, results
+
+    elapsed, results = asyncio.run(run())
+    assert elapsed >= 0.3
+    assert stub.request_count == 4
+    assert all(r.choices[0].message.content for r in results)
+
+
+def test_run_grid_keeps_order_and_returns_failures_in_place():
+    async def worker(item):
+        await asyncio.sleep(0.01 * (3 - item))  # finish in reverse order
+        if item == 1:
+            raise ValueError("bad item")
+        return item * 10
+
+    results = asyncio.run(run_grid([0, 1, 2], worker, concurrency=3))
+    assert results[0] == 0 and results[2] == 20
+    assert isinstance(results[1], ValueError)
+
+
+def test_cached_client_hits_and_misses_against_the_stub(stub, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    client = CachedClient(OpenAI(base_url=stub.base_url, api_key="stub", max_retries=0), cache)
+
+    first = client.chat.completions.create(model="gpt-4", messages=MESSAGES, temperature=0)
+    second = client.chat.completions.create(model="gpt-4", messages=MESSAGES, temperature=0)
+    assert second.choices[0].message.content == first.choices[0].message.content
+    assert stub.request_count == 1
+
+    client.chat.completions.create(model="gpt-4", messages=MESSAGES, temperature=0.5)  # a different request
+    assert stub.request_count == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_cached_client_wraps_the_async_rate_limited_stack(stub, tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    async def run():
+        async with AsyncOpenAI(base_url=stub.base_url, api_key="stub", max_retries=0) as raw:
+            client = CachedClient(RateLimitedChat(raw), cache)
+            return await run_grid(range(3), lambda _: client.chat.completions.create(
+                model="gpt-4", messages=MESSAGES, temperature=0), concurrency=1)
+
+    results = asyncio.run(run())
+    assert len({r.choices[0].message.content for r in results}) == 1
+    assert stub.request_count == 1
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,70 @@
+import pytest
+
+from batch_runner import BatchItemError, BatchRunner, completion_text
+from response_cache import request_key
+from stub_server import FakeBatchClient
+
+REQUESTS = {
+    f"cell-{i}": {"model": "gpt-4", "messages": [{"role": "user", "content": f"Prompt {i}"}], "temperature": 0}
+    for i in range(3)
+}
+
+
+def run(client, manifest, requests=REQUESTS):
+    return dict(BatchRunner(client, str(manifest), poll_interval=0).run(requests))
+
+
+class CrashingBatches:
+    # Wraps the fake's batches endpoint and fails the first poll, like a crash mid-run
+    def __init__(self, batches):
+        self.batches = batches
+        self.crashed = False
+
+    def create(self, **kwargs):
+        return self.batches.create(**kwargs)
+
+    def retrieve(self, batch_id):
+        if not self.crashed:
+            self.crashed = True
+            raise ConnectionError("lost connection while polling")
+        return self.batches.retrieve(batch_id)
+
+
+def test_finished_results_are_replayed_from_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    first = run(FakeBatchClient(), manifest)
+    assert set(first) == set(REQUESTS)
+    assert all("Stub answer" in completion_text(body) for body in first.values())
+
+    fresh = FakeBatchClient()
+    assert run(fresh, manifest) == first
+    assert fresh.submitted == []
+
+
+def test_in_flight_batch_is_polled_again_instead_of_resubmitted(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    client = FakeBatchClient(polls_until_done=2)
+    client.batches = CrashingBatches(client.batches)
+    with pytest.raises(ConnectionError):
+        run(client, manifest)
+    assert len(client.submitted) == 1
+
+    results = run(client, manifest)
+    assert set(results) == set(REQUESTS)
+    assert len(client.submitted) == 1
+
+
+def test_failed_items_are_resubmitted_on_the_next_run(tmp_path):
+    manifest = tmp_path / "manifest.json"
+    failed_id = request_key("chat.completions", REQUESTS["cell-1"])
+    first = run(FakeBatchClient(fail_ids=[failed_id]), manifest)
+    assert isinstance(first["cell-1"], BatchItemError)
+    assert not isinstance(first["cell-0"], BatchItemError)
+
+    retry = FakeBatchClient()
+    second = run(retry, manifest)
+    assert len(retry.submitted) == 1
+    batch = retry.batches.retrieve(retry.submitted[0])
+    assert len(retry.files.content(batch.input_file_id).text.splitlines()) == 1  # only the failed item
+    assert not isinstance(second["cell-1"], BatchItemError)
+    assert second["cell-0"] == first["cell-0"]
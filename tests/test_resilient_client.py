@@ -0,0 +1,77 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+from openai import AsyncOpenAI, OpenAI
+
+from async_runner import run_grid
+from resilient_client import AIMDController, ResilientClient, RetryPolicy, retry_after_seconds
+
+MESSAGES = [{"role": "user", "content": "What makes eco-friendly upholstery attractive?"}]
+
+
+def resilient(stub, **kwargs):
+    return ResilientClient(OpenAI(base_url=stub.base_url, api_key="stub", max_retries=0), **kwargs)
+
+
+def test_429s_are_retried_until_the_call_succeeds(stub):
+    stub.fail_first, stub.retry_after = 2, 0
+    client = resilient(stub, controller=AIMDController(initial=8, cooldown=0))
+
+    response = client.chat.completions.create(model="gpt-4", messages=MESSAGES)
+    assert response.choices[0].message.content
+    assert stub.request_count == 3
+    assert client.stats()["retries"] == 2
+    assert client.stats()["throttles"] == 2
+    # Halved twice (8 → 2), then one additive step for the success
+    assert client.controller.limit == pytest.approx(2.5)
+
+
+def test_retry_after_header_sets_the_wait(stub):
+    stub.fail_first, stub.retry_after = 1, 0.3
+    client = resilient(stub)
+    start = time.monotonic()
+    client.chat.completions.create(model="gpt-4", messages=MESSAGES)
+    assert time.monotonic() - start >= 0.3
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.fail_first, stub.retry_after = 10, 0
+    client = resilient(stub, policy=RetryPolicy(max_retries=2))
+    with pytest.raises(openai.RateLimitError):
+        client.chat.completions.create(model="gpt-4", messages=MESSAGES)
+    assert stub.request_count == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.fail_first, stub.fail_status = 1, 400
+    client = resilient(stub)
+    with pytest.raises(openai.BadRequestError):
+        client.chat.completions.create(model="gpt-4", messages=MESSAGES)
+    assert stub.request_count == 1
+    assert client.stats()["retries"] == 0
+
+
+def test_async_grid_backs_off_on_429_bursts_and_completes(stub):
+    stub.fail_first, stub.retry_after = 4, 0
+    controller = AIMDController(initial=8, maximum=8, cooldown=60)
+
+    async def run():
+        async with AsyncOpenAI(base_url=stub.base_url, api_key="stub", max_retries=0) as raw:
+            client = ResilientClient(raw, controller=controller)
+            return await run_grid(range(8), lambda _: client.chat.completions.create(
+                model="gpt-4", messages=MESSAGES), concurrency=8)
+
+    results = asyncio.run(run())
+    assert not any(isinstance(r, Exception) for r in results)
+    assert controller.throttles == 4
+    # One decrease per cooldown however many requests saw the burst
+    assert controller.limit < 8
+    assert controller.in_flight == 0
+
+
+def test_malformed_retry_after_falls_back_to_backoff():
+    error = SimpleNamespace(response=SimpleNamespace(headers={"retry-after": "soon"}))
+    assert retry_after_seconds(error) is None
@@ -0,0 +1,33 @@
+from openai import OpenAI
+
+from response_cache import CachedClient, ResponseCache
+
+MESSAGES = [{"role": "user", "content": "Describe the benefits of performance fabric."}]
+
+
+def test_disabled_cache_creates_no_file_and_passes_calls_through(stub, tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResponseCache(str(path), enabled=False)
+    client = CachedClient(OpenAI(base_url=stub.base_url, api_key="stub", max_retries=0), cache)
+    for _ in range(2):
+        client.chat.completions.create(model="gpt-4", messages=MESSAGES, temperature=0)
+
+    assert not path.exists()
+    assert stub.request_count == 2
+    assert cache.stats()["bypassed"] == 2
+
+
+def test_running_size_matches_the_table_and_evicts_over_budget(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=100)
+    for i in range(10):
+        cache.put(f"k{i}", {"text": "x" * 20})
+    assert cache._bytes == cache._total() <= 100
+    assert cache.get("k0") is None  # least recently used, evicted
+    assert cache.get("k9") == {"text": "x" * 20}
+
+    cache.put("k9", {"text": "y"})  # replacing a key gives its old size back
+    assert cache._bytes == cache._total()
+    assert ResponseCache(str(tmp_path / "cache.sqlite"))._bytes == cache._bytes
+
+    cache.clear()
+    assert cache._bytes == cache._total() == 0
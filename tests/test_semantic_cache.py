@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import client_factory
+from semantic_cache import SemanticCache, SemanticCachedClient, minimal_pair
+from vector_index import HashingEmbedder
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+PROMPT = ("For a busy family home with two dogs, a cat and young kids who spill juice, "
+          "is velvet a good upholstery fabric for the living room sofa and matching armchairs?")
+
+
+def request(prompt):
+    return {"model": "gpt-4", "temperature": 0, "messages": [SYSTEM, {"role": "user", "content": prompt}]}
+
+
+class SameMeaningEmbedder:
+    # Stands in for a sentence model that maps every wording of these questions to one vector
+    dim = 8
+
+    def __call__(self, texts):
+        return np.ones((len(texts), self.dim), dtype=np.float32)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # The lexical fallback embedder, which scores "two dogs" vs "three dogs" as near-identical
+    return SemanticCache(path=str(tmp_path / "semantic.sqlite"), embed=HashingEmbedder(), threshold=0.92)
+
+
+def store(cache, prompt, content):
+    namespace, text, vector, response = cache.lookup(request(prompt))
+    assert response is None
+    cache.put(namespace, text, vector, {"choices": [{"message": {"content": content}}]})
+
+
+def test_changed_number_misses_even_above_threshold(cache):
+    store(cache, PROMPT, "Yes")
+    *_, response = cache.lookup(request(PROMPT.replace("two dogs", "three dogs")))
+    assert response is None
+    assert cache.miss_similarities[-1] >= cache.threshold  # the embedding alone would have hit
+    assert cache.stats()["rejected_minimal_pairs"] == 1
+
+
+def test_negated_prompt_misses(cache):
+    store(cache, PROMPT, "Yes")
+    *_, response = cache.lookup(request(PROMPT.replace("is velvet", "is velvet not")))
+    assert response is None
+
+
+def test_same_prompt_with_different_spacing_hits(cache):
+    store(cache, PROMPT, "Yes")
+    *_, response = cache.lookup(request("  " + PROMPT.lower()))
+    assert response["choices"][0]["message"]["content"] == "Yes"
+
+
+def test_short_paraphrase_hits(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite"), embed=SameMeaningEmbedder())
+    store(cache, "What is performance fabric?", "A stain-resistant upholstery fabric.")
+    *_, response = cache.lookup(request("What's performance fabric?"))
+    assert response["choices"][0]["message"]["content"] == "A stain-resistant upholstery fabric."
+
+    # Same vector, but a different place: never served
+    store(cache, "Can you ship the sofa to Paris?", "Yes")
+    *_, response = cache.lookup(request("Can you ship the sofa to London?"))
+    assert response is None
+
+
+def test_minimal_pair():
+    assert minimal_pair("Is linen durable?", "Isn't linen durable?")
+    assert minimal_pair("Clean with water", "Clean without water")
+    assert minimal_pair("A sofa for 2 people", "A sofa for 3 people")
+    assert minimal_pair("Ship it to Paris.", "Ship it to London.")
+    assert not minimal_pair("Is linen durable?", "is linen durable")
+    assert not minimal_pair("What is performance fabric?", "What's performance fabric?")
+    assert not minimal_pair("Is velvet a good fabric?", "Is velvet a poor fabric?")
+    assert not minimal_pair("Paris has velvet sofas.", "Which shop in Paris has velvet sofas?")
+    assert not minimal_pair("What are the benefits of performance fabric for furniture?",
+                            "Why would I pick performance fabric for a sofa?")
+
+
+def test_factory_refuses_semantic_cache_without_model(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("SEMANTIC_CACHE", "1")
+    monkeypatch.setenv("PROMPT_CACHE_DISABLE", "1")
+    monkeypatch.delenv("SEMANTIC_CACHE_MODEL", raising=False)
+    client_factory.reset()
+    try:
+        with pytest.warns(UserWarning, match="SEMANTIC_CACHE_MODEL"):
+            client = client_factory.get_client()
+        layer, layers = client, []
+        while hasattr(layer, "client"):
+            layers.append(layer)
+            layer = layer.client
+        assert not any(isinstance(l, SemanticCachedClient) for l in layers)
+    finally:
+        client_factory.reset()
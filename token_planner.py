@@ -0,0 +1,183 @@
+# 🧮 token_planner.py — Local Token Counting and Request Planning
+#
+# Counts prompt tokens offline before a request is sent, predicts its total
+# size (prompt + max_tokens), trims or rejects judge prompts that would blow the
+# context window, and packs a list of requests into per-minute windows that
+# stay under a tokens/min quota; paced() replays those windows a minute apart.
+#
+# Uses tiktoken when it is installed and its BPE files are available (set
+# TIKTOKEN_CACHE_DIR for offline boxes); otherwise falls back to a regex
+# approximation of the same pre-tokenizer, which is close enough for budgeting.
+#
+#   request = fit_request({"model": "gpt-4", "messages": [...], "max_tokens": 300})
+#   windows = pack_requests(requests, tokens_per_minute=30000)
+#   for request in paced(windows): ...
+
+import math
+import re
+import time
+from functools import lru_cache
+
+CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-0613": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+    "text-davinci-003": 4097,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Chat format overhead (per OpenAI's cookbook): each message costs a few
+# framing tokens and every reply is primed with a few more
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+REPLY_PRIMING_TOKENS = 3
+
+TRUNCATION_MARKER = "\n…[truncated]…\n"
+
+_PIECES = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?\w+| ?[^\s\w]+|\s+", re.I)
+
+
+class RequestTooLargeError(ValueError):
+    pass
+
+# ---------------------------------------
+# Encoders
+# ---------------------------------------
+
+class _ApproxEncoder:
+    # Splits like cl100k's pre-tokenizer and charges ~4 characters per token
+    name = "approx"
+
+    def encode(self, text):
+        pieces = []
+        for piece in _PIECES.findall(text):
+            n = max(1, math.ceil(len(piece.strip() or piece) / 4))
+            step = math.ceil(len(piece) / n)
+            pieces.extend(piece[i:i + step] for i in range(0, len(piece), step))
+        return pieces
+
+    def decode(self, pieces):
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Not installed, or the BPE file can't be fetched offline
+        return _ApproxEncoder()
+
+
+def count_tokens(text, model="gpt-4"):
+    return len(get_encoder(model).encode(text))
+
+
+def count_message_tokens(messages, model="gpt-4"):
+    total = REPLY_PRIMING_TOKENS
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        for key, value in message.items():
+            if isinstance(value, str):
+                total += count_tokens(value, model)
+            if key == "name":
+                total += TOKENS_PER_NAME
+    return total
+
+# ---------------------------------------
+# Planning
+# ---------------------------------------
+
+def context_window(model):
+    if model in CONTEXT_WINDOWS:
+        return CONTEXT_WINDOWS[model]
+    # Dated snapshots ("gpt-4-0125-preview") share their family's window
+    family = max((name for name in CONTEXT_WINDOWS if model.startswith(name)), key=len, default=None)
+    return CONTEXT_WINDOWS[family] if family else DEFAULT_CONTEXT_WINDOW
+
+
+def predict_tokens(request):
+    # Prompt tokens plus the completion cap: what the request counts against a TPM quota
+    prompt_tokens = count_message_tokens(request["messages"], request["model"])
+    return prompt_tokens + (request.get("max_tokens") or 0)
+
+
+def _truncate_middle(text, keep_tokens, model):
+    # Keep the head (context) and the tail (usually the output instructions)
+    encoder = get_encoder(model)
+    tokens = encoder.encode(text)
+    if len(tokens) <= keep_tokens:
+        return text
+    marker = count_tokens(TRUNCATION_MARKER, model)
+    keep = max(0, keep_tokens - marker)
+    head, tail = keep // 2, keep - keep // 2
+    return encoder.decode(tokens[:head]) + TRUNCATION_MARKER + (encoder.decode(tokens[-tail:]) if tail else "")
+
+
+def fit_request(request, policy="truncate", limit=None):
+    # Returns a request whose prompt + max_tokens fits the model's context window.
+    # policy="truncate" trims the longest non-system message from the middle;
+    # policy="reject" raises RequestTooLargeError instead.
+    model = request["model"]
+    limit = limit or context_window(model)
+    max_tokens = request.get("max_tokens") or 0
+    overflow = predict_tokens(request) - limit
+    if overflow <= 0:
+        return request
+    if policy == "reject":
+        raise RequestTooLargeError(f"{model} request needs {limit + overflow} tokens, limit is {limit}")
+
+    messages = [dict(m) for m in request["messages"]]
+    candidates = [m for m in messages if m.get("role") != "system" and isinstance(m.get("content"), str)]
+    if not candidates:
+        raise RequestTooLargeError(f"{model} request exceeds {limit} tokens and has nothing to truncate")
+    longest = max(candidates, key=lambda m: len(m["content"]))
+    fitted = {**request, "messages": messages}
+    # Re-encoding the joined halves can shift a token or two, so re-check and trim again
+    for _ in range(3):
+        keep = count_tokens(longest["content"], model) - overflow
+        if keep <= 0:
+            raise RequestTooLargeError(f"{model} request can't fit {limit} tokens with max_tokens={max_tokens}")
+        longest["content"] = _truncate_middle(longest["content"], keep, model)
+        overflow = predict_tokens(fitted) - limit
+        if overflow <= 0:
+            return fitted
+    raise RequestTooLargeError(f"{model} request still exceeds {limit} tokens after truncation")
+
+
+def pack_requests(requests, tokens_per_minute, requests_per_minute=None, cost=predict_tokens):
+    # Greedy, order-preserving split into one-minute windows that each stay under both quotas.
+    # Returns a list of windows (lists of requests) in submission order. `cost` sizes one
+    # item, so callers can pack units that are more than one request (e.g. generate + judge).
+    windows, current, used = [], [], 0
+    for request in requests:
+        tokens = cost(request)
+        if tokens > tokens_per_minute:
+            raise RequestTooLargeError(f"Single request needs {tokens} tokens, quota is {tokens_per_minute}/min")
+        full = used + tokens > tokens_per_minute or (requests_per_minute and len(current) >= requests_per_minute)
+        if current and full:
+            windows.append(current)
+            current, used = [], 0
+        current.append(request)
+        used += tokens
+    if current:
+        windows.append(current)
+    return windows
+
+
+def paced(windows, seconds=60):
+    # Yields the items of each window, starting every window `seconds` after the previous one
+    started = None
+    for window in windows:
+        if started is not None:
+            time.sleep(max(0.0, started + seconds - time.monotonic()))
+        started = time.monotonic()
+        yield from window
@@ -0,0 +1,290 @@
+# 🔧 tool_executor.py — Function-Calling Runtime with Parallel Tool Dispatch
+#
+# Register plain Python functions as tools; their JSON schemas are generated
+# from the signatures. ToolExecutor then runs the whole loop: send the
+# conversation with the tool schemas, execute every tool call the model asks
+# for, append the results and ask again, until the model answers in text or
+# `max_turns` is reached (the last request then forbids further tool calls).
+#
+# All tool calls of one turn run at the same time (a thread pool for plain
+# functions, asyncio for coroutines), so a turn with 8 lookups costs about as
+# long as its slowest one. Results are cached on (tool, arguments); register
+# side-effecting or time-dependent tools with cache=False.
+#
+#   tools = ToolRegistry()
+#
+#   @tools.tool("Care instructions for a fabric type.", fabric_type="e.g. velvet, tweed, linen")
+#   def get_fabric_care(fabric_type):
+#       ...
+#
+#   executor = ToolExecutor(client, tools, model="gpt-4-0613")
+#   answer = executor.run([{"role": "user", "content": "How do I care for linen?"}])
+#   answer = await ToolExecutor(async_client, tools).arun(messages)
+#
+# Parameter types come from annotations, else from the default value, else
+# "string"; parameters without a default are required. A tool that raises
+# returns {"error": ...} to the model instead of ending the run.
+
+import asyncio
+import contextvars
+import inspect
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean", list: "array", dict: "object"}
+
+# ---------------------------------------
+# Registry
+# ---------------------------------------
+
+def _json_type(parameter):
+    if parameter.annotation in JSON_TYPES:
+        return JSON_TYPES[parameter.annotation]
+    if parameter.default is not inspect.Parameter.empty and parameter.default is not None:
+        return JSON_TYPES.get(type(parameter.default), "string")
+    return "string"
+
+
+def function_schema(fn, description=None, **param_descriptions):
+    properties, required = {}, []
+    for name, parameter in inspect.signature(fn).parameters.items():
+        if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        properties[name] = {"type": _json_type(parameter)}
+        if name in param_descriptions:
+            properties[name]["description"] = param_descriptions[name]
+        if parameter.default is inspect.Parameter.empty:
+            required.append(name)
+    return {
+        "type": "function",
+        "function": {
+            "name": fn.__name__,
+            "description": description or (inspect.getdoc(fn) or "").split("\n")[0],
+            "parameters": {"type": "object", "properties": properties, "required": required}
+        }
+    }
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools = {}
+
+    def tool(self, description=None, cache=True, **param_descriptions):
+        # @tools.tool("What it does", param="what this parameter means")
+        def register(fn):
+            if fn.__name__ in self._tools:
+                raise ValueError(f"Tool '{fn.__name__}' is already registered")
+            self._tools[fn.__name__] = {
+                "fn": fn,
+                "schema": function_schema(fn, description, **param_descriptions),
+                "cache": cache,
+                "is_async": inspect.iscoroutinefunction(fn)
+            }
+            return fn
+        return register
+
+    def __contains__(self, name):
+        return name in self._tools
+
+    def __getitem__(self, name):
+        return self._tools[name]
+
+    def schemas(self):
+        return [entry["schema"] for entry in self._tools.values()]
+
+# ---------------------------------------
+# Executor
+# ---------------------------------------
+
+def _as_message(message):
+    # The assistant turn goes back into the conversation as a plain dict
+    if hasattr(message, "model_dump"):
+        return message.model_dump(exclude_none=True)
+    return dict(message)
+
+
+def _result_text(result):
+    return result if isinstance(result, str) else json.dumps(result, default=str)
+
+
+class ToolExecutor:
+    def __init__(self, client, registry, model="gpt-4", max_turns=5, max_workers=16, cache=True):
+        self.client = client
+        self.registry = registry
+        self.model = model
+        self.max_turns = max_turns
+        self.max_workers = max_workers
+        self.cache_enabled = cache
+        self.turns = 0
+        self.tool_calls = 0
+        self.cache_hits = 0
+        self.tool_errors = 0
+        self.tool_seconds = 0.0     # summed time inside tools
+        self.dispatch_seconds = 0.0  # wall time of the parallel dispatches
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._pool = None
+
+    # ---------------------------------------
+    # Tool calls
+    # ---------------------------------------
+
+    def _parse(self, call):
+        # (cache key, tool entry, kwargs) or (None, None, error message)
+        name = call.function.name
+        if name not in self.registry:
+            return None, None, f"Unknown tool '{name}'"
+        try:
+            kwargs = json.loads(call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            return None, None, f"Arguments for '{name}' are not valid JSON: {e}"
+        key = (name, json.dumps(kwargs, sort_keys=True, default=str))
+        return key, self.registry[name], kwargs
+
+    def _cached(self, key, entry):
+        if not (self.cache_enabled and entry["cache"]):
+            return None
+        with self._lock:
+            if key in self._cache:
+                self.cache_hits += 1
+                return self._cache[key]
+        return None
+
+    def _store(self, key, entry, text, started, failed):
+        with self._lock:
+            self.tool_calls += 1
+            self.tool_seconds += time.perf_counter() - started
+            if failed:
+                self.tool_errors += 1
+            elif self.cache_enabled and entry["cache"]:
+                self._cache[key] = text
+        return text
+
+    def _invoke(self, key, entry, kwargs):
+        started = time.perf_counter()
+        try:
+            text = _result_text(entry["fn"](**kwargs))
+        except Exception as e:
+            return self._store(key, entry, json.dumps({"error": f"{type(e).__name__}: {e}"}), started, True)
+        return self._store(key, entry, text, started, False)
+
+    async def _ainvoke(self, key, entry, kwargs):
+        started = time.perf_counter()
+        try:
+            if entry["is_async"]:
+                result = await entry["fn"](**kwargs)
+            else:
+                context = contextvars.copy_context()
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor(), lambda: context.run(entry["fn"], **kwargs))
+            text = _result_text(result)
+        except Exception as e:
+            return self._store(key, entry, json.dumps({"error": f"{type(e).__name__}: {e}"}), started, True)
+        return self._store(key, entry, text, started, False)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._pool
+
+    def _plan(self, tool_calls):
+        # Identical calls in one turn run once; cached ones don't run at all
+        results, todo = {}, {}
+        for call in tool_calls:
+            key, entry, kwargs = self._parse(call)
+            if key is None:
+                results[call.id] = json.dumps({"error": kwargs})
+                with self._lock:
+                    self.tool_errors += 1
+                continue
+            cached = self._cached(key, entry)
+            if cached is not None:
+                results[call.id] = cached
+            else:
+                todo.setdefault(key, (entry, kwargs, []))[2].append(call.id)
+        return results, todo
+
+    def dispatch(self, tool_calls):
+        # {tool_call_id: result text} for one turn, tools running side by side
+        results, todo = self._plan(tool_calls)
+        started = time.perf_counter()
+        if len(todo) == 1:
+            (key, (entry, kwargs, ids)), = todo.items()
+            outputs = {key: self._invoke(key, entry, kwargs)}
+        else:
+            pool = self._executor()
+            futures = {key: pool.submit(contextvars.copy_context().run, self._invoke, key, entry, kwargs)
+                       for key, (entry, kwargs, _) in todo.items()}
+            outputs = {key: future.result() for key, future in futures.items()}
+        self.dispatch_seconds += time.perf_counter() - started if todo else 0.0
+        for key, (_, _, ids) in todo.items():
+            for call_id in ids:
+                results[call_id] = outputs[key]
+        return results
+
+    async def adispatch(self, tool_calls):
+        results, todo = self._plan(tool_calls)
+        started = time.perf_counter()
+        keys = list(todo)
+        outputs = await asyncio.gather(*(self._ainvoke(key, todo[key][0], todo[key][1]) for key in keys))
+        self.dispatch_seconds += time.perf_counter() - started if todo else 0.0
+        for key, output in zip(keys, outputs):
+            for call_id in todo[key][2]:
+                results[call_id] = output
+        return results
+
+    # ---------------------------------------
+    # Conversation loop
+    # ---------------------------------------
+
+    def _request(self, messages, turn, params):
+        request = {"model": self.model, "messages": messages, "tools": self.registry.schemas(), **params}
+        if turn == self.max_turns:
+            request["tool_choice"] = "none"  # out of turns: answer with what you have
+        return request
+
+    def _tool_messages(self, message, results):
+        return [_as_message(message)] + [
+            {"role": "tool", "tool_call_id": call.id, "content": results[call.id]}
+            for call in message.tool_calls
+        ]
+
+    def run(self, messages, **params):
+        # Returns the final assistant text; `messages` is extended with the whole exchange
+        for turn in range(1, self.max_turns + 1):
+            response = self.client.chat.completions.create(**self._request(messages, turn, params))
+            self.turns += 1
+            message = response.choices[0].message
+            if not message.tool_calls:
+                messages.append(_as_message(message))
+                return message.content
+            messages.extend(self._tool_messages(message, self.dispatch(message.tool_calls)))
+        return None
+
+    async def arun(self, messages, **params):
+        for turn in range(1, self.max_turns + 1):
+            response = await self.client.chat.completions.create(**self._request(messages, turn, params))
+            self.turns += 1
+            message = response.choices[0].message
+            if not message.tool_calls:
+                messages.append(_as_message(message))
+                return message.content
+            messages.extend(self._tool_messages(message, await self.adispatch(message.tool_calls)))
+        return None
+
+    def stats(self):
+        return {
+            "turns": self.turns,
+            "tool_calls": self.tool_calls,
+            "cache_hits": self.cache_hits,
+            "tool_errors": self.tool_errors,
+            # > 1 means tools overlapped: summed tool time / wall time spent dispatching
+            "parallelism": round(self.tool_seconds / self.dispatch_seconds, 2) if self.dispatch_seconds else None
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
@@ -0,0 +1,230 @@
+# 🏆 tournament.py — Rank Many Candidates with a Pairwise Judge
+#
+# Judging every pair of N candidates costs N(N-1)/2 judge calls. A tournament
+# ranks them with far fewer: a merge sort needs about N·log2(N) comparisons, and
+# a Swiss system plays `rounds` rounds of N/2 pairings between candidates with
+# similar records. Each comparison can be asked in both orders (A/B and B/A);
+# a verdict that flips with the order counts as a tie, which cancels the
+# judge's position bias. All comparisons that don't depend on each other (the
+# merges of one level, the pairings of one round) run concurrently.
+#
+#   tournament = Tournament(responses, judge, debias=True, concurrency=8)
+#   order = tournament.merge_sort()         # or tournament.swiss(rounds=6)
+#   tournament.ratings()                    # Bradley–Terry and Elo per candidate
+#
+# `judge(a, b)` returns "A", "B" or "tie" for candidates a and b; it may be a
+# plain function (run in a thread pool) or a coroutine function.
+
+import asyncio
+import inspect
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from async_runner import run_sync
+
+# ---------------------------------------
+# Scores from comparison records
+# ---------------------------------------
+
+def bradley_terry(records, n, iterations=200, prior=1.0, tol=1e-8):
+    # MM fit (Hunter 2004) of strengths p with P(i beats j) = p_i / (p_i + p_j).
+    # records: [(i, j, score of i)] with score 1, 0 or 0.5. Every candidate also
+    # gets `prior` wins and losses against a virtual opponent of strength 1, so
+    # unbeaten or winless candidates still get finite strengths (and 1 = average).
+    wins = np.full(n, prior, dtype=float)
+    games = np.zeros((n, n))
+    for i, j, score in records:
+        wins[i] += score
+        wins[j] += 1 - score
+        games[i, j] += 1
+        games[j, i] += 1
+    strength = np.ones(n)
+    for _ in range(iterations):
+        pair_sums = strength[:, None] + strength[None, :]
+        denominator = (games / pair_sums).sum(1) + 2 * prior / (strength + 1.0)
+        updated = wins / denominator
+        if np.abs(updated - strength).max() < tol:
+            strength = updated
+            break
+        strength = updated
+    return strength
+
+
+def to_elo_scale(strength, base=1500.0):
+    return base + 400 * np.log10(strength)
+
+
+def elo_ratings(records, n, k=32.0, base=1500.0):
+    # Online Elo in comparison order (order-dependent; Bradley–Terry is not)
+    ratings = np.full(n, base)
+    for i, j, score in records:
+        expected = 1 / (1 + 10 ** ((ratings[j] - ratings[i]) / 400))
+        ratings[i] += k * (score - expected)
+        ratings[j] -= k * (score - expected)
+    return ratings
+
+# ---------------------------------------
+# Tournament
+# ---------------------------------------
+
+class Tournament:
+    def __init__(self, items, judge, debias=True, concurrency=8, labels=None, seed=0):
+        self.items = list(items)
+        self.labels = list(labels) if labels is not None else [str(i) for i in range(len(self.items))]
+        self.judge = judge
+        self.debias = debias
+        self.concurrency = concurrency
+        self.rng = np.random.default_rng(seed)
+        self.records = []      # (i, j, score of i) per comparison
+        self.judge_calls = 0
+        self.inconsistent = 0  # verdicts that flipped when the order was swapped
+        self._memo = {}
+        self._semaphore = None
+        self._executor = None
+
+    # ---------------------------------------
+    # One comparison
+    # ---------------------------------------
+
+    async def _ask(self, a, b):
+        async with self._semaphore:
+            self.judge_calls += 1
+            if inspect.iscoroutinefunction(self.judge):
+                verdict = await self.judge(a, b)
+            else:
+                loop = asyncio.get_running_loop()
+                verdict = await loop.run_in_executor(self._executor, self.judge, a, b)
+        return {"A": 1.0, "B": 0.0}.get(str(verdict).strip().upper(), 0.5)
+
+    async def compare(self, i, j):
+        # Score of i against j: 1 win, 0 loss, 0.5 tie (or an order-dependent verdict)
+        if (i, j) in self._memo:
+            return self._memo[(i, j)]
+        if (j, i) in self._memo:
+            return 1 - self._memo[(j, i)]
+        if self.debias:
+            forward, backward = await asyncio.gather(self._ask(self.items[i], self.items[j]),
+                                                     self._ask(self.items[j], self.items[i]))
+            swapped = 1 - backward
+            if forward != swapped:
+                self.inconsistent += 1
+            score = (forward + swapped) / 2
+        else:
+            # Randomize which side each candidate is shown on
+            if self.rng.random() < 0.5:
+                score = await self._ask(self.items[i], self.items[j])
+            else:
+                score = 1 - await self._ask(self.items[j], self.items[i])
+        self._memo[(i, j)] = score
+        self.records.append((i, j, score))
+        return score
+
+    def _run(self, coro):
+        async def with_limits():
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                self._executor = executor
+                return await coro
+        return run_sync(with_limits())
+
+    # ---------------------------------------
+    # Merge sort
+    # ---------------------------------------
+
+    async def _merge(self, left, right):
+        merged = []
+        while left and right:
+            # Ties keep the left candidate first, so the sort is stable
+            if await self.compare(left[0], right[0]) >= 0.5:
+                merged.append(left.pop(0))
+            else:
+                merged.append(right.pop(0))
+        return merged + left + right
+
+    async def _amerge_sort(self):
+        runs = [[i] for i in self.rng.permutation(len(self.items)).tolist()]
+        while len(runs) > 1:
+            # Every merge of a level runs at once
+            pairs = [(runs[k], runs[k + 1]) for k in range(0, len(runs) - 1, 2)]
+            merged = await asyncio.gather(*(self._merge(list(a), list(b)) for a, b in pairs))
+            runs = list(merged) + ([runs[-1]] if len(runs) % 2 else [])
+        return runs[0] if runs else []
+
+    def merge_sort(self):
+        # Candidate indices, best first. One noisy verdict can misplace a whole run
+        # during a merge, so the final order comes from a Bradley–Terry fit over
+        # every comparison made (merge position breaks exact ties).
+        merged = self._run(self._amerge_sort())
+        strength = bradley_terry(self.records, len(self.items))
+        position = {i: k for k, i in enumerate(merged)}
+        return sorted(merged, key=lambda i: (-strength[i], position[i]))
+
+    # ---------------------------------------
+    # Swiss system
+    # ---------------------------------------
+
+    def _pairings(self, points):
+        # Sort by points (random among equals), pair neighbours that haven't met yet
+        order = sorted(range(len(self.items)), key=lambda i: (-points[i], self.rng.random()))
+        pairs, waiting = [], []
+        for i in order:
+            partner = next((j for j in waiting
+                            if (i, j) not in self._memo and (j, i) not in self._memo), None)
+            if partner is None:
+                waiting.append(i)
+            else:
+                waiting.remove(partner)
+                pairs.append((partner, i))
+        return pairs
+
+    async def _aswiss(self, rounds):
+        points = [0.0] * len(self.items)
+        for _ in range(rounds):
+            pairs = self._pairings(points)
+            if not pairs:
+                break
+            scores = await asyncio.gather(*(self.compare(i, j) for i, j in pairs))
+            for (i, j), score in zip(pairs, scores):
+                points[i] += score
+                points[j] += 1 - score
+        strength = bradley_terry(self.records, len(self.items))
+        return sorted(range(len(self.items)), key=lambda i: -strength[i])
+
+    def swiss(self, rounds=None):
+        # Default: enough rounds to separate a clear winner, ceil(log2 N) + 2
+        rounds = rounds or math.ceil(math.log2(max(2, len(self.items)))) + 2
+        return self._run(self._aswiss(rounds))
+
+    # ---------------------------------------
+    # Results
+    # ---------------------------------------
+
+    def ratings(self):
+        n = len(self.items)
+        strength = bradley_terry(self.records, n)
+        elo = elo_ratings(self.records, n)
+        rows = []
+        for i in range(n):
+            played = [(score if a == i else 1 - score) for a, b, score in self.records if i in (a, b)]
+            rows.append({
+                "Candidate": self.labels[i],
+                "Wins": sum(s == 1 for s in played),
+                "Losses": sum(s == 0 for s in played),
+                "Ties": sum(s == 0.5 for s in played),
+                "BT Strength": round(float(strength[i]), 4),
+                "BT Elo": round(float(to_elo_scale(strength)[i]), 1),
+                "Elo": round(float(elo[i]), 1)
+            })
+        return sorted(rows, key=lambda r: -r["BT Strength"])
+
+    def stats(self):
+        n = len(self.items)
+        return {
+            "candidates": n,
+            "comparisons": len(self.records),
+            "judge_calls": self.judge_calls,
+            "all_pairs_calls": n * (n - 1) // 2 * (2 if self.debias else 1),
+            "position_flips": self.inconsistent
+        }
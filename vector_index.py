@@ -0,0 +1,309 @@
+# 🔎 vector_index.py — Offline Vector Index for Retrieval (RAG)
+#
+# Embeds chunks with a pluggable local embedding function, keeps the vectors in
+# a memory-mapped float32 matrix on disk and answers top-k queries with
+# vectorized cosine similarity (vectors are unit-normalized, so cosine = dot).
+# For large corpora an IVF index (k-means centroids + inverted lists) scores
+# only the `nprobe` closest clusters instead of every row. Runs on a CPU-only
+# box with no network; the text and metadata of each row live in SQLite.
+#
+#   index = VectorIndex("fabric_index")              # HashingEmbedder by default
+#   index.add_chunks(stream_chunks("manuals/", chunk_size=300, chunk_overlap=30))
+#   index.build_ivf()                                # optional, for big indexes
+#   for hit in index.search("how do I clean velvet?", k=4):
+#       hit["score"], hit["text"], hit["metadata"]
+#
+# Layout of an index directory:
+#   index.json    dim, row count, capacity, embedder name
+#   vectors.f32   (capacity × dim) float32 matrix, grown by doubling
+#   docs.sqlite   id → text, metadata
+#   ivf.npz       centroids + row assignments (after build_ivf)
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+# ---------------------------------------
+# Embedding functions
+# ---------------------------------------
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=2 ** 18)
+def _bucket(feature, dim):
+    h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+class HashingEmbedder:
+    # Signed feature hashing of word unigrams + bigrams: no model files, no network.
+    # Good for lexical retrieval; plug in a real model for semantic matches.
+    def __init__(self, dim=512, bigrams=True):
+        self.dim = dim
+        self.bigrams = bigrams
+        self.name = f"hashing-{dim}{'-bigrams' if bigrams else ''}"
+
+    def __call__(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = text.lower().split()
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])] if self.bigrams else words
+            for feature in features:
+                column, sign = _bucket(feature.strip(".,;:!?\"'()"), self.dim)
+                out[row, column] += sign
+        return out
+
+
+class SentenceTransformerEmbedder:
+    # Any sentence-transformers model already in the local cache (no download at query time)
+    def __init__(self, model_name="all-MiniLM-L6-v2", device="cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st-{model_name}"
+
+    def __call__(self, texts):
+        return self.model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+
+# ---------------------------------------
+# Top-k helpers
+# ---------------------------------------
+
+def _top_k(scores, ids, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, ids = scores[keep], ids[keep]
+    order = np.argsort(-scores, kind="stable")
+    return scores[order], ids[order]
+
+# ---------------------------------------
+# Index
+# ---------------------------------------
+
+class VectorIndex:
+    def __init__(self, path, embed=None, dim=None, block_rows=65536):
+        # `embed` maps a list of texts to an (n, dim) array; its `dim` sizes a new index
+        self.path = path
+        self.block_rows = block_rows
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        info_path = os.path.join(path, "index.json")
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                self.info = json.load(f)
+        else:
+            dim = dim or getattr(embed, "dim", None) or 512
+            self.info = {"dim": dim, "count": 0, "capacity": 0, "embedder": None}
+        self.embed = embed or HashingEmbedder(self.info["dim"])
+        name = getattr(self.embed, "name", None)
+        if self.info["embedder"] and name and name != self.info["embedder"]:
+            raise ValueError(f"Index was built with {self.info['embedder']}, not {name}")
+        self.info["embedder"] = self.info["embedder"] or name
+
+        self._vectors = None
+        self._open_vectors()
+        self._db = sqlite3.connect(os.path.join(path, "docs.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, text TEXT, metadata TEXT)")
+
+        self._ivf = None
+        self._lists = None  # (row ids sorted by cluster, cluster start offsets), rebuilt lazily
+        ivf_path = os.path.join(path, "ivf.npz")
+        if os.path.exists(ivf_path):
+            data = np.load(ivf_path)
+            self._ivf = {"centroids": data["centroids"], "assign": data["assign"]}
+            missing = self.info["count"] - len(self._ivf["assign"])
+            if missing > 0:  # rows added after the last save
+                self._assign_rows(len(self._ivf["assign"]), self.info["count"])
+
+    def __len__(self):
+        return self.info["count"]
+
+    @property
+    def dim(self):
+        return self.info["dim"]
+
+    def _open_vectors(self):
+        file = os.path.join(self.path, "vectors.f32")
+        if self.info["capacity"] == 0:
+            self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            return
+        self._vectors = np.memmap(file, dtype=np.float32, mode="r+", shape=(self.info["capacity"], self.dim))
+
+    def _reserve(self, rows):
+        needed = self.info["count"] + rows
+        if needed <= self.info["capacity"]:
+            return
+        capacity = max(1024, self.info["capacity"])
+        while capacity < needed:
+            capacity *= 2
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        self._vectors = None
+        with open(os.path.join(self.path, "vectors.f32"), "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self.info["capacity"] = capacity
+        self._open_vectors()
+
+    def _save(self, ivf=False):
+        # The IVF assignments are rewritten only on build/close; rows added since are
+        # reassigned on the next open
+        if isinstance(self._vectors, np.memmap):
+            self._vectors.flush()
+        tmp = os.path.join(self.path, "index.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.info, f)
+        os.replace(tmp, os.path.join(self.path, "index.json"))
+        if ivf and self._ivf:
+            np.savez(os.path.join(self.path, "ivf.npz"), centroids=self._ivf["centroids"],
+                     assign=self._ivf["assign"])
+
+    # ---------------------------------------
+    # Inserts
+    # ---------------------------------------
+
+    def add(self, texts, metadatas=None, vectors=None):
+        # Appends rows and returns their ids; new rows join the IVF lists if one is built
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = normalize(self.embed(texts) if vectors is None else vectors)
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"Expected vectors of shape {(len(texts), self.dim)}, got {vectors.shape}")
+        metadatas = metadatas or [{}] * len(texts)
+        with self._lock:
+            start = self.info["count"]
+            self._reserve(len(texts))
+            self._vectors[start:start + len(texts)] = vectors
+            ids = list(range(start, start + len(texts)))
+            with self._db:
+                self._db.executemany("INSERT INTO docs (id, text, metadata) VALUES (?, ?, ?)",
+                                     [(i, t, json.dumps(m)) for i, t, m in zip(ids, texts, metadatas)])
+            self.info["count"] += len(texts)
+            if self._ivf:
+                self._assign_rows(start, self.info["count"])
+            self._save()
+        return ids
+
+    def add_chunks(self, chunks, batch_size=256):
+        # Embeds a lazy stream of chunks (doc_stream.Chunk or LangChain Documents) in batches
+        chunks = iter(chunks)
+        added = 0
+        while batch := list(islice(chunks, batch_size)):
+            added += len(self.add([c.page_content for c in batch], [c.metadata for c in batch]))
+        return added
+
+    # ---------------------------------------
+    # IVF (approximate search)
+    # ---------------------------------------
+
+    def _nearest_centroids(self, vectors):
+        return np.argmax(vectors @ self._ivf["centroids"].T, axis=1).astype(np.int32)
+
+    def _assign_rows(self, start, end):
+        # Appends the closest centroid of rows start..end to the IVF assignments
+        parts = [self._ivf["assign"][:start]]
+        for block in range(start, end, self.block_rows):
+            parts.append(self._nearest_centroids(np.asarray(self._vectors[block:min(end, block + self.block_rows)])))
+        self._ivf["assign"] = np.concatenate(parts)
+        self._lists = None
+
+    def build_ivf(self, nlist=None, iterations=10, sample_size=50000, seed=0):
+        # Spherical k-means on a sample, then every row is assigned to its closest centroid
+        with self._lock:
+            count = self.info["count"]
+            if count == 0:
+                raise ValueError("Cannot build an IVF index on an empty index")
+            nlist = min(count, nlist or max(1, int(4 * np.sqrt(count))))
+            rng = np.random.default_rng(seed)
+            sample = self._vectors[np.sort(rng.choice(count, min(count, sample_size), replace=False))]
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sample)
+                empty = np.bincount(assign, minlength=nlist) == 0
+                sums[empty] = centroids[empty]  # keep empty clusters where they were
+                centroids = normalize(sums)
+            self._ivf = {"centroids": centroids, "assign": np.empty(0, dtype=np.int32)}
+            self._assign_rows(0, count)
+            self._save(ivf=True)
+        return nlist
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            assign = self._ivf["assign"]
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(len(self._ivf["centroids"]) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    # ---------------------------------------
+    # Queries
+    # ---------------------------------------
+
+    def _search_brute(self, query, k):
+        count = self.info["count"]
+        best_scores, best_ids = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        # Blocks keep memory flat when the matrix is larger than RAM
+        for start in range(0, count, self.block_rows):
+            end = min(count, start + self.block_rows)
+            scores = np.asarray(self._vectors[start:end]) @ query
+            scores, ids = _top_k(scores, np.arange(start, end), k)
+            best_scores, best_ids = _top_k(np.concatenate([best_scores, scores]),
+                                           np.concatenate([best_ids, ids]), k)
+        return best_scores, best_ids
+
+    def _search_ivf(self, query, k, nprobe):
+        order, offsets = self._inverted_lists()
+        centroid_scores = self._ivf["centroids"] @ query
+        probes = np.argsort(-centroid_scores)[:nprobe]
+        ids = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes]))
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.float32), ids
+        return _top_k(self._vectors[ids] @ query, ids, k)
+
+    def search_vectors(self, queries, k=4, nprobe=None, exact=False):
+        # Top-k (scores, ids) per query vector; IVF is used when built unless exact=True
+        queries = normalize(np.atleast_2d(queries))
+        with self._lock:
+            use_ivf = self._ivf is not None and not exact
+            if use_ivf:
+                nprobe = nprobe or max(4, len(self._ivf["centroids"]) // 64)
+            return [self._search_ivf(q, k, nprobe) if use_ivf else self._search_brute(q, k) for q in queries]
+
+    def search(self, query, k=4, nprobe=None, exact=False):
+        scores, ids = self.search_vectors(self.embed([query]), k, nprobe, exact)[0]
+        rows = self.get(ids.tolist())
+        return [{"id": i, "score": float(s), **rows[i]} for s, i in zip(scores, ids.tolist())]
+
+    def get(self, ids):
+        # {id: {"text", "metadata"}} for the given row ids
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            found = self._db.execute(f"SELECT id, text, metadata FROM docs WHERE id IN ({marks})", ids).fetchall()
+        return {i: {"text": text, "metadata": json.loads(metadata)} for i, text, metadata in found}
+
+    def close(self):
+        with self._lock:
+            self._save(ivf=True)
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()